@@ -0,0 +1,2 @@
+# Benchmark suite: synthetic qccsvout generator (synth), stage timings (run),
+# GUI cold start (startup) and workbook output backends (output)
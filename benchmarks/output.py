@@ -0,0 +1,108 @@
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the wafer cache out of the measurements (set before deliverables loads it)
+os.environ.setdefault("DELIVERABLES_CACHE_MB", "0")
+
+from benchmarks import synth
+from deliverables import output, pipeline
+
+# Output backend benchmark
+# Runs the same wafer through every installed workbook writer: Convert (data
+# sheet), Pivot, End Test block and wafermap sheet, each step on the file
+# the previous one wrote. Reports wall time per step and the final file
+# size; --memory adds one more run under tracemalloc for the peak Python
+# memory per step (slow). xlwings needs Excel and is skipped without it.
+#
+#   python -m benchmarks.output                        (100k dies)
+#   python -m benchmarks.output --dies 500000 --backends openpyxl xlsxwriter
+#   python -m benchmarks.output --dies 20000 --memory
+#   python -m benchmarks.output --csv D:\drops\W08.wmap.csv
+
+STEPS = ["convert", "pivot", "end_test", "wafermap"]
+
+
+def run_steps(csv_path, backend, traced=False):
+    # One pass through the steps; returns {step: seconds} or {step: peak_kb}
+    results = {}
+    section_index = None
+    for step in STEPS:
+        gc.collect()
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        if step == "convert":
+            section_index = pipeline.convert(csv_path, backend=backend)
+        elif step == "pivot":
+            table = pipeline.pivot(csv_path, section_index.c1_marks[-1], section_index, backend=backend)
+        elif step == "end_test":
+            top_et = table[1][0] if table and len(table) > 2 else ""
+            pipeline.check_end_test(csv_path, section_index, end_test_no=top_et, backend=backend)
+        else:
+            pipeline.write_wafermap(csv_path, section_index, backend=backend)
+        elapsed = time.perf_counter() - started
+        if traced:
+            results[step] = round(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+        else:
+            results[step] = round(elapsed, 4)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.output",
+                                     description="Compare the workbook output backends on the same wafer.")
+    parser.add_argument("--dies", type=int, default=100000, help="synthetic wafer size (default: %(default)s)")
+    parser.add_argument("--csv", help="use this wafermap CSV instead of a synthetic one")
+    parser.add_argument("--backends", nargs="+", choices=output.BACKENDS, default=list(output.BACKENDS))
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory per step (slow)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix="output_bench_") as work_dir:
+        source = args.csv
+        if source is None:
+            source = os.path.join(work_dir, "source.wmap.csv")
+            synth.generate(source, dies=args.dies, seed=args.seed)
+        print(f"\n{os.path.basename(source)} ({os.path.getsize(source) / 1e6:.1f} MB)")
+
+        for name in args.backends:
+            if not output.available(name):
+                print(f"  {name:<11} skipped (not installed)")
+                continue
+            # Fresh copy per backend: every writer starts from the CSV alone
+            backend_dir = os.path.join(work_dir, name)
+            os.makedirs(backend_dir)
+            csv_path = shutil.copy(source, backend_dir)
+            try:
+                seconds = run_steps(csv_path, name)
+                peak_kb = run_steps(csv_path, name, traced=True) if args.memory else {}
+            except Exception as e:   # e.g. xlwings installed but no Excel
+                print(f"  {name:<11} skipped ({e})")
+                continue
+            file_kb = round(os.path.getsize(pipeline.output_paths(csv_path)[0]) / 1024)
+            report[name] = {"seconds": seconds, "peak_kb": peak_kb, "file_kb": file_kb}
+
+            print(f"  {name}")
+            for step in STEPS:
+                memory = f"{peak_kb[step]:>12,} KB" if peak_kb else ""
+                print(f"    {step:<10}{seconds[step]:>9.3f} s{memory}")
+            print(f"    {'total':<10}{sum(seconds.values()):>9.3f} s   file {file_kb:,} KB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the wafer cache out of the measurements (set before deliverables loads it)
+os.environ.setdefault("DELIVERABLES_CACHE_MB", "0")
+
+import openpyxl
+
+from benchmarks import synth
+from deliverables import die_table, endtest, fallout, lot, output, sections, wafermap, wmap_csv
+
+# Stage benchmarks
+# Generates synthetic wafermap CSVs and times every processing stage on its
+# own: parse, xlsx write, fallout, End Test lookup, grid build, coloring and
+# the compact die table (build + fallout group-by + grid, needs NumPy).
+# Each stage keeps the best wall time of --repeat runs plus the peak memory
+# of one extra run under tracemalloc, and is compared with a stored baseline.
+#
+#   python -m benchmarks.run                         (1k, 10k, 100k dies)
+#   python -m benchmarks.run --dies 1000 500000 --repeat 1
+#   python -m benchmarks.run --save-baseline         (record this machine)
+#
+# Exit code 1 when a stage is slower (or needs more memory) than the
+# baseline by more than --tolerance.
+
+STAGES = ["parse", "xlsx_write", "fallout", "end_test", "grid_build", "coloring", "die_table"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MIN_SLACK_S = 0.005        # ignore regressions below timer noise
+MIN_SLACK_KB = 256
+
+
+class Context:
+    # Inputs of later stages, produced by the earlier ones
+    def __init__(self, csv_path, work_dir):
+        self.csv_path = csv_path
+        self.work_dir = work_dir
+        self.rows = None
+        self.section_index = None
+        self.top_et = None
+        self.wafers = None
+        self.blocks = None
+
+
+# --- Stages ---
+def stage_parse(ctx):
+    ctx.section_index = sections.SectionIndex()
+    ctx.rows = list(ctx.section_index.scan(wmap_csv.iter_rows(ctx.csv_path)))
+
+
+def stage_xlsx_write(ctx):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    for row in ctx.rows:
+        ws.append(row)
+    wb.save(os.path.join(ctx.work_dir, "bench.xlsx"))
+    wb.close()
+
+
+def stage_fallout(ctx):
+    index = ctx.section_index
+    counts, theoretical_num, marks = fallout.count_end_tests(
+        ctx.rows[index.die_header_row - 1:], index.c1_marks[-1], theoretical_num=index.theoretical_num
+    )
+    table = fallout.build_fallout_table(counts, theoretical_num)
+    ctx.top_et = table[1][0] if len(table) > 2 else ""
+
+
+def stage_end_test(ctx):
+    endtest.lookup_end_test(ctx.csv_path, ctx.section_index, ctx.top_et)
+
+
+def stage_grid_build(ctx):
+    ctx.wafers = lot.split_wafers(ctx.csv_path, rows=ctx.rows)
+    ctx.blocks = [(wafer.block(), wafer.et_to_c1) for wafer in ctx.wafers.values()]
+
+
+def stage_coloring(ctx):
+    for i, (block, et_to_c1) in enumerate(ctx.blocks):
+        wafermap.fill_wafermap_sheet(output.Sheet(f"map{i}"), block, et_to_c1)
+
+
+def stage_die_table(ctx):
+    if not die_table.available():
+        return
+    index = ctx.section_index
+    names = list(index.die_columns)
+    die_rows = ctx.rows[index.die_header_row:index.die_last_row]
+    lists = [[row[col - 1] if len(row) >= col else "" for row in die_rows] for col in index.die_columns.values()]
+    table = die_table.DieTable.from_lists(names, lists)
+    fallout.count_table(table, index.theoretical_num)
+    table.min_by(("X", "Y"), "ET", where=table["ET"].present())
+
+
+STAGE_FUNCS = {name: globals()[f"stage_{name}"] for name in STAGES}
+
+
+# --- Measurement ---
+def measure(func, ctx, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func(ctx)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    func(ctx)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_kb": round(peak / 1024)}
+
+
+def run_size(dies, args, work_dir):
+    csv_path = os.path.join(work_dir, f"bench_{dies}.wmap.csv")
+    synth.generate(csv_path, dies=dies, ets=args.ets, marks=args.marks, duts=args.duts,
+                   slots=args.slots, seed=args.seed)
+    ctx = Context(csv_path, work_dir)
+    results = {}
+    for name in STAGES:
+        results[name] = measure(STAGE_FUNCS[name], ctx, args.repeat)
+        print(f"  {name:<11}{results[name]['seconds']:>9.3f} s{results[name]['peak_kb']:>12,} KB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for size, stages in results.items():
+        for name, now in stages.items():
+            then = baseline.get(size, {}).get(name)
+            if not then:
+                continue
+            if now["seconds"] > then["seconds"] * (1 + tolerance) + MIN_SLACK_S:
+                failures.append(f"{size} dies / {name}: {now['seconds']:.3f} s vs baseline {then['seconds']:.3f} s")
+            if now["peak_kb"] > then["peak_kb"] * (1 + tolerance) + MIN_SLACK_KB:
+                failures.append(f"{size} dies / {name}: {now['peak_kb']:,} KB vs baseline {then['peak_kb']:,} KB")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Time every processing stage on synthetic wafermaps.")
+    parser.add_argument("--dies", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="die counts to benchmark (default: %(default)s)")
+    parser.add_argument("--ets", type=int, default=60, help="distinct failing End Test numbers")
+    parser.add_argument("--marks", default=synth.DEFAULT_MARKS, help="C1_MARK alphabet")
+    parser.add_argument("--duts", type=int, default=128, help="DUTs per touchdown")
+    parser.add_argument("--slots", type=int, default=1, help="wafer sections per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown ratio (default: %(default)s)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="wafer_bench_") as work_dir:
+        for dies in args.dies:
+            print(f"\n{dies:,} dies")
+            results[str(dies)] = run_size(dies, args, work_dir)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "settings": {k: getattr(args, k) for k in ("ets", "marks", "duts", "slots", "seed", "repeat")},
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"\n✅ Baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️ No baseline yet (run with --save-baseline to record one).")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print("\n❌ Regressions past the baseline:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\n✅ No stage regressed past the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
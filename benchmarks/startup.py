@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup benchmark
+# Launches the GUI script in fresh interpreters (cold imports every time) and
+# measures:
+#   import   - executing the script's module level (imports + class body)
+#   window   - import + building the Tk window up to its first paint
+#   warmup   - background import of the processing backends (openpyxl, NumPy)
+# plus the heaviest modules from -X importtime. The median of --repeat
+# launches is checked against the budgets; exit code 1 when over budget.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --repeat 10 --window-budget-ms 400
+#
+# Without a display the window step is skipped and only the import budget
+# is checked.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(ROOT, "Deliverables Automation Tool v1.1.1.py")
+IMPORT_BUDGET_MS = 150
+WINDOW_BUDGET_MS = 500
+TOP_IMPORTS = 5
+
+CHILD = r"""
+import importlib.util, json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, ROOT)
+spec = importlib.util.spec_from_file_location("deliverables_gui", GUI_SCRIPT)
+gui = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gui)
+result = {"import_ms": (time.perf_counter() - t0) * 1000, "window_ms": None, "warmup_ms": None}
+try:
+    root = gui.tk.Tk()
+except gui.tk.TclError as e:
+    result["error"] = str(e).splitlines()[0]
+else:
+    app = gui.AutomatingDeliverables(root)
+    root.update()
+    result["window_ms"] = (time.perf_counter() - t0) * 1000
+    app.jobs.shutdown(timeout=5)
+    root.destroy()
+if hasattr(gui, "warmup"):   # scripts before the lazy imports have no warm-up
+    t1 = time.perf_counter()
+    gui.warmup.start().join()
+    result["warmup_ms"] = (time.perf_counter() - t1) * 1000
+print(json.dumps(result))
+"""
+
+
+def launch(gui_script):
+    code = f"ROOT = {ROOT!r}\nGUI_SCRIPT = {gui_script!r}\n" + CHILD
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "startup failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), _import_times(proc.stderr)
+
+
+def _import_times(stderr):
+    # "import time: self [us] | cumulative | name" -> {top-level module: cumulative ms}
+    times = {}
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if name.startswith(" ") and not name.startswith("  "):   # top level: one space of indent
+            times[name.strip()] = int(parts[1]) / 1000
+    return times
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Measure the GUI's cold start against a budget.")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh launches (median is kept)")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--window-budget-ms", type=float, default=WINDOW_BUDGET_MS)
+    parser.add_argument("--script", default=GUI_SCRIPT, help="GUI script (default: current version)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    runs = []
+    imports = {}
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result, import_times = launch(args.script)
+        result["process_ms"] = (time.perf_counter() - started) * 1000
+        runs.append(result)
+        for name, ms in import_times.items():
+            imports.setdefault(name, []).append(ms)
+
+    report = {key: _median([run[key] for run in runs]) for key in ("import_ms", "window_ms", "warmup_ms", "process_ms")}
+    report["top_imports"] = dict(sorted(((name, _median(ms)) for name, ms in imports.items()),
+                                        key=lambda item: -item[1])[:TOP_IMPORTS])
+
+    print(f"\n{os.path.basename(args.script)} ({args.repeat} cold launches, median)")
+    print(f"  import     {report['import_ms']:>9.1f} ms   (budget {args.import_budget_ms:g} ms)")
+    if report["window_ms"] is not None:
+        print(f"  window     {report['window_ms']:>9.1f} ms   (budget {args.window_budget_ms:g} ms)")
+    else:
+        print(f"  window          n/a      ({runs[0].get('error', 'no display')})")
+    if report["warmup_ms"] is not None:
+        print(f"  warmup     {report['warmup_ms']:>9.1f} ms   (background)")
+    print(f"  process    {report['process_ms']:>9.1f} ms   (interpreter start to exit)")
+    print("  heaviest imports (warm-up included):")
+    for name, ms in report["top_imports"].items():
+        print(f"    {name:<28}{ms:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    failures = []
+    if report["import_ms"] > args.import_budget_ms:
+        failures.append(f"import {report['import_ms']:.1f} ms > {args.import_budget_ms:g} ms")
+    if report["window_ms"] is not None and report["window_ms"] > args.window_budget_ms:
+        failures.append(f"window {report['window_ms']:.1f} ms > {args.window_budget_ms:g} ms")
+    if failures:
+        print("\n❌ Over the startup budget:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\n✅ Startup within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import argparse
+import csv
+import math
+import os
+import random
+
+# Synthetic qccsvout (.wmap.csv) generator
+# Writes files laid out like DEMO_WAFERMAP_08.wmap.csv (BOM, CRLF, header
+# block, SLOT, THEORETICAL_NUM, TSNO..LOLIMIT table, X..ET die table) with
+# configurable size, so every stage can be measured from 1k to 500k dies.
+#
+#   python -m benchmarks.synth bench.wmap.csv --dies 100000 --ets 60 --slots 2
+
+FILE_HEAD = [
+    "#VERSION", "##Create qccsvout Ver 2.3.1c. (QC to CSV converter)", "#FILE_TYPE",
+    "#FILE_SUM", "#FILE_NO", "#FILE_HEAD", "QC_VERSION", "F_TYPE",
+]
+COMMON_HEAD = [
+    "#COMMON_HEAD", "TESTER_NAME", "TCP_NAME", "ST_NO", "FACTORY", "CHIP_NAME", "KEY_NO",
+    "LOT_NO", "PROCESS_CODE", "TESTPRO_NAME", "ROM_NO", "PROBE_CARD", "OPERATOR_NAME",
+    "HOSTNAME", "PRE_POST", "QC_FLAG", "SENSESW", "TIME", "LOTSTART_TIME", "START_TIME",
+    "END_TIME", "PASS_CHIP_NUM", "FAIL_CHIP_NUM", "WAFER_NUM",
+]
+DIE_HEADER = ["X", "Y", "INDEX", "DUT", "G/N", "C1", "C1_MARK", "C2", "C2_MARK", "FT", "ET"]
+PASS_MARKS = "/*$"                 # ET 0 marks, "/" for most dies like the demo
+DEFAULT_MARKS = "HvIKLaMe1bDd8VpwgS5"
+LIMIT_KINDS = [
+    ("N", "NON", "NON"),
+    ("V", " 1.23 V", " 1.17 V"),
+    ("A", " 33.0uA", " 28.0uA"),
+    ("S", " 12.3nS", " 11.7nS"),
+]
+
+
+def die_positions(dies, x0=14, y0=89):
+    # Roughly round wafer: the dies closest to the centre of a square grid
+    side = math.ceil(math.sqrt(dies * 4 / math.pi)) + 2
+    c = (side - 1) / 2
+    cells = sorted(((x - c) ** 2 + (y - c) ** 2, x, y) for x in range(side) for y in range(side))
+    chosen = sorted((x, y) for _, x, y in cells[:dies])
+    return [(x0 + x, y0 + y) for x, y in chosen]
+
+
+def end_tests(count):
+    # 1001.. like the demo, plus a block of 5xxxx test numbers
+    small = (count + 1) // 2
+    return [1001 + i for i in range(small)] + [50001 + i for i in range(count - small)]
+
+
+def generate(path, dies=7458, ets=60, marks=DEFAULT_MARKS, duts=128, slots=1,
+             fail_rate=0.07, lot_no="BENCH01", seed=0, limits=True):
+    """Write one synthetic wafermap CSV; returns its path.
+
+    limits=False leaves out the TSNO..LOLIMIT table (no End Test reference).
+    """
+    rng = random.Random(seed)
+    tests = end_tests(ets)
+    # Every failing ET has one C1_MARK (as on real bins); a few common ETs
+    # carry most of the fallout
+    mark_of = {et: marks[i % len(marks)] for i, et in enumerate(tests)}
+    weights = [1.0 / (i + 1) for i in range(len(tests))]
+    positions = die_positions(dies)
+
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\r\n")
+        for key in FILE_HEAD:
+            writer.writerow([key])
+
+        for slot in range(1, slots + 1):
+            if slot > 1:
+                writer.writerow([])   # blank line between wafer sections
+            for key in COMMON_HEAD:
+                writer.writerow([key, lot_no] if key == "LOT_NO" else [key])
+            writer.writerow(["SLOT"])
+            writer.writerow([slot])
+            writer.writerow(["THEORETICAL_NUM", "FILE", dies])
+
+            if limits:
+                writer.writerow(["TSNO", "TESTNO", "COMMENT", "MODE", "HILIMIT", "LOLIMIT"])
+                for i, et in enumerate(tests, start=1):
+                    mode, hi, lo = LIMIT_KINDS[i % len(LIMIT_KINDS)]
+                    writer.writerow([f"T{i}", et, f"Dummy_Test_{et}", mode, hi, lo])
+
+            writer.writerow(DIE_HEADER)
+            failing = rng.choices(tests, weights, k=dies)
+            for i, (x, y) in enumerate(positions):
+                if rng.random() < fail_rate:
+                    et = failing[i]
+                    row = [x, y, i // duts + 1, i % duts + 1, "NG", 72, mark_of[et], 0, "", et, et]
+                else:
+                    mark = "/" if rng.random() < 0.97 else rng.choice(PASS_MARKS[1:])
+                    row = [x, y, i // duts + 1, i % duts + 1, "GO", 47, mark, 0, "", 0, 0]
+                writer.writerow(row)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synth",
+                                     description="Write a synthetic qccsvout wafermap CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--dies", type=int, default=7458, help="dies per wafer (default: %(default)s)")
+    parser.add_argument("--ets", type=int, default=60, help="distinct failing End Test numbers")
+    parser.add_argument("--marks", default=DEFAULT_MARKS, help="C1_MARK alphabet for failing dies")
+    parser.add_argument("--duts", type=int, default=128, help="DUTs per touchdown")
+    parser.add_argument("--slots", type=int, default=1, help="wafer sections (SLOT) in the file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate(args.path, args.dies, args.ets, args.marks, args.duts, args.slots, seed=args.seed)
+    print(f"✅ {args.path}  ({os.path.getsize(args.path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Deliverables Automation Tool - processing helpers
+# Excel-free building blocks used by the Tkinter front end
+# (Deliverables Automation Tool v1.1.1.py).
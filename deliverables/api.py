@@ -0,0 +1,380 @@
+import os
+import time
+from collections import namedtuple
+
+from deliverables import (die_table, endtest, fallout, lot, mark_map, output, palette, pipeline, sections,
+                          trace, wafer_cache, wafer_image, wafermap, wmap_csv)
+
+# Processing library (no Tk, no Excel)
+# A wafermap CSV is parsed once into a WaferFile that keeps everything the
+# steps need in memory - section index, typed die columns, ET -> C1_MARK
+# mapping, die table - so scripts, the batch mode and the GUI ask the same
+# object for results instead of re-reading the CSV or the workbook per step.
+#
+#   wafer = api.load("DEMO_WAFERMAP_08.wmap.csv")
+#   wafer.c1_marks                        # dropdown items
+#   report = wafer.fallout("a")           # End Test No. / Count / Fallout% table
+#   wafer.end_test(report.top_et)         # TSNO .. LOLIMIT reference row
+#   wafer.wafermap().block                # "Min of ET" grid, Y rows / X columns
+#   wafer.write_workbook(marks=["ALL"])   # data, wafermap and fallout sheets, one save
+#
+# Results are namedtuples of plain values (picklable; _asdict() for JSON).
+# Problems with the file raise ValueError, like the pipeline steps.
+# process() runs every step for one file and returns a plain dict instead
+# of raising (batch and service workers).
+
+ALL_MARKS = pipeline.ALL_MARKS
+
+EndTest = namedtuple("EndTest", "tsno testno comment mode hilimit lolimit")
+# table: header row, [ET, count, "x.xx%"] rows by count, Grand Total row
+Fallout = namedtuple("Fallout", "mark counts table top_et end_test")
+# block: pivot_block grid; colors: {(row, col) in block: (r, g, b)}
+Wafermap = namedtuple("Wafermap", "slot sheet_name block et_to_c1 colors warnings")
+
+
+def _noop(*args):
+    pass
+
+
+def _log_noop(message, color=None):
+    pass
+
+
+def load(file_path, cache=None, check=_noop):
+    """WaferFile of file_path: from the wafer cache, else one pass over the CSV.
+
+    A fresh parse is stored in the cache for the next run.
+    """
+    cache = cache or wafer_cache.default_cache()
+    try:
+        data = cache.get(file_path)
+    except OSError:
+        data = None
+    if data is None:
+        with trace.span("csv_read"):
+            section_index = sections.SectionIndex()
+            data = wafer_cache.WaferData(section_index)
+            for row_num, _ in enumerate(data.record(section_index.scan(wmap_csv.iter_rows(file_path))), start=1):
+                if row_num % 1000 == 0:
+                    check()
+        try:
+            cache.put(file_path, data)
+        except OSError:
+            pass   # cache is an optimisation only
+    return WaferFile(file_path, data)
+
+
+class WaferFile:
+    """One parsed wafermap CSV and the results derived from it."""
+
+    def __init__(self, file_path, data):
+        self.file_path = file_path
+        self.data = data                          # wafer_cache.WaferData
+        self.section_index = data.section_index
+        self.out_file, self.sheet_name = pipeline.output_paths(file_path)
+        self._table = None
+        self._mark_map = None
+        self._counts = None
+        self._wafermap = None
+
+    def __repr__(self):
+        return f"<WaferFile {self.sheet_name} W#{self.slot_str} {self.die_count} dies>"
+
+    # --- File summary ---
+    @property
+    def lot_no(self):
+        return str(self.section_index.field_values.get("LOT_NO") or "").strip()
+
+    @property
+    def slot(self):
+        try:
+            return int(float(self.section_index.slot))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def slot_str(self):
+        return str(self.slot).zfill(2) if self.slot is not None else "--"
+
+    @property
+    def theoretical_num(self):
+        return self.section_index.theoretical_num
+
+    @property
+    def die_count(self):
+        return self.section_index.die_count
+
+    @property
+    def c1_marks(self):
+        """C1_MARK values of the die table, file order (dropdown items)."""
+        self.section_index.require("die")
+        if not self.section_index.column("ET", "END TEST NO."):
+            return list(self.section_index.c1_marks)
+        return list(self.mark_map.marks)
+
+    def summary(self):
+        return {"file": self.file_path, "lot_no": self.lot_no, "slot": self.slot,
+                "theoretical_num": self.theoretical_num, "dies": self.die_count, "c1_marks": self.c1_marks}
+
+    # --- Shared in-memory structures ---
+    def rows(self, start=1):
+        # Same rows as wmap_csv.iter_rows(file_path, start); ragged die
+        # tables are not kept column-wise and come from the file again
+        if self.data.cacheable:
+            return self.data.iter_rows(start)
+        return wmap_csv.iter_rows(self.file_path, start)
+
+    @property
+    def table(self):
+        """die_table.DieTable of the file (None without NumPy)."""
+        if self._table is None and die_table.available():
+            self._table = die_table.remember(
+                self.file_path, die_table.build(self.file_path, self.section_index, data=self.data))
+        return self._table
+
+    @property
+    def mark_map(self):
+        """ET -> C1_MARK mapping (mark_map.MarkMap), shared with the pipeline steps."""
+        if self._mark_map is None:
+            with trace.span("mapping_build"):
+                if self.table is not None:
+                    built = mark_map.MarkMap.from_table(self.table, self.table.name("ET", "END TEST NO."))
+                else:
+                    built = mark_map.build(self.file_path, self.section_index, data=self.data)
+            self._mark_map = mark_map.remember(self.file_path, built)
+        return self._mark_map
+
+    def conflict_lines(self):
+        return self.mark_map.conflict_lines()
+
+    # --- Fallout ---
+    def _counts_by_mark(self):
+        if self._counts is None:
+            index = self.section_index
+            index.require("die")
+            with trace.span("fallout_count"):
+                if self.table is not None and index.column("ET") and index.column("FT"):
+                    self._counts = fallout.count_table(self.table, index.theoretical_num)[0]
+                else:
+                    self._counts = fallout.count_all_marks(
+                        self.rows(index.die_header_row), theoretical_num=index.theoretical_num)[0]
+        return self._counts
+
+    def fallout(self, mark, end_test=True):
+        """Fallout for one C1_MARK, with the End Test row of its top ET.
+
+        end_test is None when the file has no TSNO..LOLIMIT table.
+        """
+        marks = self.c1_marks
+        if mark not in marks:
+            raise ValueError(f"'{mark}' not found in C1_MARK items {sorted(marks)}")
+        counts = self._counts_by_mark().get(mark, {})
+        table = fallout.build_fallout_table(counts, self.theoretical_num)
+        top_et = table[1][0] if len(table) > 2 else None
+        row = None
+        if end_test and top_et is not None and self.section_index.limits_header_row is not None:
+            row = self.end_test(top_et)
+        return Fallout(mark, counts, table, top_et, row)
+
+    def fallout_all(self, marks=(ALL_MARKS,), end_test=True, log=_log_noop):
+        """{mark: Fallout} from one count over (C1_MARK, ET); ALL_MARKS = every mark.
+
+        Marks that are not in the file are logged and left out.
+        """
+        found = self.c1_marks
+        marks = found if ALL_MARKS in marks else list(marks)
+        reports = {}
+        for mark in marks:
+            if mark not in found:
+                log(f"⚠️ Selected '{mark}' not found in C1_MARK items {sorted(found)}", pipeline.RED)
+                continue
+            reports[mark] = self.fallout(mark, end_test)
+        return reports
+
+    # --- End Test reference ---
+    def end_test(self, end_test_no):
+        """EndTest row for end_test_no (TESTNO column), or None when not listed."""
+        with trace.span("lookup"):
+            row = endtest.lookup_end_test(self.file_path, self.section_index,
+                                          endtest.normalize_testno(end_test_no), rows=self.rows())
+        return EndTest(*row) if row is not None else None
+
+    # --- Wafermap ---
+    def wafermap(self):
+        """Wafermap grid of the wafer with its die colors."""
+        if self._wafermap is None:
+            self.section_index.require("slot")
+            if self.slot is None:
+                raise ValueError("SLOT value below header is empty")
+            with trace.span("grid_build"):
+                grid = pipeline.wafer_grid(self.file_path, self.section_index, table=self.table, data=self.data)
+                block = grid.block()
+            et_to_c1 = dict(self.mark_map.et_to_c1)
+            groups, warnings = wafermap.color_grid(block, et_to_c1, self.palette)
+            colors = {(r - 1, c - 1): rgb for rgb, cells in groups.items() for r, c in cells}
+            self._wafermap = Wafermap(self.slot, grid.sheet_name, block, et_to_c1, colors, list(dict.fromkeys(warnings)))
+        return self._wafermap
+
+    @property
+    def palette(self):
+        return palette.for_fields(self.section_index.field_values)
+
+    def wafermap_image(self, fmt="png", cell_px=wafer_image.CELL_PX):
+        """PNG bytes or SVG text of the wafermap."""
+        grid = self.wafermap()
+        image = wafer_image.WaferImage(grid.block, grid.et_to_c1, self.palette)
+        if fmt == "png":
+            return wafer_image.to_png(image, cell_px)
+        if fmt == "svg":
+            return wafer_image.to_svg(image, cell_px)
+        raise ValueError(f"Unknown image format '{fmt}' (png, svg)")
+
+    @property
+    def sources(self):
+        return [self.file_path]   # as lot.Wafer, for pipeline.image_path_base
+
+    def write_images(self, formats=("png",), out_dir=None, log=_log_noop, all_slots=True):
+        """PNG / SVG wafermap files, next to the CSV unless out_dir; returns their paths.
+
+        all_slots: a lot file's other SLOT sections get their images too
+        (split from the parsed rows, not the CSV).
+        """
+        if self.slot is None:
+            log("\n⚠️ No wafer with a SLOT value found", pipeline.RED)
+            return []
+        out_dir = out_dir or os.path.dirname(os.path.abspath(self.file_path))
+        os.makedirs(out_dir, exist_ok=True)
+
+        paths = []
+        index = self.section_index
+        if all_slots and index.last_row > index.die_last_row:   # rows past the first die table
+            for wafer in sorted(self.wafers(log).values(), key=lambda w: (w.lot_no, w.slot)):
+                with trace.span("render"):
+                    written, warnings = wafer_image.write_images(
+                        pipeline.image_path_base(out_dir, wafer), wafer.block(), wafer.et_to_c1, formats,
+                        wafer.palette
+                    )
+                for message in dict.fromkeys(warnings):
+                    log(message, pipeline.RED)
+                paths.extend(written)
+        else:
+            base = pipeline.image_path_base(out_dir, self)
+            with trace.span("render"):
+                for fmt in formats:
+                    image = self.wafermap_image(fmt)
+                    path = f"{base}.{fmt}"
+                    with open(path, "wb") as f:
+                        f.write(image if isinstance(image, bytes) else image.encode("utf-8"))
+                    paths.append(path)
+            for message in self.wafermap().warnings:
+                log(message, pipeline.RED)
+
+        log(f"\n✅ {len(paths)} wafermap image(s) saved in: {out_dir}")
+        return paths
+
+    def wafers(self, log=None):
+        """{(lot_no, slot): lot.Wafer} for every SLOT section of the file."""
+        return lot.split_wafers(self.file_path, log=log, rows=self.rows())
+
+    # --- Workbook ---
+    def workbook_sheets(self, marks=(ALL_MARKS,), wafermap_sheet=True, one_sheet=False, log=_log_noop,
+                        reports=None):
+        """Output sheets (wafermap first, then fallout) described in memory.
+
+        reports: fallout_all() result when the caller already has it. The
+        wafermap sheet is left out, with a warning, when the file has no
+        SLOT value.
+        """
+        sheets = []
+        if wafermap_sheet and self.slot is None:
+            log("\n⚠️ SLOT value not found, wafermap sheet skipped", pipeline.RED)
+        elif wafermap_sheet:
+            grid = self.wafermap()
+            for message in self.conflict_lines():
+                log(message, pipeline.AMBER)
+            with trace.span("sheet_build"):
+                sheet = output.Sheet(grid.sheet_name, after_data=True)
+                wafermap.fill_wafermap_sheet(sheet, grid.block, grid.et_to_c1, self.palette)
+            for message in grid.warnings:
+                log(message, pipeline.RED)
+            sheets.append(sheet)
+
+        if reports is None:
+            reports = self.fallout_all(marks, log=log) if marks else {}
+        if reports:
+            sheets.extend(pipeline.fallout_sheets(
+                [(mark, r.counts, r.table, list(r.end_test) if r.end_test else None) for mark, r in reports.items()],
+                single=len(reports) == 1, one_sheet=one_sheet))
+        return sheets
+
+    def write_workbook(self, out_file=None, marks=(ALL_MARKS,), wafermap_sheet=True, one_sheet=False,
+                       backend=None, session=None, log=_log_noop, check=_noop, reports=None):
+        """Data sheet plus wafermap and fallout sheets, written in one save.
+
+        The section index goes next to the workbook, so the GUI actions can
+        continue from it. Returns the workbook path.
+        """
+        out_file = out_file or self.out_file
+        sheets = self.workbook_sheets(marks, wafermap_sheet, one_sheet, log, reports)
+        check()
+        with trace.span("save"):
+            output.get(backend, session).write_workbook(
+                out_file, sheets, data=(self.sheet_name, self.rows()), check=check)
+            self.section_index.save(out_file)
+        return out_file
+
+
+def process(file_path, out_file=None, marks=(ALL_MARKS,), wafermap=True, images=(), image_dir=None,
+            one_sheet=False, backend=None, all_slots=True, action="Process", loader=load):
+    """Every step for one CSV, parsed once: fallout, End Test rows, workbook, images.
+
+    Returns a plain dict (picklable, JSON-ready): ok, error ("<step>:
+    <message>") instead of an exception, summary, fallout {mark: table},
+    end_test {mark: EndTest fields or None}, wafermap sheet, out_file,
+    images, log lines and seconds. loader returns the WaferFile (load(),
+    or a worker's cache of them).
+    """
+    started = time.perf_counter()
+    log_lines = []
+
+    def log(message, color=None):
+        log_lines.append(message.strip("\n"))
+
+    out_file = out_file or pipeline.output_paths(file_path)[0]
+    result = {"file": file_path, "ok": False, "error": None, "summary": None, "fallout": {}, "end_test": {},
+              "wafermap": None, "out_file": None, "images": [], "log": log_lines}
+    step = "load"
+    try:
+        with trace.run(action, file_path, out_file):
+            with trace.span("load"):
+                wafer = loader(file_path)
+            result["summary"] = wafer.summary()
+
+            step = "fallout"
+            with trace.span("fallout"):
+                reports = wafer.fallout_all(marks, log=log)
+            for mark, report in reports.items():
+                result["fallout"][mark] = report.table
+                result["end_test"][mark] = report.end_test._asdict() if report.end_test else None
+
+            if wafermap and wafer.slot is not None:
+                step = "wafermap"
+                result["wafermap"] = wafer.wafermap().sheet_name
+
+            # Data, wafermap and fallout sheets in a single save
+            step = "save"
+            result["out_file"] = wafer.write_workbook(
+                out_file, marks, wafermap_sheet=wafermap, one_sheet=one_sheet, backend=backend, log=log,
+                reports=reports
+            )
+
+            if images:
+                step = "images"
+                with trace.span("images"):
+                    result["images"] = wafer.write_images(images, image_dir, log=log, all_slots=all_slots)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{step}: {e}"
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
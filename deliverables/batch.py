@@ -0,0 +1,133 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from deliverables import api, lot, output, pipeline, trace
+
+# Headless batch mode
+# Runs the full pipeline (Convert -> fallout -> End Test check -> wafermap)
+# over a folder or glob of .wmap CSVs in a process pool, one file per task,
+# and reports success / failure per file.
+#
+#   python -m deliverables.batch D:\drops\nightly --mark ALL
+#   python -m deliverables.batch D:\drops\nightly --mark ALL --one-sheet
+#   python -m deliverables.batch "D:\drops\*.wmap.csv" --mark a --mark 1 -j 8
+#   python -m deliverables.batch D:\drops --no-wafermap        (fallout only)
+#   python -m deliverables.batch D:\drops --lot                (all slots per LOT_NO)
+#   python -m deliverables.batch D:\drops --no-wafermap --images png svg
+#   python -m deliverables.batch D:\drops --output xlsxwriter   (streaming writer)
+
+ALL = pipeline.ALL_MARKS
+
+
+def find_inputs(targets, pattern="*.wmap.csv"):
+    files = []
+    for target in targets:
+        if os.path.isdir(target):
+            files.extend(glob.glob(os.path.join(target, pattern)))
+        else:
+            files.extend(glob.glob(target))
+    return sorted(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+def process_file(file_path, marks=(ALL,), wafermap=True, images=(), one_sheet=False, backend=None):
+    """Run every step for one CSV (parsed once, see api.process); returns a plain dict (picklable)."""
+    return api.process(file_path, marks=marks, wafermap=wafermap, images=images, one_sheet=one_sheet,
+                       backend=backend, action="Batch")
+
+
+def process_lot(lot_key, file_paths, images=(), backend=None):
+    """All wafer maps of one lot in a single workbook; plain dict result."""
+    started = time.perf_counter()
+    log_lines = []
+
+    def log(message, color=None):
+        log_lines.append(message.strip("\n"))
+
+    result = {"file": lot_key, "ok": False, "error": None, "files": file_paths,
+              "sheets": [], "images": [], "log": log_lines}
+    try:
+        with trace.run("Batch lot", lot_key) as run:
+            run.out_file, result["sheets"] = pipeline.generate_lot_wafermaps(file_paths, log=log, backend=backend)
+            if images:
+                with trace.span("images"):
+                    result["images"] = pipeline.export_wafermap_images(file_paths, images, log=log)
+        result["out_file"] = run.out_file
+        result["ok"] = bool(result["sheets"])
+        if not result["ok"]:
+            result["error"] = "no wafer with a SLOT value found"
+    except Exception as e:
+        result["error"] = f"lot: {e}"
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m deliverables.batch",
+        description="Generate deliverables for a folder or glob of wafermap CSVs."
+    )
+    parser.add_argument("inputs", nargs="+", help="folders and/or glob patterns of .wmap CSV files")
+    parser.add_argument("--pattern", default="*.wmap.csv", help="file pattern used inside folders (default: %(default)s)")
+    parser.add_argument("--mark", action="append", dest="marks",
+                        help="C1_MARK to report (repeatable); ALL = every mark in the file (default)")
+    parser.add_argument("--one-sheet", action="store_true",
+                        help=f"write every mark's fallout table on one '{pipeline.ALL_MARKS_SHEET}' sheet")
+    parser.add_argument("--no-wafermap", action="store_true", help="skip the wafermap sheet")
+    parser.add_argument("--lot", action="store_true",
+                        help="lot mode: one workbook per LOT_NO with every wafer (SLOT) map")
+    parser.add_argument("--images", nargs="+", choices=pipeline.IMAGE_FORMATS, default=[],
+                        help="also export every wafer map as an image (png and/or svg)")
+    parser.add_argument("--output", choices=output.BACKENDS, default=output.default_name(),
+                        help="workbook writer (default: %(default)s; DELIVERABLES_OUTPUT sets the default)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    args = parser.parse_args(argv)
+
+    files = find_inputs(args.inputs, args.pattern)
+    if not files:
+        print("⚠️ No wafermap CSV files found.")
+        return 2
+
+    marks = tuple(args.marks or [ALL])
+    if args.lot:
+        tasks = [(process_lot, key, lot_files, tuple(args.images), args.output)
+                 for key, lot_files in lot.group_by_lot(files).items()]
+        print(f"ℹ️ {len(files)} file(s) in {len(tasks)} lot(s)")
+    else:
+        tasks = [(process_file, f, marks, not args.no_wafermap, tuple(args.images), args.one_sheet, args.output)
+                 for f in files]
+    workers = max(1, min(args.jobs, len(tasks)))
+    print(f"ℹ️ Processing {len(tasks)} task(s) with {workers} worker(s)...")
+
+    started = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(*task): task[1] for task in tasks}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:   # worker process died
+                result = {"file": futures[future], "ok": False, "error": str(e), "seconds": 0}
+
+            name = os.path.basename(result["file"])
+            image_note = f", {len(result['images'])} image(s)" if result.get("images") else ""
+            if result["ok"] and "sheets" in result:
+                print(f"✅ {name}  ({result['seconds']:.1f}s, {len(result['sheets'])} wafer(s){image_note} -> {result['out_file']})")
+            elif result["ok"]:
+                print(f"✅ {name}  ({result['seconds']:.1f}s, {len(result['fallout'])} mark(s){image_note})")
+            else:
+                failures += 1
+                print(f"❌ {name}  {result['error']}")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nDone: {len(tasks) - failures} succeeded, {failures} failed in {elapsed:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:   # callers fall back to the row-based steps
+    np = None
+
+from deliverables import wafer_cache
+
+# Die table store
+# The die table of one CSV held column by column: numeric columns (X, Y,
+# INDEX, DUT, C1, C2, FT, ET) as NumPy arrays in the narrowest integer type
+# that fits (float64 for decimal columns), text columns (G/N, C1_MARK,
+# C2_MARK) and any column with mixed / blank values as categorical codes
+# plus a small lookup list. A die costs a few dozen bytes instead of a list
+# of Python objects (~500 bytes).
+#
+# Analysis steps (ET -> C1_MARK mapping, fallout group-by, Min of ET grid)
+# run on the primitives below. Tables are kept in memory per CSV, like the
+# parsed rows in the wafer cache. Without NumPy, available() is False and
+# the callers use their row-based code.
+
+MEMORY_ENTRIES = 2
+
+_memory = OrderedDict()   # wafer_cache.file_key -> DieTable
+_lock = threading.Lock()
+
+
+def available():
+    return np is not None
+
+
+def _narrow(values):
+    # Smallest signed integer type holding every value
+    if not len(values):
+        return values.astype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+class NumericColumn:
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def values(self):
+        return self.data.tolist()
+
+    def take(self, idx):
+        return self.data[idx].tolist()
+
+    def present(self):
+        return np.ones(len(self.data), dtype=bool)
+
+    def numeric(self):
+        return self.data.astype(np.float64)
+
+    def codes(self):
+        # (codes, distinct Python values), distinct values in first-seen order
+        uniques, first, inverse = np.unique(self.data, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return rank[inverse], uniques[order].tolist()
+
+
+class Categorical:
+    def __init__(self, codes, categories):
+        self.data = codes              # int8 / int16 / int32 codes
+        self.categories = categories   # Python values, first-seen order
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def values(self):
+        return list(map(self.categories.__getitem__, self.data.tolist()))
+
+    def take(self, idx):
+        return list(map(self.categories.__getitem__, self.data[idx].tolist()))
+
+    def present(self):
+        blank = [i for i, value in enumerate(self.categories) if value == ""]
+        return ~np.isin(self.data, blank)
+
+    def numeric(self):
+        lookup = np.array([value if type(value) in (int, float) else np.nan for value in self.categories],
+                          dtype=np.float64)
+        return lookup[self.data] if len(lookup) else np.empty(0)
+
+    def codes(self):
+        return self.data.astype(np.int64), list(self.categories)
+
+
+def column_from_values(values):
+    """NumericColumn when every value is an int (or every value a float), else Categorical."""
+    types = set(map(type, values))
+    if types == {int}:
+        try:
+            return NumericColumn(_narrow(np.array(values, dtype=np.int64)))
+        except OverflowError:
+            pass
+    elif types == {float}:
+        return NumericColumn(np.array(values, dtype=np.float64))
+
+    codes = {}
+    categories = []
+    data = []
+    for value in values:
+        key = (value.__class__, value)
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(categories)
+            categories.append(value)
+        data.append(code)
+    return Categorical(_narrow(np.array(data, dtype=np.int64)), categories)
+
+
+def _from_cached_column(column):
+    # wafer_cache._Column -> NumericColumn / Categorical without a Python list
+    if column.kind == "q":
+        return NumericColumn(_narrow(np.frombuffer(column.data, dtype=np.int64).copy()))
+    if column.kind == "d":
+        return NumericColumn(np.frombuffer(column.data, dtype=np.float64).copy())
+    return Categorical(_narrow(np.frombuffer(column.data, dtype=np.int32).copy()), list(column.categories))
+
+
+class DieTable:
+    def __init__(self, columns):
+        self.columns = columns          # column name (upper) -> column
+        self.die_count = len(next(iter(columns.values()))) if columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name.upper()]
+
+    def __contains__(self, name):
+        return name.upper() in self.columns
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def name(self, *names):
+        # First of names present in the table (column aliases), else None
+        for name in names:
+            if name.upper() in self.columns:
+                return name.upper()
+        return None
+
+    # --- Building ---
+    @classmethod
+    def from_lists(cls, names, lists):
+        return cls({name: column_from_values(values) for name, values in zip(names, lists)})
+
+    @classmethod
+    def from_wafer_data(cls, data, section_index):
+        columns = {}
+        for name, col in section_index.die_columns.items():
+            if col - 1 < len(data.columns):
+                columns[name] = _from_cached_column(data.columns[col - 1])
+        return cls(columns)
+
+    # --- Analysis primitives ---
+    def count_pairs(self, first, second, where=None):
+        """{(first value, second value): dies}, optionally for rows in where."""
+        a_codes, a_values = self[first].codes()
+        b_codes, b_values = self[second].codes()
+        keys = a_codes * max(1, len(b_values)) + b_codes
+        if where is not None:
+            keys = keys[where]
+        uniques, counts = np.unique(keys, return_counts=True)
+        width = max(1, len(b_values))
+        return {(a_values[k // width], b_values[k % width]): n
+                for k, n in zip(uniques.tolist(), counts.tolist())}
+
+    def last_of(self, key, value, where=None):
+        """{key value: value of the last row carrying it}, ordered by that row."""
+        k_codes, k_values = self[key].codes()
+        rows = np.arange(self.die_count)
+        if where is not None:
+            k_codes, rows = k_codes[where], rows[where]
+        _, last = np.unique(k_codes[::-1], return_index=True)
+        last = np.sort(len(k_codes) - 1 - last)   # ordered by row
+        return dict(zip((k_values[k] for k in k_codes[last].tolist()), self[value].take(rows[last])))
+
+    def min_by(self, keys, value, where=None):
+        """{(key values...): lowest numeric value, or None when none is numeric}."""
+        combined = np.zeros(self.die_count, dtype=np.int64)
+        key_values = []
+        for name in keys:
+            codes, values = self[name].codes()
+            combined = combined * max(1, len(values)) + codes
+            key_values.append(values)
+        numbers = self[value].numeric()
+        rows = np.arange(self.die_count)
+        if where is not None:
+            combined, numbers, rows = combined[where], numbers[where], rows[where]
+
+        order = np.lexsort((numbers, combined))   # NaN (not numeric) sorts last
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = combined[order][1:] != combined[order][:-1]
+        picked = order[first]
+
+        result = {}
+        raw = self[value].take(rows[picked])
+        for code, number, raw_value in zip(combined[picked].tolist(), numbers[picked].tolist(), raw):
+            key = []
+            for values in reversed(key_values):
+                code, k = divmod(code, max(1, len(values)))
+                key.append(values[k])
+            result[tuple(reversed(key))] = None if number != number else raw_value
+        return result
+
+
+# --- Per-CSV tables ---
+def build(file_path, section_index, data=None, cache=None):
+    """DieTable of file_path: from parsed WaferData, the wafer cache or the CSV."""
+    section_index.require("die")
+    if data is not None and data.cacheable and data.die_count:
+        return DieTable.from_wafer_data(data, section_index)
+    cache = cache or wafer_cache.default_cache()
+    try:
+        cached = cache.get(file_path)
+    except OSError:
+        cached = None
+    if cached is not None and cached.die_count:
+        return DieTable.from_wafer_data(cached, section_index)
+
+    names = list(section_index.die_columns)
+    lists = wafer_cache.die_columns(file_path, section_index, [section_index.die_columns[n] for n in names])
+    return DieTable.from_lists(names, lists)
+
+
+def remember(file_path, table):
+    key = wafer_cache.file_key(file_path)
+    with _lock:
+        _memory[key] = table
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+    return table
+
+
+def for_file(file_path, section_index, data=None, cache=None):
+    # In-memory DieTable per CSV (path + size + mtime), built on first use;
+    # data (freshly parsed WaferData) replaces the kept table
+    key = wafer_cache.file_key(file_path)
+    with _lock:
+        if data is None and key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key]
+    return remember(file_path, build(file_path, section_index, data=data, cache=cache))
@@ -0,0 +1,71 @@
+import itertools
+
+import openpyxl
+
+from deliverables import output, wafer_cache
+from deliverables.fallout import BOXED, HEADER_FILL
+
+# End Test No. lookup (Excel-free)
+# Finds the top fallout ET in the TSNO/TESTNO reference table recorded in the
+# section index, and writes the TSNO..LOLIMIT block at H3:M4 of the Pivot sheet.
+
+HEADER = ["TSNO", "TESTNO", "COMMENT", "MODE", "HILIMIT", "LOLIMIT"]
+WHITE_FILL = "FFFFFF"
+
+
+def normalize_testno(value):
+    if value is None or value == "":
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_top_end_test(out_file, sheet_title="Pivot"):
+    # Highest fails End Test No. sits in D4 of the Pivot sheet
+    wb = openpyxl.load_workbook(out_file, read_only=True)
+    try:
+        if sheet_title not in wb.sheetnames:
+            return ""
+        for row in wb[sheet_title].iter_rows(min_row=4, max_row=4, min_col=4, max_col=4, values_only=True):
+            return normalize_testno(row[0])
+        return ""
+    finally:
+        wb.close()
+
+
+def lookup_end_test(file_path, section_index, end_test_no, rows=None):
+    """Return the reference row [TSNO .. LOLIMIT] as text for end_test_no, or None.
+
+    rows: parsed rows of file_path starting at row 1 (read from the wafer
+    cache or the file when None).
+    """
+    section_index.require("limits")
+    first = section_index.limits_header_row + 1
+    last = section_index.limits_last_row
+
+    if rows is None:
+        rows = wafer_cache.iter_rows(file_path, start=first)
+    else:
+        rows = itertools.islice(rows, first - 1, None)
+    for row_num, row in enumerate(rows, start=first):
+        if row_num > last:
+            break
+        row = (row + [""] * 6)[:6]
+        if normalize_testno(row[1]) == end_test_no:
+            return ["" if value is None else str(value).strip() for value in row]
+    return None
+
+
+def end_test_sheet(row_values, sheet_title="Pivot"):
+    # Merged into the existing sheet: the pivot copy around it stays
+    sheet = output.Sheet(sheet_title, merge=True)
+    fill_end_test_block(sheet, row_values)
+    return sheet
+
+
+def fill_end_test_block(sheet, row_values, row=3, column=8):
+    # TSNO .. LOLIMIT header and values, H3:M4 on the Pivot sheet
+    for c, (title, value) in enumerate(zip(HEADER, row_values), start=column):
+        sheet.cell(row, c, title, BOXED._replace(fill=HEADER_FILL, bold=True))     # light blue
+        sheet.cell(row + 1, c, value if value != "" else None, BOXED._replace(fill=WHITE_FILL, bold=True))
@@ -0,0 +1,124 @@
+import os
+
+from deliverables import warmup
+
+trace = warmup.lazy("deliverables.trace")   # imports inspect: not before the first paint
+
+# Persistent Excel session
+# Keeps one hidden Excel instance and the current output workbook open across
+# GUI actions instead of launching / quitting Excel for every button press.
+#
+#   session.workbook(path)  -> open (or reuse) the workbook, restarting Excel
+#                              if the instance died
+#   session.release(path)   -> close the workbook without saving so another
+#                              writer (openpyxl) can update the file on disk
+#   session.reopen(path)    -> close and open again in the same Excel
+#   session.close()         -> clean shutdown (EXIT button)
+#
+# app_factory lets the xlwings App be swapped out (e.g. a recording fake);
+# app_launches / book_opens count what the session actually did. The
+# default App is wrapped by trace.counted, so traced runs count Excel calls.
+
+
+def init_thread():
+    # COM has to be initialised on every thread that talks to Excel (Windows)
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoInitialize()
+
+
+def uninit_thread():
+    try:
+        import pythoncom
+    except ImportError:
+        return
+    pythoncom.CoUninitialize()
+
+
+def _default_app():
+    import xlwings as xw
+    return trace.counted(xw.App(visible=False))
+
+
+class ExcelSession:
+    def __init__(self, app_factory=None):
+        self.app_factory = app_factory or _default_app
+        self.app = None
+        self.book = None
+        self.book_path = None
+        self.app_launches = 0
+        self.book_opens = 0
+
+    # --- Health checks ---
+    def app_alive(self):
+        if self.app is None:
+            return False
+        try:
+            self.app.books.count   # cheap round-trip; raises if Excel is gone
+            return True
+        except Exception:
+            return False
+
+    def book_alive(self):
+        if self.book is None:
+            return False
+        try:
+            self.book.name
+            return True
+        except Exception:
+            return False
+
+    # --- Lifecycle ---
+    def ensure_app(self):
+        if not self.app_alive():
+            self._drop_app()
+            with trace.span("excel_launch"):
+                self.app = self.app_factory()
+            self.app_launches += 1
+        return self.app
+
+    def workbook(self, path):
+        path = os.path.abspath(path)
+        app = self.ensure_app()
+
+        if self.book_path == path and self.book_alive():
+            return self.book
+
+        self.release()
+        with trace.span("workbook_open"):
+            self.book = app.books.open(path)
+        self.book_path = path
+        self.book_opens += 1
+        return self.book
+
+    def release(self, path=None):
+        if self.book is None:
+            return
+        if path is not None and os.path.abspath(path) != self.book_path:
+            return
+        try:
+            self.book.close()
+        except Exception:
+            pass
+        self.book = None
+        self.book_path = None
+
+    def reopen(self, path):
+        self.release(path)
+        return self.workbook(path)
+
+    def close(self):
+        self.release()
+        self._drop_app()
+
+    def _drop_app(self):
+        if self.app is not None:
+            try:
+                self.app.quit()
+            except Exception:
+                pass
+        self.app = None
+        self.book = None
+        self.book_path = None
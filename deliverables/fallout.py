@@ -0,0 +1,182 @@
+from deliverables import output
+
+# Fallout engine (replaces the Excel PivotCache round-trip)
+# Produces the same End Test No. / Count / Fallout% table the pivot gave:
+#   - Count of FT per ET for the selected C1_MARK
+#   - THEORETICAL_NUM (Column C of its row) as denominator
+#   - sorted by count, Grand Total row at the bottom
+
+C1_MARK_COL = 6   # Column G
+
+HEADER_FILL = "C0E6F5"     # (192, 230, 245)
+TOP_FILL = "FF9F9F"        # (255, 159, 159)
+BOXED = output.Style(border=True, center=True)   # thin border, centered
+
+
+def _pivot_sort_key(value):
+    # Excel lists pivot items numbers first (ascending), then text
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value).lower())
+
+
+def count_all_marks(rows, theoretical_num=None):
+    """Count FT per (C1_MARK, ET) for every mark in a single pass.
+
+    rows may start at the die header when THEORETICAL_NUM is already known
+    (see SectionIndex). Returns (counts_by_mark, theoretical_num) where
+    counts_by_mark maps each C1_MARK (file order) to its counts, ordered like
+    the pivot rows; marks whose dies have no FT map to an empty dict.
+    """
+    header = None
+    et_idx = ft_idx = None
+    pairs = {}
+    marks = {}
+
+    for row in rows:
+        if header is None:
+            first = str(row[0]).strip().upper() if row else ""
+            if first == "THEORETICAL_NUM" and theoretical_num is None:
+                theoretical_num = row[2] if len(row) > 2 else None
+
+            if len(row) > C1_MARK_COL and str(row[C1_MARK_COL]).strip() == "C1_MARK":
+                header = [str(v).strip().upper() for v in row]
+                for idx in range(C1_MARK_COL, len(header)):
+                    if header[idx] == "ET" and et_idx is None:
+                        et_idx = idx
+                    elif header[idx] == "FT" and ft_idx is None:
+                        ft_idx = idx
+                if et_idx is None:
+                    raise ValueError("'ET' column not found to the right of C1_MARK")
+                if ft_idx is None:
+                    raise ValueError("'FT' column not found to the right of C1_MARK")
+            continue
+
+        # --- Die rows: stop at the first blank C1_MARK (same as End(xlDown)) ---
+        mark = row[C1_MARK_COL] if len(row) > C1_MARK_COL else ""
+        if mark == "":
+            break
+        marks[mark] = None
+
+        ft_val = row[ft_idx] if len(row) > ft_idx else ""
+        if ft_val == "":
+            continue
+        et_val = row[et_idx] if len(row) > et_idx else ""
+        key = (mark, et_val if et_val != "" else "(blank)")
+        pairs[key] = pairs.get(key, 0) + 1
+
+    if header is None:
+        raise ValueError("'C1_MARK' not found in Column G.")
+    return _counts_by_mark(marks, pairs), theoretical_num
+
+
+def count_table(table, theoretical_num=None):
+    """count_all_marks on a die_table.DieTable: one group-by over the codes."""
+    pairs = table.count_pairs("C1_MARK", "ET", where=table["FT"].present())
+    pairs = {(mark, et if et != "" else "(blank)"): count for (mark, et), count in pairs.items()}
+    return _counts_by_mark(table["C1_MARK"].codes()[1], pairs), theoretical_num
+
+
+def _counts_by_mark(marks, pairs):
+    # Raw marks can differ only by padding ("a" / " a"): merge after strip
+    by_mark = {}
+    for mark in marks:
+        by_mark.setdefault(str(mark).strip(), {})
+    for (mark, et), count in pairs.items():
+        counts = by_mark[str(mark).strip()]
+        counts[et] = counts.get(et, 0) + count
+
+    return {mark: {et: counts[et] for et in sorted(counts, key=_pivot_sort_key)}
+            for mark, counts in by_mark.items()}
+
+
+def count_end_tests(rows, selected, theoretical_num=None):
+    """Count FT per ET for one C1_MARK (see count_all_marks).
+
+    Returns (counts, theoretical_num, marks) where counts is ordered like
+    the pivot rows and marks holds every C1_MARK item seen.
+    """
+    counts_by_mark, theoretical_num = count_all_marks(rows, theoretical_num)
+    return counts_by_mark.get(selected, {}), theoretical_num, set(counts_by_mark)
+
+
+def build_fallout_table(counts, theoretical_num):
+    # Same rows the pivot read-back produced: [End Test No., Count, Fallout%]
+    fallout_table = []
+    for et, count in counts.items():
+        if not et:
+            continue   # ET 0 (passing dies) is not a fallout
+        et_val = str(int(et)) if isinstance(et, (int, float)) and float(et).is_integer() else str(et)
+        fallout = (float(count) / theoretical_num * 100) if theoretical_num else 0
+        fallout_table.append([et_val, count, f"{fallout:.2f}%"])
+
+    fallout_table.sort(key=lambda x: int(x[1]), reverse=True)
+    grand_total_val = str(int(theoretical_num)) if isinstance(theoretical_num, (int, float)) and float(theoretical_num).is_integer() else str(theoretical_num)
+    fallout_table.insert(0, ["End Test No.", "Count", "Fallout%"])  # header row
+    fallout_table.append(["Grand Total", grand_total_val, ""])
+    return fallout_table
+
+
+def _cell_value(text):
+    # Excel turned the pasted strings back into numbers / percentages
+    if isinstance(text, str) and text.endswith("%"):
+        try:
+            return float(text[:-1]) / 100, "0.00%"
+        except ValueError:
+            return text, None
+    if isinstance(text, str):
+        try:
+            return (int(text) if text.isdigit() else float(text)), None
+        except ValueError:
+            return text, None
+    return text, None
+
+
+def pivot_sheet_title(mark):
+    # One sheet per C1_MARK when several marks are reported. Marks like "/"
+    # or "*" are not allowed in sheet names, so they are spelled as hex codes,
+    # and letters carry their case because Excel sheet names ignore it.
+    mark = str(mark)
+    safe = "".join(f"x{ord(ch):02X}" if ch in '\\/?*[]:' else ch for ch in mark)
+    if mark.isalpha():
+        safe += " (upper)" if mark.isupper() else " (lower)"
+    return f"Pivot {safe}"[:31]
+
+
+def pivot_sheet(selected, counts, fallout_table, sheet_title="Pivot"):
+    # "Pivot" sits right after the data sheet, per-mark sheets at the end
+    sheet = output.Sheet(sheet_title, after_data=sheet_title == "Pivot")
+    fill_pivot_sheet(sheet, selected, counts, fallout_table)
+    return sheet
+
+
+def fill_pivot_sheet(sheet, selected, counts, fallout_table):
+    # --- Static copy of the pivot layout (filter at A1, rows from A3) ---
+    sheet.cell(1, 1, "C1_MARK")
+    sheet.cell(1, 2, selected)
+    sheet.cell(3, 1, "Row Labels")
+    sheet.cell(3, 2, "Count of FT")
+    row_idx = 4
+    for et, count in counts.items():
+        sheet.cell(row_idx, 1, et)
+        sheet.cell(row_idx, 2, count)
+        row_idx += 1
+    sheet.cell(row_idx, 1, "Grand Total")
+    sheet.cell(row_idx, 2, sum(counts.values()))
+
+    # --- Fallout table at D3 ---
+    fill_fallout_table(sheet, fallout_table, row=3, column=4)
+
+
+def fill_fallout_table(sheet, fallout_table, row=3, column=4):
+    # End Test No. / Count / Fallout% block with the pivot sheet formatting
+    for r, values in enumerate(fallout_table, start=row):
+        for c, text in enumerate(values, start=column):
+            value, number_format = _cell_value(text)
+            sheet.cell(r, c, value if value != "" else None, BOXED._replace(number_format=number_format))
+
+    # --- Header / first data row / Grand Total formatting ---
+    last_row_ft = row + len(fallout_table) - 1
+    for r, fill in ((row, HEADER_FILL), (row + 1, TOP_FILL), (last_row_ft, HEADER_FILL)):
+        for c in range(column, column + 3):
+            sheet.restyle(r, c, fill=fill, bold=True)
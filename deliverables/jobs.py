@@ -0,0 +1,144 @@
+import itertools
+import queue
+import threading
+
+# Background job runner
+# One worker thread executes queued jobs in order, so long actions (convert,
+# pivot, End Test check, wafermap) never block the Tk main loop and the next
+# wafer can be queued while the current one renders. The single worker also
+# owns the Excel session, which keeps every COM call on one thread.
+#
+# Jobs receive their Job object as first argument and may call
+#   job.check()              -> raises JobCancelled once cancel() was requested
+#   job.report(fraction)     -> progress 0..1 (forwarded to on_update)
+
+
+class JobCancelled(BaseException):
+    # BaseException so an action's own "except Exception" error reporting
+    # does not swallow a cancel request
+    pass
+
+
+class Job:
+    def __init__(self, job_id, name, func, args, runner):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.state = "queued"        # queued / running / done / failed / cancelled
+        self.progress = 0.0
+        self.error = None
+        self._runner = runner
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def report(self, fraction):
+        self.progress = max(0.0, min(1.0, fraction))
+        self._runner._notify(self)
+
+
+class JobRunner:
+    def __init__(self, on_update=None, thread_init=None, thread_exit=None):
+        # on_update(job) is called from the worker thread on every state or
+        # progress change; the GUI marshals it back to Tk itself
+        self.on_update = on_update
+        self.thread_init = thread_init
+        self.thread_exit = thread_exit
+        self.current = None
+        self._queue = queue.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = threading.Thread(target=self._worker, name="deliverables-jobs", daemon=True)
+        self._thread.start()
+
+    # --- Queue management ---
+    def submit(self, name, func, *args):
+        job = Job(next(self._ids), name, func, args, self)
+        with self._lock:
+            self._pending.append(job)
+        self._queue.put(job)
+        self._notify(job)
+        return job
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending)
+
+    def cancel_current(self):
+        job = self.current
+        if job is not None:
+            job.cancel()
+        return job
+
+    def cancel_all(self):
+        for job in self.pending():
+            job.cancel()
+        self.cancel_current()
+
+    def shutdown(self, final=None, timeout=None):
+        # final runs on the worker thread after the queue drains (e.g. closing Excel)
+        if final is not None:
+            self._queue.put(final)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # --- Worker ---
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception:
+                pass
+
+    def _worker(self):
+        if self.thread_init is not None:
+            self.thread_init()
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    break
+                if not isinstance(job, Job):
+                    job()   # shutdown hook
+                    continue
+                self._run(job)
+        finally:
+            if self.thread_exit is not None:
+                self.thread_exit()
+
+    def _run(self, job):
+        with self._lock:
+            if job in self._pending:
+                self._pending.remove(job)
+        if job.cancelled:
+            job.state = "cancelled"
+            self._notify(job)
+            return
+
+        self.current = job
+        job.state = "running"
+        self._notify(job)
+        try:
+            job.func(job, *job.args)
+            job.state = "done"
+            job.progress = 1.0
+        except JobCancelled:
+            job.state = "cancelled"
+        except Exception as e:
+            job.state = "failed"
+            job.error = e
+        finally:
+            self.current = None
+            self._notify(job)
@@ -0,0 +1,201 @@
+import glob
+import os
+
+from deliverables import mark_map, palette, wafer_cache, wafermap, wmap_csv, wmap_mmap
+
+# Lot mode
+# Finds every wafer (SLOT) in a qccsvout file, or in several files of the
+# same LOT_NO, and splits the die table by slot in one pass per file. Each
+# wafer keeps its own in-memory "Min of ET" grid and ET -> C1_MARK mapping,
+# so all wafer maps can be written in a single workbook save.
+
+
+def _text(value):
+    return str(value).strip().lstrip("\ufeff") if value is not None else ""
+
+
+def _row_value(row):
+    # First value to the right of the header key ("LOT_NO,ABC123")
+    values = [v for v in row[1:] if v != ""]
+    return values[0] if values else None
+
+
+class Wafer:
+    def __init__(self, lot_no, slot):
+        self.lot_no = lot_no
+        self.slot = slot
+        self.sources = []        # CSV files the dies came from
+        self.fields = {}         # TESTPRO_NAME / CHIP_NAME of the first source (palette choice)
+        self.dies = {}           # (x, y) -> lowest numeric ET
+        self.ets = []            # ET / C1_MARK die columns for the mapping
+        self.c1_marks = []
+        self.die_count = 0
+        self._mark_map = None
+
+    @property
+    def slot_str(self):
+        return str(self.slot).zfill(2)
+
+    @property
+    def sheet_name(self):
+        return f"W#{self.slot_str}_wafermap_by_End_Test_No"
+
+    @property
+    def mark_map(self):
+        # ET -> C1_MARK mapping built in one pass once every die is in
+        if self._mark_map is None:
+            self._mark_map = mark_map.MarkMap.from_columns(self.ets, self.c1_marks)
+        return self._mark_map
+
+    @property
+    def et_to_c1(self):
+        return self.mark_map.et_to_c1
+
+    @property
+    def palette(self):
+        return palette.for_fields(self.fields)
+
+    def add_die(self, x, y, et, mark):
+        self.die_count += 1
+        self.ets.append(et)
+        self.c1_marks.append(mark)
+        self._mark_map = None
+        self.add_grid_die(x, y, et)
+
+    def add_grid_die(self, x, y, et):
+        # "Min of ET" grid only (mapping built elsewhere)
+        if et == "":
+            return
+        if isinstance(et, (int, float)):
+            current = self.dies.get((x, y))
+            if current is None or et < current:
+                self.dies[(x, y)] = et
+        else:
+            self.dies.setdefault((x, y), None)
+
+    def block(self):
+        return wafermap.pivot_block(self.dies)
+
+
+def _slot_number(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def split_wafers(file_path, wafers=None, log=None, rows=None):
+    """Add every wafer section of file_path to wafers {(lot_no, slot): Wafer}.
+
+    A section is a SLOT value followed by a die table (the die table ends at
+    the first blank C1_MARK, same as the single-wafer flow). A slot seen
+    again, in this or another file of the lot, is merged die by die.
+    rows: already parsed rows of file_path (read from the file when None).
+    """
+    wafers = {} if wafers is None else wafers
+    log = log or (lambda message, color=None: None)
+    name = os.path.basename(file_path)
+
+    lot_no = ""
+    fields = {}
+    slot = None
+    pending_slot = False
+    wafer = None
+    die_open = False
+    x_idx = y_idx = et_idx = mark_idx = None
+
+    for row in rows if rows is not None else wafer_cache.iter_rows(file_path):
+        if die_open:
+            mark = row[mark_idx] if len(row) > mark_idx else ""
+            if mark == "":
+                die_open = False
+                wafer = None
+            else:
+                if wafer is not None:
+                    x = row[x_idx] if len(row) > x_idx else ""
+                    y = row[y_idx] if len(row) > y_idx else ""
+                    et = row[et_idx] if len(row) > et_idx else ""
+                    if x != "" and y != "":
+                        wafer.add_die(x, y, et, mark)
+                continue
+
+        first = _text(row[0]).upper() if row else ""
+
+        if pending_slot:
+            slot = _slot_number(row[0]) if row else None
+            pending_slot = False
+            continue
+
+        if first == "#COMMON_HEAD":
+            slot = None   # every wafer section carries its own SLOT
+        elif first == "LOT_NO":
+            lot_no = _text(_row_value(row))
+        elif first in palette.PROGRAM_FIELDS:
+            fields[first] = _text(_row_value(row))
+        elif first == "SLOT":
+            value = _row_value(row)
+            if value is None:
+                pending_slot = True   # value sits in Column A of the next row
+            else:
+                slot = _slot_number(value)
+        elif len(row) >= 7 and _text(row[6]) == "C1_MARK":
+            header = [_text(v).upper() for v in row]
+            x_idx = header.index("X") if "X" in header else None
+            y_idx = header.index("Y") if "Y" in header else None
+            et_idx = header.index("ET") if "ET" in header else (
+                header.index("END TEST NO.") if "END TEST NO." in header else None)
+            mark_idx = 6
+            if None in (x_idx, y_idx, et_idx):
+                raise ValueError(f"{name}: required columns 'X', 'Y', 'ET' not found in header row")
+
+            die_open = True
+            if slot is None:
+                log(f"⚠️ {name}: die table without a SLOT value skipped", "#d32f2f")
+                continue
+
+            key = (lot_no, slot)
+            if key in wafers and file_path not in wafers[key].sources:
+                log(f"ℹ️ W#{str(slot).zfill(2)} also found in {name}, keeping the lowest ET per die")
+            wafer = wafers.setdefault(key, Wafer(lot_no, slot))
+            if file_path not in wafer.sources:
+                wafer.sources.append(file_path)
+            if not wafer.sources[1:]:
+                wafer.fields = dict(fields)
+
+    return wafers
+
+
+def read_lot_no(file_path):
+    # Header scan only: stops at LOT_NO or at the die table (memory-mapped
+    # with NumPy, so only the first pages of a big lot file are read)
+    rows = wmap_mmap.header_rows(file_path) if wmap_mmap.available() else wmap_csv.iter_rows(file_path)
+    for row in rows:
+        first = _text(row[0]).upper() if row else ""
+        if first == "LOT_NO":
+            return _text(_row_value(row))
+        if len(row) >= 7 and _text(row[6]) == "C1_MARK":
+            break
+    return ""
+
+
+def group_by_lot(file_paths):
+    """{lot key: [files]}; files without a LOT_NO form a lot of their own."""
+    lots = {}
+    for file_path in file_paths:
+        lot_no = read_lot_no(file_path) or os.path.splitext(os.path.basename(file_path))[0]
+        lots.setdefault(lot_no, []).append(file_path)
+    return lots
+
+
+def find_lot_files(file_path, pattern="*.csv"):
+    # Every CSV next to file_path that carries the same LOT_NO
+    lot_no = read_lot_no(file_path)
+    if not lot_no:
+        return [file_path]
+
+    folder = os.path.dirname(os.path.abspath(file_path))
+    files = []
+    for candidate in sorted(glob.glob(os.path.join(folder, pattern))):
+        if os.path.samefile(candidate, file_path) or read_lot_no(candidate) == lot_no:
+            files.append(candidate)
+    return files
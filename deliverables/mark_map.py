@@ -0,0 +1,132 @@
+import threading
+from collections import Counter, OrderedDict
+
+from deliverables import die_table, wafer_cache, wafermap
+
+# ET -> C1_MARK mapping stage
+# Built in one pass over the die table's ET and C1_MARK columns (no per-die
+# Excel reads) and kept in memory per CSV, so the C1_MARK dropdown, the
+# fallout step and the wafermap coloring all share the same mapping. With
+# NumPy it is a group-by on the compact die table (die_table.DieTable).
+#
+# An ET seen with several C1_MARKs is a conflict: the wafermap still uses
+# the mark of the last die (what the Excel loop did), but the conflict is
+# reported with the die count of every mark instead of passing silently.
+
+MEMORY_ENTRIES = 4
+MAX_CONFLICT_LINES = 10
+
+_memory = OrderedDict()   # wafer_cache.file_key -> MarkMap
+_lock = threading.Lock()
+
+
+class MarkMap:
+    def __init__(self):
+        self.et_to_c1 = {}        # ET text -> C1_MARK (last die wins)
+        self.marks = []           # unique C1_MARK values, file order
+        self.pairs = Counter()    # (ET text, C1_MARK) -> dies
+        self.die_count = 0
+
+    @classmethod
+    def from_columns(cls, ets, marks):
+        mark_map = cls()
+        mark_map.update(ets, marks)
+        return mark_map
+
+    def update(self, ets, marks):
+        # ets / marks: parallel die columns as parsed (numbers or text).
+        # Each distinct value is normalized once; dies with a blank ET
+        # only count towards the C1_MARK list.
+        et_text = {et: wafermap.normalize_et(et) for et in set(ets) if et != "" and et is not None}
+        mark_text = {mark: str(mark).strip() for mark in set(marks)}
+
+        pairs = [(et_text[et], mark_text[mark]) for et, mark in zip(ets, marks) if et in et_text]
+        self.pairs.update(pairs)
+        self.et_to_c1.update(pairs)
+        known = set(self.marks)
+        self.marks.extend(m for m in dict.fromkeys(map(mark_text.__getitem__, marks)) if m not in known)
+        self.die_count += len(marks)
+
+    @classmethod
+    def from_table(cls, table, et="ET", mark="C1_MARK"):
+        # Same mapping from a die_table.DieTable: counts per (ET, mark) code
+        # pair, then each distinct value is normalized once
+        mark_map = cls()
+        present = table[et].present()
+        for (et_value, mark_value), dies in table.count_pairs(et, mark, where=present).items():
+            mark_map.pairs[(wafermap.normalize_et(et_value), str(mark_value).strip())] += dies
+        for et_value, mark_value in table.last_of(et, mark, where=present).items():
+            mark_map.et_to_c1[wafermap.normalize_et(et_value)] = str(mark_value).strip()
+        mark_map.marks = list(dict.fromkeys(str(m).strip() for m in table[mark].codes()[1]))
+        mark_map.die_count = table.die_count
+        return mark_map
+
+    # --- Conflicts ---
+    def conflicts(self):
+        """{ET: {C1_MARK: dies}} for every ET seen with more than one mark."""
+        by_et = {}
+        for (et, mark), dies in self.pairs.items():
+            by_et.setdefault(et, {})[mark] = dies
+        return {et: dict(sorted(marks.items(), key=lambda item: -item[1]))
+                for et, marks in sorted(by_et.items(), key=lambda item: _et_sort_key(item[0]))
+                if len(marks) > 1}
+
+    def conflict_lines(self, where="", limit=MAX_CONFLICT_LINES):
+        conflicts = self.conflicts()
+        if not conflicts:
+            return []
+        where = f"{where}: " if where else ""
+        lines = [f"⚠️ {where}{len(conflicts)} ET(s) map to several C1_MARKs (wafermap uses the last die's mark):"]
+        for et, marks in list(conflicts.items())[:limit]:
+            counts = ", ".join(f"'{mark}' x{dies}" for mark, dies in marks.items())
+            lines.append(f"   ET {et}: {counts} -> '{self.et_to_c1[et]}'")
+        if len(conflicts) > limit:
+            lines.append(f"   ... and {len(conflicts) - limit} more")
+        return lines
+
+
+def _et_sort_key(et):
+    try:
+        return (0, float(et), "")
+    except ValueError:
+        return (1, 0, et)
+
+
+def build(file_path, section_index, data=None, cache=None):
+    """MarkMap from the die table of file_path.
+
+    data: parsed WaferData of the file when the caller has it (Convert);
+    otherwise the columns come from the wafer cache or the CSV.
+    """
+    et_col = section_index.column("ET", "END TEST NO.")
+    mark_col = section_index.column("C1_MARK")
+    if not (et_col and mark_col):
+        raise ValueError("Required columns 'ET', 'C1_MARK' not found in header row")
+    if die_table.available():
+        table = die_table.for_file(file_path, section_index, data=data, cache=cache)
+        return MarkMap.from_table(table, table.name("ET", "END TEST NO."))
+    if data is not None and data.cacheable and data.die_count:
+        ets, marks = data.die_column(et_col - 1), data.die_column(mark_col - 1)
+    else:
+        ets, marks = wafer_cache.die_columns(file_path, section_index, [et_col, mark_col], cache=cache)
+    return MarkMap.from_columns(ets, marks)
+
+
+def remember(file_path, mark_map):
+    key = wafer_cache.file_key(file_path)
+    with _lock:
+        _memory[key] = mark_map
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+    return mark_map
+
+
+def for_file(file_path, section_index, cache=None):
+    # In-memory MarkMap per CSV (path + size + mtime), built on first use
+    key = wafer_cache.file_key(file_path)
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key]
+    return remember(file_path, build(file_path, section_index, cache=cache))
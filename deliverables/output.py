@@ -0,0 +1,488 @@
+import importlib.util
+import os
+from collections import namedtuple
+from copy import copy
+
+import openpyxl
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+from deliverables import xlsx_parts
+
+# Workbook output backends
+# The steps describe their sheets (Pivot / fallout tables, End Test block,
+# wafermap) as Sheet objects: cell values plus a Style per cell. A backend
+# turns them into the workbook:
+#
+#   openpyxl    - default; write-only workbooks. An update edits only the
+#                 sheet parts it touches in the xlsx (xlsx_parts), so the data
+#                 sheet is neither loaded nor written again
+#   xlsxwriter  - constant_memory streaming writer: rows go to disk as they
+#                 are written. It cannot edit a file, so updates use the
+#                 same in-place edit as openpyxl
+#   xlwings     - live Excel through the ExcelSession, for sites that want
+#                 the workbook built by Excel itself
+#
+#   output.get("xlsxwriter").write_workbook(out_file, data=(name, rows))
+#   output.get(None, session).put_sheets(out_file, sheets, data_name=name)
+#
+# The backend is picked per run (batch --output, DELIVERABLES_OUTPUT).
+
+BACKENDS = ("openpyxl", "xlsxwriter", "xlwings")
+DEFAULT_BACKEND = "openpyxl"
+XLWINGS_CHUNK_ROWS = 5000   # data rows per Range assignment
+
+# Cell formatting: fill / font_color as hex RGB ("C0E6F5" or "FFC0E6F5"),
+# thin border on all sides, centered text, Excel number format
+Style = namedtuple("Style", "fill bold font_color border center number_format",
+                   defaults=(None, False, None, False, False, None))
+
+PLAIN = Style()
+
+
+def _noop(*args):
+    pass
+
+
+def default_name():
+    return os.environ.get("DELIVERABLES_OUTPUT", "").strip().lower() or DEFAULT_BACKEND
+
+
+def available(name):
+    if name == "openpyxl":
+        return True
+    return importlib.util.find_spec(name) is not None
+
+
+def get(backend=None, session=None):
+    """Backend instance by name (None -> DELIVERABLES_OUTPUT or openpyxl).
+
+    An instance is returned as is, so callers can pass either.
+    """
+    if backend is not None and not isinstance(backend, str):
+        return backend
+    name = (backend or default_name()).lower()
+    if name not in _CLASSES:
+        raise ValueError(f"Unknown output backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return _CLASSES[name](session)
+
+
+class Sheet:
+    """Values and styles of one output sheet, independent of the writer.
+
+    Cells are 1-based (row, column). A new sheet goes right after the data
+    sheet (after_data, in the order given) or at the end of the workbook; a
+    sheet that already exists is replaced in place, or updated cell by cell
+    when merge is set (End Test block on the existing Pivot sheet).
+    """
+
+    def __init__(self, title, after_data=False, merge=False):
+        self.title = title
+        self.after_data = after_data
+        self.merge = merge
+        self.show_gridlines = True
+        self.values = {}
+        self.styles = {}
+
+    def cell(self, row, column, value=None, style=None):
+        if value is not None:
+            self.values[row, column] = value
+        if style is not None:
+            self.styles[row, column] = style
+
+    def restyle(self, row, column, **changes):
+        # Change some attributes of a cell's style (e.g. a fill over the borders)
+        self.styles[row, column] = self.styles.get((row, column), PLAIN)._replace(**changes)
+
+    def update(self, other):
+        self.values.update(other.values)
+        self.styles.update(other.styles)
+        self.show_gridlines = self.show_gridlines and other.show_gridlines
+
+    def cells(self):
+        """(row, column, value, style) in row order, as streaming writers need them."""
+        for key in sorted(self.values.keys() | self.styles.keys()):
+            yield key[0], key[1], self.values.get(key), self.styles.get(key)
+
+    def rows(self):
+        """(row, [(column, value, style), ...]) per non-empty row, in order."""
+        current, cells = None, []
+        for row, column, value, style in self.cells():
+            if row != current:
+                if cells:
+                    yield current, cells
+                current, cells = row, []
+            cells.append((column, value, style))
+        if cells:
+            yield current, cells
+
+
+def _place(names, sheet, position):
+    # Index of sheet in the workbook's sheet list (names is updated) and the
+    # next slot after the data sheet: existing sheets keep their place
+    if sheet.title in names:
+        return names.index(sheet.title), position
+    if sheet.after_data and position is not None:
+        index, position = position, position + 1
+    else:
+        index = len(names)
+    names.insert(index, sheet.title)
+    return index, position
+
+
+def _data_position(names, data_name):
+    return names.index(data_name) + 1 if data_name in names else None
+
+
+def _rgb(hex_rgb):
+    # "FFE4F1FD" / "E4F1FD" -> (228, 241, 253)
+    hex_rgb = hex_rgb[-6:]
+    return tuple(int(hex_rgb[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _counted(rows, check):
+    for row_num, row in enumerate(rows, start=1):
+        yield row
+        if row_num % 1000 == 0:
+            check()
+
+
+# --- openpyxl ---
+THIN = Side(style="thin")
+THIN_BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+CENTER = Alignment(horizontal="center", vertical="center")
+
+
+class OpenpyxlBackend:
+    name = "openpyxl"
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def _release(self, out_file):
+        if self.session is not None:
+            self.session.release(out_file)   # Excel must not hold the file while it is rewritten
+
+    def write_workbook(self, out_file, sheets=(), data=None, check=_noop):
+        """New workbook: data sheet (name, rows) first, then sheets, in order.
+
+        Write-only mode: rows go straight to disk instead of being held
+        twice (parsed list + in-memory worksheet).
+        """
+        self._write(out_file, ([data] if data is not None else []) + list(sheets), check)
+
+    def put_sheets(self, out_file, sheets, data_name=None, check=_noop):
+        """Add, replace or merge sheets in out_file.
+
+        Only the touched sheet parts are rewritten; the data sheet, column
+        widths, merged cells and sheets added by hand stay as they are.
+        """
+        if not os.path.exists(out_file):
+            return self.write_workbook(out_file, sheets, check=check)
+        self._release(out_file)
+        xlsx_parts.put_sheets(out_file, sheets, data_name, check)
+
+    def _write(self, out_file, entries, check):
+        # entries: Sheet objects and (name, rows) data sheets, in order
+        self._release(out_file)
+        wb = openpyxl.Workbook(write_only=True)
+        shared = {}
+        for entry in entries:
+            check()
+            if isinstance(entry, Sheet):
+                _openpyxl_append(wb.create_sheet(entry.title), entry, shared)
+            else:
+                name, rows = entry
+                ws = wb.create_sheet(name)
+                for row in _counted(rows, check):
+                    ws.append(row)
+        check()
+        _save_replace(out_file, wb.save)
+        wb.close()
+
+
+def _save_replace(out_file, save):
+    # Write next to out_file and swap it in, so a failed save keeps the old file
+    tmp_file = out_file + ".tmp"
+    try:
+        save(tmp_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, out_file)
+
+
+def _openpyxl_style(ws, style, shared):
+    # Registers fill / font / border / alignment with the workbook once and
+    # returns the style record cells share (one per Style, not per cell)
+    if style not in shared:
+        proto = Cell(ws)
+        if style.center:
+            proto.alignment = CENTER
+        if style.border:
+            proto.border = THIN_BORDER
+        if style.fill:
+            proto.fill = PatternFill("solid", fgColor=style.fill)
+        if style.bold or style.font_color:
+            proto.font = Font(bold=style.bold, color=style.font_color)
+        if style.number_format:
+            proto.number_format = style.number_format
+        shared[style] = proto._style
+    return copy(shared[style])
+
+
+def _openpyxl_append(ws, sheet, shared):
+    # Write-only worksheets take whole rows, top to bottom; the sheet view
+    # is written with the first row, so it is set before
+    if not sheet.show_gridlines:
+        ws.sheet_view.showGridLines = False
+    last = 0
+    for row, cells in sheet.rows():
+        for _ in range(row - last - 1):
+            ws.append([])
+        values = [None] * cells[-1][0]
+        for column, value, style in cells:
+            if style is None:
+                values[column - 1] = value
+            else:
+                cell = values[column - 1] = WriteOnlyCell(ws, value)
+                cell._style = _openpyxl_style(ws, style, shared)
+        ws.append(values)
+        last = row
+
+
+# --- xlsxwriter ---
+class XlsxWriterBackend:
+    name = "xlsxwriter"
+    OPTIONS = {"constant_memory": True, "nan_inf_to_errors": True,
+               "strings_to_formulas": False, "strings_to_urls": False}
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def _release(self, out_file):
+        if self.session is not None:
+            self.session.release(out_file)
+
+    def write_workbook(self, out_file, sheets=(), data=None, check=_noop):
+        """New workbook: data sheet (name, rows) first, then sheets, in order."""
+        self._write(out_file, ([data] if data is not None else []) + list(sheets), check)
+
+    def put_sheets(self, out_file, sheets, data_name=None, check=_noop):
+        """Add, replace or merge sheets in out_file.
+
+        xlsxwriter only writes new files, so the existing one is edited in
+        place like the openpyxl backend does: the workbook comes out the
+        same whichever file backend made it.
+        """
+        if not os.path.exists(out_file):
+            return self.write_workbook(out_file, sheets, check=check)
+        self._release(out_file)
+        xlsx_parts.put_sheets(out_file, sheets, data_name, check)
+
+    def _write(self, out_file, entries, check):
+        xlsxwriter = _import_xlsxwriter()
+        self._release(out_file)
+
+        def save(tmp_file):
+            wb = xlsxwriter.Workbook(tmp_file, self.OPTIONS)
+            formats = {}
+            for entry in entries:
+                check()
+                if isinstance(entry, Sheet):
+                    _xlsx_sheet(wb, wb.add_worksheet(entry.title), entry, formats)
+                else:
+                    name, rows = entry
+                    ws = wb.add_worksheet(name)
+                    for r, row in enumerate(_counted(rows, check)):
+                        for c, value in enumerate(row):
+                            _xlsx_write(ws, r, c, value)
+            wb.close()
+        _save_replace(out_file, save)
+
+
+def _import_xlsxwriter():
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ValueError("XlsxWriter is not installed (pip install XlsxWriter); "
+                         "use the openpyxl or xlwings output instead") from None
+    return xlsxwriter
+
+
+def _xlsx_format(wb, style, formats):
+    if style not in formats:
+        properties = {}
+        if style.fill:
+            properties.update(pattern=1, bg_color="#" + style.fill[-6:])
+        if style.bold:
+            properties["bold"] = True
+        if style.font_color:
+            properties["font_color"] = "#" + style.font_color[-6:]
+        if style.border:
+            properties["border"] = 1
+        if style.center:
+            properties.update(align="center", valign="vcenter")
+        if style.number_format:
+            properties["num_format"] = style.number_format
+        formats[style] = wb.add_format(properties)
+    return formats[style]
+
+
+def _xlsx_write(ws, r, c, value, cell_format=None):
+    if value is None or value == "":
+        if cell_format is not None:
+            ws.write_blank(r, c, None, cell_format)
+    elif isinstance(value, str):
+        ws.write_string(r, c, value, cell_format)
+    elif isinstance(value, bool):
+        ws.write_boolean(r, c, value, cell_format)
+    elif isinstance(value, (int, float)):
+        ws.write_number(r, c, value, cell_format)
+    else:
+        ws.write(r, c, value, cell_format)
+
+
+def _xlsx_sheet(wb, ws, sheet, formats):
+    # constant_memory: cells must arrive row by row, top to bottom
+    for row, column, value, style in sheet.cells():
+        cell_format = _xlsx_format(wb, style, formats) if style is not None else None
+        _xlsx_write(ws, row - 1, column - 1, value, cell_format)
+    if not sheet.show_gridlines:
+        ws.hide_gridlines(2)
+
+
+# --- xlwings ---
+class XlwingsBackend:
+    name = "xlwings"
+
+    def __init__(self, session=None):
+        # Without the GUI's session (batch) Excel is started per call
+        self.own_session = session is None
+        if session is None:
+            from deliverables.excel_session import ExcelSession
+            session = ExcelSession()
+        self.session = session
+
+    def _done(self):
+        if self.own_session:
+            self.session.close()
+
+    def write_workbook(self, out_file, sheets=(), data=None, check=_noop):
+        """New workbook: data sheet (name, rows) first, then sheets, in order."""
+        out_file = os.path.abspath(out_file)
+        self.session.release(out_file)
+        book = self.session.ensure_app().books.add()
+        try:
+            placeholder = book.sheets[0]
+            if data is not None:
+                placeholder.name = data[0]
+                _xlw_rows(placeholder, data[1], check)
+                placeholder = None
+            for sheet in sheets:
+                check()
+                ws = book.sheets.add(sheet.title, after=book.sheets[len(book.sheets) - 1])
+                _xlw_fill(ws, sheet)
+            if placeholder is not None:
+                placeholder.delete()
+            book.save(out_file)
+        finally:
+            book.close()
+            self._done()
+
+    def put_sheets(self, out_file, sheets, data_name=None, check=_noop):
+        """Add, replace (cleared in place) or merge sheets in the open workbook."""
+        if not os.path.exists(out_file):
+            return self.write_workbook(out_file, sheets, check=check)
+        try:
+            book = self.session.workbook(out_file)
+            names = [ws.name for ws in book.sheets]
+            position = _data_position(names, data_name)
+            for sheet in sheets:
+                check()
+                if sheet.title in names:
+                    ws = book.sheets[sheet.title]
+                    if not sheet.merge:
+                        ws.clear()
+                else:
+                    index, position = _place(names, sheet, position)
+                    if index < len(names) - 1:
+                        ws = book.sheets.add(sheet.title, before=book.sheets[names[index + 1]])
+                    else:
+                        ws = book.sheets.add(sheet.title, after=book.sheets[names[index - 1]])
+                _xlw_fill(ws, sheet)
+            check()
+            book.save()
+        except BaseException:
+            self.session.release(out_file)   # drop unsaved partial edits
+            raise
+        finally:
+            self._done()
+
+
+def _xlw_value(value):
+    # Excel would read a leading "=" (e.g. the "=" C1_MARK) as a formula
+    if isinstance(value, str) and value.startswith("="):
+        return "'" + value
+    return value
+
+
+def _xlw_rows(ws, rows, check):
+    # One Range assignment per chunk of rows (padded to a rectangle)
+    def flush(first, chunk):
+        width = max(len(row) for row in chunk) or 1
+        ws.range((first, 1)).value = [[_xlw_value(v) for v in row] + [None] * (width - len(row)) for row in chunk]
+
+    chunk, first = [], 1
+    for row_num, row in enumerate(_counted(rows, check), start=1):
+        chunk.append(row)
+        if len(chunk) == XLWINGS_CHUNK_ROWS:
+            flush(first, chunk)
+            chunk, first = [], row_num + 1
+    if chunk:
+        flush(first, chunk)
+
+
+def _xlw_fill(ws, sheet):
+    from deliverables import wafermap
+
+    # --- Values: one block for a new sheet, row runs when merging ---
+    if sheet.values and not sheet.merge:
+        rows = max(r for r, _ in sheet.values)
+        cols = max(c for _, c in sheet.values)
+        block = [[None] * cols for _ in range(rows)]
+        for (r, c), value in sheet.values.items():
+            block[r - 1][c - 1] = _xlw_value(value)
+        ws.range((1, 1), (rows, cols)).value = block
+    elif sheet.values:
+        for (r, c), value in sorted(sheet.values.items()):
+            ws.range((r, c)).value = _xlw_value(value)
+
+    # --- Styles: one call per attribute per address chunk of a style ---
+    by_style = {}
+    for cell, style in sheet.styles.items():
+        by_style.setdefault(style, []).append(cell)
+    for style, cells in by_style.items():
+        for address in wafermap.range_addresses(cells):
+            rng = ws.range(address)
+            if style.fill:
+                rng.color = _rgb(style.fill)
+            if style.bold:
+                rng.api.Font.Bold = True
+            if style.font_color:
+                rng.api.Font.Color = wafermap.rgb_to_int(_rgb(style.font_color))
+            if style.border:
+                rng.api.Borders.Weight = 2          # xlThin
+            if style.center:
+                rng.api.HorizontalAlignment = -4108  # xlCenter
+                rng.api.VerticalAlignment = -4108
+            if style.number_format:
+                rng.number_format = style.number_format
+
+    if not sheet.show_gridlines:
+        ws.activate()
+        ws.api.Parent.Windows(1).DisplayGridlines = False
+
+
+_CLASSES = {"openpyxl": OpenpyxlBackend, "xlsxwriter": XlsxWriterBackend, "xlwings": XlwingsBackend}
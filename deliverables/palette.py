@@ -0,0 +1,213 @@
+import array
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+
+from deliverables import wafer_cache
+
+# Wafermap palettes
+# C1_MARK -> fill colors come from versioned JSON files, one per product or
+# test program, instead of a dict literal in the code:
+#
+#   {"format": 1, "name": "default", "version": "1.1.1",
+#    "default_color": "#C8C8C8",                 (dies without a usable mark)
+#    "colors": {"/": "#00FF00", "$": "#7B68EE", ...},
+#    "notes": {"/": "updated from 1007", ...}}   (optional, per mark)
+#
+# for_fields() picks <TESTPRO_NAME>.json, then <CHIP_NAME>.json, then
+# default.json, in DELIVERABLES_PALETTE_DIR first and then the palettes
+# shipped in deliverables/palettes. A file is validated once and compiled
+# into a Palette: marks numbered 1..n (0 = no color) with RGB and fill
+# tables indexed by that code. Compiled palettes are kept in memory and,
+# keyed by path, size and mtime, next to the wafer cache, so later runs
+# skip parsing and validation.
+
+FORMAT = 1
+MAGIC = b"WPAL1\n"
+SHIPPED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "palettes")
+DEFAULT_NAME = "default"
+PROGRAM_FIELDS = ("TESTPRO_NAME", "CHIP_NAME")   # header fields that select a palette, in order
+HEX_COLOR = re.compile(r"#[0-9A-Fa-f]{6}")
+
+_compiled = {}     # file_key -> Palette
+_lock = threading.Lock()
+
+
+class Palette:
+    """Compiled palette: code-indexed colors for per-die lookups."""
+
+    def __init__(self, name, version, marks, rgb, default_rgb, source=None):
+        self.name = name
+        self.version = version
+        self.source = source
+        self.marks = [None] + list(marks)                 # code -> C1_MARK
+        self.codes = {mark: code for code, mark in enumerate(self.marks) if code}
+        self.rgb = [tuple(default_rgb)] + [tuple(value) for value in rgb]
+        self.fills = ["FF%02X%02X%02X" % value for value in self.rgb]
+
+    @classmethod
+    def from_colors(cls, colors, default_rgb=(200, 200, 200), name="custom", version=""):
+        """Palette from a {C1_MARK: "#RRGGBB"} dict (validated)."""
+        colors = _validated_colors(colors, name)
+        return cls(name, version, list(colors), [_hex_rgb(value) for value in colors.values()], default_rgb)
+
+    def __len__(self):
+        return len(self.marks) - 1
+
+    def __repr__(self):
+        return f"<Palette {self.name} {self.version} ({len(self)} marks)>"
+
+    def code(self, mark):
+        # 0 when the mark has no color
+        return self.codes.get(mark, 0)
+
+    def colors(self):
+        return {mark: "#%02X%02X%02X" % self.rgb[code] for mark, code in self.codes.items()}
+
+    # --- Cache format ---
+    def to_bytes(self):
+        meta = {"format": FORMAT, "name": self.name, "version": self.version, "marks": self.marks[1:]}
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        rgb = array.array("B", [channel for value in self.rgb for channel in value])
+        return b"".join([MAGIC, struct.pack("<I", len(meta_bytes)), meta_bytes, rgb.tobytes()])
+
+    @classmethod
+    def from_bytes(cls, raw, source=None):
+        if not raw.startswith(MAGIC):
+            raise ValueError("not a compiled palette")
+        offset = len(MAGIC)
+        (meta_len,) = struct.unpack_from("<I", raw, offset)
+        offset += 4
+        meta = json.loads(raw[offset:offset + meta_len])
+        if meta.get("format") != FORMAT:
+            raise ValueError("compiled palette from another format")
+        rgb = array.array("B")
+        rgb.frombytes(raw[offset + meta_len:])
+        if len(rgb) != 3 * (len(meta["marks"]) + 1):
+            raise ValueError("truncated compiled palette")
+        values = [tuple(rgb[i:i + 3]) for i in range(0, len(rgb), 3)]
+        return cls(meta["name"], meta["version"], meta["marks"], values[1:], values[0], source)
+
+
+# --- Validation / compiling ---
+def _hex_rgb(value):
+    return tuple(int(value[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def _validated_colors(colors, where):
+    if not isinstance(colors, dict) or not colors:
+        raise ValueError(f"{where}: 'colors' must be a non-empty object of C1_MARK -> \"#RRGGBB\"")
+    for mark, value in colors.items():
+        if not mark.strip():
+            raise ValueError(f"{where}: empty C1_MARK in 'colors'")
+        if not isinstance(value, str) or not HEX_COLOR.fullmatch(value):
+            raise ValueError(f"{where}: color of C1_MARK '{mark}' must be \"#RRGGBB\", got {value!r}")
+    return colors
+
+
+def compile_file(path):
+    """Read and validate a palette file; returns the compiled Palette."""
+    where = os.path.basename(path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    except ValueError as e:
+        raise ValueError(f"{where}: not valid JSON ({e})") from None
+    if not isinstance(doc, dict):
+        raise ValueError(f"{where}: expected a JSON object")
+    if doc.get("format") != FORMAT:
+        raise ValueError(f"{where}: unsupported palette format {doc.get('format')!r} (expected {FORMAT})")
+    version = doc.get("version")
+    if not isinstance(version, str) or not version.strip():
+        raise ValueError(f"{where}: 'version' is required (e.g. \"1.1.1\")")
+    default_color = doc.get("default_color", "#C8C8C8")
+    if not isinstance(default_color, str) or not HEX_COLOR.fullmatch(default_color):
+        raise ValueError(f"{where}: 'default_color' must be \"#RRGGBB\", got {default_color!r}")
+    colors = _validated_colors(doc.get("colors"), where)
+    unknown = set(doc.get("notes") or {}) - set(colors)
+    if unknown:
+        raise ValueError(f"{where}: notes for marks without a color: {sorted(unknown)}")
+
+    name = doc.get("name") or os.path.splitext(where)[0]
+    return Palette(name, version, list(colors), [_hex_rgb(value) for value in colors.values()],
+                   _hex_rgb(default_color), source=path)
+
+
+def _cache_path(key):
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(wafer_cache.default_dir(), f"palette-{digest}.wpal")
+
+
+def load(path):
+    """Compiled palette of path: memory, then the on-disk compiled copy, then the file."""
+    key = wafer_cache.file_key(path)
+    with _lock:
+        palette = _compiled.get(key)
+        if palette is not None:
+            return palette
+
+        cache_path = _cache_path(key)
+        try:
+            with open(cache_path, "rb") as f:
+                palette = Palette.from_bytes(f.read(), source=path)
+        except (OSError, ValueError, struct.error):
+            palette = None
+
+        if palette is None:
+            palette = compile_file(path)
+            if wafer_cache.default_max_bytes() > 0:   # 0 MB disables every cache
+                _store(cache_path, palette)
+
+        _compiled[key] = palette
+        return palette
+
+
+def _store(cache_path, palette):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(palette.to_bytes())
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass   # the compiled copy is an optimisation only
+
+
+# --- Selection ---
+def search_dirs():
+    dirs = []
+    if os.environ.get("DELIVERABLES_PALETTE_DIR"):
+        dirs.append(os.environ["DELIVERABLES_PALETTE_DIR"])
+    dirs.append(SHIPPED_DIR)
+    return dirs
+
+
+def _file_name(value):
+    # Test program / chip names as file names ("TP/01 A" -> "TP_01_A")
+    return re.sub(r"[^\w.-]+", "_", str(value).strip()).strip("._")
+
+
+def find(names):
+    """Path of the first palette file named like one of names, or None."""
+    for directory in search_dirs():
+        for name in names:
+            path = os.path.join(directory, f"{name}.json")
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def for_fields(field_values):
+    """Palette for a wafer's header fields (TESTPRO_NAME, CHIP_NAME, else default)."""
+    names = [_file_name(field_values.get(field) or "") for field in PROGRAM_FIELDS]
+    path = find([name for name in names if name] + [DEFAULT_NAME])
+    if path is None:
+        raise ValueError(f"No '{DEFAULT_NAME}.json' palette found in {', '.join(search_dirs())}")
+    return load(path)
+
+
+def default():
+    return for_fields({})
@@ -0,0 +1,496 @@
+import os
+
+from deliverables import (die_table, endtest, fallout, lot, mark_map, output, palette, sections, trace,
+                          wafer_cache, wafer_image, wafermap, wmap_csv)
+
+# Processing steps shared by the GUI and the headless batch mode
+# Every step works from the CSV path (output workbook, data sheet and section
+# index are derived from it), reports through log(message, color=None) and
+# raises on errors so the caller decides how to surface them. Steps are
+# timed with trace spans (recorded when the caller runs them in trace.run).
+# Sheets are written through an output backend (openpyxl by default, see
+# output.py); backend= takes a backend name or instance.
+
+RED = "#d32f2f"
+AMBER = "#FFBF00"
+IMAGE_FORMATS = ("png", "svg")
+ALL_MARKS = "ALL"                      # every C1_MARK of the file
+ALL_MARKS_SHEET = "Fallout All Marks"
+
+
+def _log_noop(message, color=None):
+    pass
+
+
+def _noop(*args):
+    pass
+
+
+def output_paths(file_path):
+    # Output workbook and data sheet name derived from the CSV path
+    out_file = os.path.splitext(file_path)[0] + ".xlsx"
+    sheet_name = os.path.splitext(os.path.basename(file_path))[0]
+    sheet_name = sheet_name[:31].replace(":", "_").replace("/", "_").replace("\\", "_")
+    return out_file, sheet_name
+
+
+def load_index(out_file):
+    if not os.path.exists(sections.index_path(out_file)):
+        raise ValueError("No converted data for this file. Please run 'Convert to Excel' first.")
+    return sections.SectionIndex.load(out_file)
+
+
+def convert(file_path, session=None, check=_noop, progress=_noop, cache=None, backend=None):
+    """CSV -> .xlsx (streaming) plus the section index saved next to it.
+
+    Rows come from the wafer cache when this CSV was parsed before;
+    otherwise the parsed rows are stored there for the next run.
+    """
+    cache = cache or wafer_cache.default_cache()
+    with trace.span("cache_lookup"):
+        cached = _cached(cache, file_path)
+
+    out_file, sheet_name = output_paths(file_path)
+
+    # Parse and write one row at a time, recording the section index
+    if cached is not None:
+        section_index = cached.section_index
+        rows = cached.iter_rows()
+    else:
+        section_index = sections.SectionIndex()
+        parsed = wafer_cache.WaferData(section_index)
+        rows = parsed.record(section_index.scan(wmap_csv.iter_rows(file_path)))
+    with trace.span("csv_read" if cached is None else "cache_read"):
+        output.get(backend, session).write_workbook(out_file, data=(sheet_name, rows), check=check)
+    progress(0.8)
+
+    # --- Store the section index next to the output ---
+    with trace.span("index_save"):
+        section_index.save(out_file)
+        if cached is None:
+            try:
+                cache.put(file_path, parsed)
+            except OSError:
+                pass   # cache is an optimisation only
+
+    # --- ET -> C1_MARK mapping from the parsed columns, kept for later steps ---
+    data = cached if cached is not None else parsed
+    if data.cacheable and data.die_count and section_index.column("ET", "END TEST NO."):
+        with trace.span("mapping_build"):
+            mark_map.remember(file_path, mark_map.build(file_path, section_index, data=data))
+    return section_index
+
+
+def _cached(cache, file_path):
+    try:
+        return cache.get(file_path)
+    except OSError:
+        return None
+
+
+def load_cached(file_path, cache=None):
+    """Section index of a CSV that was parsed before, or None.
+
+    Lets the C1_MARK dropdown come up without parsing the CSV again.
+    """
+    cached = _cached(cache or wafer_cache.default_cache(), file_path)
+    return cached.section_index if cached is not None else None
+
+
+def preview(file_path, check=_noop, cache=None):
+    """Section index for the dropdown and file summary, ahead of Convert.
+
+    From the wafer cache when the CSV was parsed before, otherwise one
+    streaming pass over the CSV (no workbook, no Excel), so C1_MARK items,
+    SLOT, THEORETICAL_NUM and the die count are known in a fraction of the
+    full conversion time.
+    """
+    section_index = load_cached(file_path, cache)
+    if section_index is not None:
+        return section_index
+    section_index = sections.SectionIndex()
+    for row_num, _ in enumerate(section_index.scan(wmap_csv.iter_rows(file_path)), start=1):
+        if row_num % 1000 == 0:
+            check()
+    return section_index
+
+
+def summary_line(section_index):
+    return (f"📋 SLOT: {section_index.slot}   THEORETICAL_NUM: {section_index.theoretical_num}   "
+            f"Dies: {section_index.die_count}")
+
+
+def c1_marks(file_path, section_index):
+    """C1_MARK dropdown items, from the shared ET -> C1_MARK mapping."""
+    section_index.require("die")
+    if not section_index.column("ET", "END TEST NO."):
+        return section_index.c1_marks
+    return mark_map.for_file(file_path, section_index).marks
+
+
+def pivot(file_path, selected, section_index, session=None, log=_log_noop, check=_noop, progress=_noop, backend=None):
+    """Fallout table for one C1_MARK, written to the Pivot sheet.
+
+    Returns the table (header, rows, Grand Total) or None when the mark is
+    not part of the die table.
+    """
+    # --- Filter: C1_MARK (checked against the shared mapping first) ---
+    section_index.require("die")
+    with trace.span("mapping_lookup"):
+        marks = c1_marks(file_path, section_index)
+    if selected in marks:
+        log(f"\nApplied filter: {selected}")
+    else:
+        log(f"⚠️ Selected '{selected}' not found in C1_MARK items {sorted(marks)}", RED)
+        return None
+
+    # --- Count End Tests straight from the die table (no Excel round-trip) ---
+    with trace.span("fallout_count"):
+        counts_by_mark, theoretical_num = _count_all_marks(file_path, section_index)
+    counts = counts_by_mark.get(selected, {})
+
+    # --- Fallout Table Logic ---
+    fallout_table = fallout.build_fallout_table(counts, theoretical_num)
+    progress(0.6)
+
+    # --- Write the Pivot sheet ---
+    check()
+    with trace.span("save"):
+        _put_sheets(file_path, [fallout.pivot_sheet(selected, counts, fallout_table)], session, backend, check)
+    return fallout_table
+
+
+def _put_sheets(file_path, sheets, session=None, backend=None, check=_noop, out_file=None):
+    # Add / replace sheets in the output workbook of file_path
+    default_out_file, sheet_name = output_paths(file_path)
+    output.get(backend, session).put_sheets(out_file or default_out_file, sheets, data_name=sheet_name, check=check)
+
+
+def _count_all_marks(file_path, section_index):
+    # Group-by on the compact die table; row by row without NumPy
+    if die_table.available() and section_index.column("ET") and section_index.column("FT"):
+        table = die_table.for_file(file_path, section_index)
+        return fallout.count_table(table, section_index.theoretical_num)
+    return fallout.count_all_marks(
+        wafer_cache.iter_rows(file_path, start=section_index.die_header_row),
+        theoretical_num=section_index.theoretical_num
+    )
+
+
+def top_end_test(file_path, section_index, mark=ALL_MARKS):
+    """Top fallout ET of one C1_MARK (ALL_MARKS: every die), or None.
+
+    Counted from the die table, so Check End Test does not depend on the
+    Pivot sheet of the last run.
+    """
+    section_index.require("die")
+    counts_by_mark, theoretical_num = _count_all_marks(file_path, section_index)
+    if mark == ALL_MARKS:
+        counts = {}
+        for mark_counts in counts_by_mark.values():
+            for et, count in mark_counts.items():
+                counts[et] = counts.get(et, 0) + count
+    else:
+        counts = counts_by_mark.get(mark, {})
+    fallout_table = fallout.build_fallout_table(counts, theoretical_num)
+    return fallout_table[1][0] if len(fallout_table) > 2 else None
+
+
+def check_end_test(file_path, section_index, end_test_no=None, session=None, log=_log_noop, backend=None):
+    """Look up the top fallout ET in the reference table and write H3:M4.
+
+    end_test_no defaults to the value in D4 of the Pivot sheet. Returns the
+    reference row or None when the ET is not listed.
+    """
+    out_file = output_paths(file_path)[0]
+
+    # --- Get highest fails End Test No from D4 ---
+    if end_test_no is None:
+        with trace.span("read_top_et"):
+            end_test_no = endtest.read_top_end_test(out_file)
+
+    log(f"\n🔍Checking End Test No.: {end_test_no}")
+
+    # --- Reference table rows from the section index ---
+    with trace.span("lookup"):
+        row_values = endtest.lookup_end_test(file_path, section_index, end_test_no)
+    if row_values is None:
+        log("\n❌ No End Test No. found in the TESTNO Column", RED)
+        return None
+
+    with trace.span("save"):
+        _put_sheets(file_path, [endtest.end_test_sheet(row_values)], session, backend)
+
+    # --- Show End Test No. table in status box ---
+    tsno, testno, comment, mode, hilimit, lolimit = [str(v) for v in row_values]
+    log("\nEnd Test No. Reference:")
+    log(f"{'TSNO':<10}{'TESTNO':<10}{'COMMENT':<15}{'MODE':<10}{'HILIMIT':<10}{'LOLIMIT'}")
+    log("-" * 70)
+    log(f"{tsno:<10}{testno:<10}{comment:<15}{mode:<10}{hilimit:<10}{lolimit}")
+
+    # --- Status message depending on limits ---
+    if lolimit != "":
+        log("\n✅ Found with Limits")
+    else:
+        log("\n⚠️ Found with no Limit", AMBER)
+    return row_values
+
+
+def pivot_marks(file_path, marks, section_index, session=None, log=_log_noop, check=_noop, one_sheet=False,
+                backend=None):
+    """Fallout table + End Test reference for several C1_MARKs, one save.
+
+    All marks are counted in one group-by over (C1_MARK, ET), so the die
+    table is scanned once however many marks are reported; ALL_MARKS in
+    marks means every mark of the file. Each mark gets its own sheet
+    (pivot_sheet_title) unless only one mark is requested, which keeps the
+    regular "Pivot" sheet; one_sheet stacks every table on ALL_MARKS_SHEET.
+    Returns {mark: (fallout_table, end_test_row or None)} for the marks found.
+    """
+    section_index.require("die")
+
+    with trace.span("mapping_lookup"):
+        found = c1_marks(file_path, section_index)
+    if ALL_MARKS in marks:
+        marks = found
+
+    check()
+    with trace.span("fallout_count"):
+        counts_by_mark, theoretical_num = _count_all_marks(file_path, section_index)
+
+    reports = []
+    with trace.span("lookup"):
+        for mark in marks:
+            if mark not in found:
+                log(f"⚠️ Selected '{mark}' not found in C1_MARK items {sorted(found)}", RED)
+                continue
+            counts = counts_by_mark.get(mark, {})
+            fallout_table = fallout.build_fallout_table(counts, theoretical_num)
+            # Top fallout ET is the first data row (header is row 0)
+            row_values = None
+            if len(fallout_table) > 2:
+                row_values = endtest.lookup_end_test(file_path, section_index, fallout_table[1][0])
+            reports.append((mark, counts, fallout_table, row_values))
+
+    # --- Write every sheet in a single save ---
+    sheets = fallout_sheets(reports, single=len(marks) == 1, one_sheet=one_sheet)
+    check()
+    with trace.span("save"):
+        _put_sheets(file_path, sheets, session, backend, check)
+
+    return {mark: (fallout_table, row_values) for mark, _, fallout_table, row_values in reports}
+
+
+def fallout_sheets(reports, single=False, one_sheet=False):
+    """Sheets for [(mark, counts, fallout_table, end_test_row)] reports.
+
+    One sheet per mark (the regular "Pivot" sheet when single), or every
+    table stacked on ALL_MARKS_SHEET when one_sheet is set.
+    """
+    if one_sheet:
+        sheet = output.Sheet(ALL_MARKS_SHEET)
+        _fill_all_marks_sheet(sheet, reports)
+        return [sheet]
+    sheets = []
+    for mark, counts, fallout_table, row_values in reports:
+        sheet_title = "Pivot" if single else fallout.pivot_sheet_title(mark)
+        sheet = fallout.pivot_sheet(mark, counts, fallout_table, sheet_title)
+        if row_values:
+            endtest.fill_end_test_block(sheet, row_values)
+        sheets.append(sheet)
+    return sheets
+
+
+def _fill_all_marks_sheet(sheet, reports):
+    # One block per C1_MARK, stacked: title row, fallout table in A:C and
+    # the End Test reference of its top ET in E:J
+    bold = output.Style(bold=True)
+    row = 1
+    for mark, counts, fallout_table, row_values in reports:
+        sheet.cell(row, 1, "C1_MARK", bold)
+        sheet.cell(row, 2, mark, bold)
+        fallout.fill_fallout_table(sheet, fallout_table, row=row + 1, column=1)
+        if row_values:
+            endtest.fill_end_test_block(sheet, row_values, row=row + 1, column=5)
+        row += len(fallout_table) + 3
+
+
+def write_wafermap(file_path, section_index, session=None, log=_log_noop, check=_noop, progress=_noop, backend=None):
+    """Build the W#NN_wafermap_by_End_Test_No sheet (no Excel PivotTable).
+
+    "Min of ET" grid from the die columns,
+    colors from the shared ET -> C1_MARK mapping, written in one save
+    through the output backend (openpyxl by default).
+    Returns the sheet name, or None when SLOT information is missing.
+    """
+    # --- SLOT handling (from the section index) ---
+    if not section_index.slot_row:
+        log("\n⚠️ SLOT header not found in Column A", RED)
+        return
+    if section_index.slot is None:
+        log("\n⚠️ SLOT value below header is empty", RED)
+        return
+
+    log(f"\n🔍 Generating wafermap for W #{str(int(section_index.slot)).zfill(2)}...")
+
+    # --- Die grid (Min of ET per X / Y) straight from the die columns ---
+    with trace.span("grid_build"):
+        wafer = wafer_grid(file_path, section_index)
+        block = wafer.block()
+    progress(0.3)
+
+    # --- ET → C1_MARK mapping (shared with the dropdown and fallout) ---
+    with trace.span("mapping_build"):
+        etmap = mark_map.for_file(file_path, section_index)
+    for message in etmap.conflict_lines():
+        log(message, AMBER)
+    progress(0.4)
+
+    # --- Replace the sheet in a single save ---
+    with trace.span("sheet_build"):
+        sheet = output.Sheet(wafer.sheet_name, after_data=True)
+        color_map = palette.for_fields(section_index.field_values)
+        for message in wafermap.fill_wafermap_sheet(sheet, block, etmap.et_to_c1, color_map):
+            log(message, RED)
+    progress(0.7)
+
+    check()
+    with trace.span("save"):
+        _put_sheets(file_path, [sheet], session, backend, check)
+
+    log(f"\n✅ Wafermap created on {wafer.sheet_name} sheet.")
+    return wafer.sheet_name
+
+
+def wafer_grid(file_path, section_index, table=None, data=None):
+    """lot.Wafer of the die table with its "Min of ET" grid (X / Y -> ET).
+
+    table: die_table.DieTable of the file, data: its parsed WaferData, when
+    the caller already holds them.
+    """
+    section_index.require("die")
+    wafer = lot.Wafer(section_index.field_values.get("LOT_NO") or "", int(section_index.slot))
+    columns = [section_index.column("X"), section_index.column("Y"), section_index.column("ET", "END TEST NO.")]
+    if not all(columns):
+        raise ValueError("Required columns 'X', 'Y', 'ET' not found in header row")
+    if table is None and die_table.available():
+        table = die_table.for_file(file_path, section_index, data=data)
+    if table is not None:
+        et_name = table.name("ET", "END TEST NO.")
+        where = table["X"].present() & table["Y"].present() & table[et_name].present()
+        wafer.dies = table.min_by(("X", "Y"), et_name, where=where)
+        return wafer
+
+    if data is not None and data.cacheable and data.die_count:
+        xs, ys, ets = [data.die_column(col - 1) for col in columns]
+    else:
+        xs, ys, ets = wafer_cache.die_columns(file_path, section_index, columns)
+    for x, y, et in zip(xs, ys, ets):
+        if x != "" and y != "":
+            wafer.add_grid_die(x, y, et)
+    return wafer
+
+
+def lot_output_path(file_paths, wafers):
+    # One CSV -> its own output workbook; several -> <LOT_NO>_lot_wafermap.xlsx
+    if len(file_paths) == 1:
+        return output_paths(file_paths[0])[0]
+    lot_nos = sorted({wafer.lot_no for wafer in wafers.values() if wafer.lot_no})
+    name = lot_nos[0] if len(lot_nos) == 1 else os.path.splitext(os.path.basename(file_paths[0]))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(file_paths[0])), f"{name}_lot_wafermap.xlsx")
+
+
+def generate_lot_wafermaps(file_paths, session=None, out_file=None, log=_log_noop, check=_noop, progress=_noop,
+                           backend=None):
+    """Every wafer (SLOT) of one or more CSVs of a lot, in a single workbook save.
+
+    Die data is split by slot in one pass per file and each map is built in
+    memory (no Excel PivotCache). Existing W#NN sheets are replaced. Returns
+    (out_file, [sheet names]).
+    """
+    file_paths = list(file_paths)
+    wafers = {}
+    for i, file_path in enumerate(file_paths, start=1):
+        check()
+        with trace.span("split"):
+            lot.split_wafers(file_path, wafers, log=log)
+        progress(0.5 * i / len(file_paths))
+
+    if not wafers:
+        log("\n⚠️ No wafer with a SLOT value found", RED)
+        return None, []
+
+    out_file = out_file or lot_output_path(file_paths, wafers)
+    log(f"\n🔍 Generating {len(wafers)} wafermap(s): "
+        + ", ".join(f"W#{w.slot_str}" for w in sorted(wafers.values(), key=lambda w: w.slot)))
+
+    # --- Build every wafer sheet (new ones go right after the data sheet, in slot order) ---
+    sheets = []
+    wafer_list = sorted(wafers.values(), key=lambda w: w.slot)
+    for i, wafer in enumerate(wafer_list, start=1):
+        check()
+        with trace.span("mapping_build"):
+            conflicts = wafer.mark_map.conflict_lines(f"W#{wafer.slot_str}")
+        for message in conflicts:
+            log(message, AMBER)
+        with trace.span("sheet_build"):
+            sheet = output.Sheet(wafer.sheet_name, after_data=True)
+            warnings = wafermap.fill_wafermap_sheet(sheet, wafer.block(), wafer.et_to_c1, wafer.palette)
+        for message in warnings:
+            log(message, RED)
+        sheets.append(sheet)
+        progress(0.5 + 0.4 * i / len(wafer_list))
+
+    # --- Write them in a single save ---
+    check()
+    with trace.span("save"):
+        _put_sheets(file_paths[0], sheets, session, backend, check, out_file=out_file)
+    sheet_names = [sheet.title for sheet in sheets]
+
+    for sheet_name in sheet_names:
+        log(f"✅ Wafermap created on {sheet_name} sheet.")
+    log(f"\nFile saved at: {out_file}")
+    return out_file, sheet_names
+
+
+def image_path_base(out_dir, wafer):
+    # <LOT_NO>_W08_wafermap (CSV name when the file has no LOT_NO)
+    prefix = wafer.lot_no or os.path.basename(wafer.sources[0]).split(".")[0]
+    return os.path.join(out_dir, f"{prefix}_W{wafer.slot_str}_wafermap")
+
+
+def export_wafermap_images(file_paths, formats=IMAGE_FORMATS, out_dir=None, log=_log_noop, check=_noop, progress=_noop):
+    """PNG / SVG wafermap of every wafer (SLOT) in file_paths, no Excel.
+
+    Images go next to the first CSV unless out_dir is given. Returns the
+    written image paths.
+    """
+    file_paths = list(file_paths)
+    wafers = {}
+    for i, file_path in enumerate(file_paths, start=1):
+        check()
+        with trace.span("split"):
+            lot.split_wafers(file_path, wafers, log=log)
+        progress(0.3 * i / len(file_paths))
+
+    if not wafers:
+        log("\n⚠️ No wafer with a SLOT value found", RED)
+        return []
+
+    out_dir = out_dir or os.path.dirname(os.path.abspath(file_paths[0]))
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    wafer_list = sorted(wafers.values(), key=lambda w: (w.lot_no, w.slot))
+    for i, wafer in enumerate(wafer_list, start=1):
+        check()
+        with trace.span("render"):
+            written, warnings = wafer_image.write_images(
+                image_path_base(out_dir, wafer), wafer.block(), wafer.et_to_c1, formats, wafer.palette
+            )
+        for message in dict.fromkeys(warnings):
+            log(message, RED)
+        paths.extend(written)
+        progress(0.3 + 0.7 * i / len(wafer_list))
+
+    log(f"\n✅ {len(paths)} wafermap image(s) saved in: {out_dir}")
+    return paths
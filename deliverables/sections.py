@@ -0,0 +1,137 @@
+import json
+import os
+
+# Section index for a qccsvout (.wmap.csv) file
+# Recorded once while the CSV is parsed, saved next to the output workbook,
+# and used by every later action to jump straight to the right rows instead
+# of rescanning columns through Excel.
+#
+# All row / column numbers are 1-based, exactly as they appear on the sheet.
+
+INDEX_VERSION = 1
+C1_MARK_COL = 7   # Column G
+
+
+def index_path(out_file):
+    return os.path.splitext(out_file)[0] + ".index.json"
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ""
+
+
+class SectionIndex:
+    def __init__(self):
+        self.fields = {}             # header key -> row (first occurrence)
+        self.field_values = {}       # header key -> first value on its row
+        self.common_head_row = None
+        self.slot_row = None
+        self.slot = None
+        self.theoretical_num_row = None
+        self.theoretical_num = None
+        self.limits_header_row = None
+        self.limits_last_row = None
+        self.die_header_row = None
+        self.die_columns = {}        # column name -> column
+        self.die_last_row = None
+        self.c1_marks = []           # unique C1_MARK values, file order
+        self.last_row = 0
+
+    # --- Building ---
+    def scan(self, rows):
+        # Pass-through generator: records the layout while rows stream by
+        seen_marks = {}
+        die_open = False
+        pending_slot = False
+
+        for row_num, row in enumerate(rows, start=1):
+            self.last_row = row_num
+            first = _text(row[0]) if row else ""
+
+            if die_open:
+                mark = row[C1_MARK_COL - 1] if len(row) >= C1_MARK_COL else ""
+                if mark == "":
+                    die_open = False   # die table ends at the first blank C1_MARK
+                else:
+                    self.die_last_row = row_num
+                    seen_marks.setdefault(str(mark).strip(), None)
+                yield row
+                continue
+
+            if pending_slot:
+                self.slot = row[0] if row and row[0] != "" else None
+                pending_slot = False
+
+            if self.die_header_row is None and len(row) >= C1_MARK_COL and _text(row[C1_MARK_COL - 1]) == "C1_MARK":
+                self.die_header_row = row_num
+                self.die_last_row = row_num
+                self.die_columns = {_text(v).upper(): col for col, v in enumerate(row, start=1) if _text(v)}
+                die_open = True
+            elif self.limits_header_row is None and len(row) >= 6 and _text(row[5]).upper() == "LOLIMIT":
+                self.limits_header_row = row_num
+                self.limits_last_row = row_num
+            elif self.limits_header_row is not None and self.die_header_row is None:
+                if first and self.limits_last_row == row_num - 1:
+                    self.limits_last_row = row_num
+            elif first and isinstance(row[0], str):
+                key = first.lstrip("\ufeff").upper()
+                if key == "#COMMON_HEAD" and self.common_head_row is None:
+                    self.common_head_row = row_num
+                if key not in self.fields:
+                    self.fields[key] = row_num
+                    values = [v for v in row[1:] if v != ""]
+                    self.field_values[key] = values[0] if values else None
+                if key == "SLOT" and self.slot_row is None:
+                    self.slot_row = row_num
+                    pending_slot = True
+                elif key == "THEORETICAL_NUM" and self.theoretical_num_row is None:
+                    self.theoretical_num_row = row_num
+                    self.theoretical_num = row[2] if len(row) > 2 and row[2] != "" else None
+
+            yield row
+
+        self.c1_marks = list(seen_marks)
+
+    # --- Lookups ---
+    @property
+    def die_count(self):
+        return self.die_last_row - self.die_header_row if self.die_header_row is not None else 0
+
+    def require(self, name):
+        if name == "die" and self.die_header_row is None:
+            raise ValueError("'C1_MARK' not found in Column G.")
+        if name == "limits" and self.limits_header_row is None:
+            raise ValueError("LOLIMIT not found in Column F")
+        if name == "slot" and self.slot_row is None:
+            raise ValueError("SLOT header not found in Column A")
+
+    def column(self, *names):
+        for name in names:
+            if name.upper() in self.die_columns:
+                return self.die_columns[name.upper()]
+        return None
+
+    # --- Persistence ---
+    def to_dict(self):
+        data = dict(self.__dict__)
+        data["version"] = INDEX_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError("Section index was written by a different version, please convert again.")
+        index = cls()
+        for key, value in data.items():
+            if key != "version":
+                setattr(index, key, value)
+        return index
+
+    def save(self, out_file):
+        with open(index_path(out_file), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, out_file):
+        with open(index_path(out_file), encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,468 @@
+import argparse
+import importlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from deliverables import output, pipeline, wafer_cache
+
+# Local HTTP service
+# A long-running deliverables server for the stations of a line: startup,
+# imports and palette compilation are paid once by warm worker processes
+# instead of per wafer. Each request is one wafer: the CSV is parsed once
+# (api.WaferFile) and the workbook, fallout JSON and wafermap image come
+# back from the same in-memory data.
+#
+#   python -m deliverables.service --port 8765 -j 4 --queue 32
+#
+#   POST /process?name=W08.wmap.csv&mark=ALL&image=png    body: the CSV bytes
+#   POST /process   {"path": "S:\\drops\\W08.wmap.csv", "marks": ["a"], "images": ["png", "svg"]}   (--root only)
+#        -> {"job", "fallout", "end_test", "wafermap", "workbook": "/results/<job>/...", "images": {...}}
+#   GET  /results/<job>/<file>      workbook / image / trace of a finished job
+#   GET  /status                    workers, queue depth, running jobs, latency
+#
+# At most --jobs wafers run at once; up to --queue more wait for a worker,
+# anything beyond is refused with 503 so a busy server never piles up work.
+# Results are kept in --work-dir for the last --keep jobs.
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE = 32
+DEFAULT_KEEP = 200
+DEFAULT_MAX_MB = 512
+LATENCY_SAMPLES = 500
+WORKER_WAFERS = 4          # parsed files kept per worker for repeated requests
+CHUNK = 1 << 20
+
+_JOB_ID = re.compile(r"[0-9a-f]{12}")
+
+
+def _plain_name(name):
+    # A file name inside a job folder: no folders, no "." / ".." / hidden files
+    return bool(name) and name == os.path.basename(name) and not name.startswith(".")
+
+
+def _content_length(value):
+    try:
+        length = int(value or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ValueError(f"bad Content-Length: {value!r}")
+    return length
+
+
+def default_work_dir():
+    return os.path.join(os.path.dirname(wafer_cache.default_dir()), "service")
+
+
+# --- Worker processes ---
+_wafers = OrderedDict()    # wafer_cache.file_key -> api.WaferFile (per worker)
+
+
+def _init_worker():
+    # Imports (openpyxl, NumPy) and the default palette are loaded once per
+    # worker, before the first wafer arrives
+    importlib.import_module("deliverables.api")
+    from deliverables import palette
+    palette.default()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _wafer(file_path):
+    from deliverables import api
+    key = wafer_cache.file_key(file_path)
+    wafer = _wafers.get(key)
+    if wafer is None:
+        wafer = _wafers[key] = api.load(file_path)
+    _wafers.move_to_end(key)
+    while len(_wafers) > WORKER_WAFERS:
+        _wafers.popitem(last=False)
+    return wafer
+
+
+def process(file_path, out_dir, marks=(pipeline.ALL_MARKS,), images=("png",), wafermap=True, one_sheet=False,
+            backend=None):
+    """One wafer, outputs in out_dir; returns a plain dict (picklable, JSON-ready)."""
+    from deliverables import api
+
+    out_file = os.path.join(out_dir, os.path.basename(pipeline.output_paths(file_path)[0]))
+    result = api.process(file_path, out_file, marks, wafermap, images, image_dir=out_dir, one_sheet=one_sheet,
+                         backend=backend, all_slots=False, action="Service", loader=_wafer)
+    # File names in the job folder; run() turns them into /results URLs
+    del result["file"]
+    out_file = result.pop("out_file")
+    result["workbook"] = os.path.basename(out_file) if out_file else None
+    result["images"] = {os.path.splitext(path)[1][1:]: os.path.basename(path) for path in result["images"]}
+    return result
+
+
+# --- Server side ---
+class ServiceBusy(Exception):
+    pass
+
+
+class Latency:
+    """Last LATENCY_SAMPLES durations of one kind, summarized for /status."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=samples)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {"count": 0}
+
+        def pct(p):
+            return round(values[min(len(values) - 1, int(p * len(values)))], 4)
+        return {"count": len(values), "mean": round(sum(values) / len(values), 4),
+                "p50": pct(0.5), "p95": pct(0.95), "max": round(values[-1], 4)}
+
+
+class Service:
+    """Warm process pool behind a bounded queue; the HTTP handler calls run()."""
+
+    def __init__(self, workers=None, max_queue=DEFAULT_QUEUE, work_dir=None, keep=DEFAULT_KEEP, roots=(),
+                 backend=None, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_queue = max(0, max_queue)
+        self.work_dir = os.path.abspath(work_dir or default_work_dir())
+        self.keep = keep
+        self.roots = [os.path.normcase(os.path.realpath(root)) for root in roots]
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.started = time.time()
+        self.warmup_seconds = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.latency = {"queue": Latency(), "process": Latency(), "total": Latency()}
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.workers)
+        self._pool = None
+        self._jobs = deque()     # finished job ids, oldest first
+
+    # --- Lifecycle ---
+    def start(self):
+        # Spawn every worker now (imports + palette), not on the first wafer
+        os.makedirs(self.work_dir, exist_ok=True)
+        started = time.perf_counter()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        return self
+
+    def _restart_pool(self, broken):
+        # Several requests may see the same broken pool: replace it once
+        with self._lock:
+            if self._pool is not broken:
+                return
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    # --- Jobs ---
+    def check_path(self, file_path):
+        # Path jobs read only under the configured roots; links are resolved
+        # first, so a symlink under a root cannot reach outside it
+        if not self.roots:
+            raise PermissionError("path requests are disabled: start the service with --root")
+        file_path = os.path.realpath(file_path)
+        if not any(os.path.normcase(file_path).startswith(os.path.join(root, "")) for root in self.roots):
+            raise PermissionError(f"{file_path} is outside the allowed folders")
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"{file_path} not found")
+        return file_path
+
+    def new_job(self):
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.work_dir, job_id)
+        os.makedirs(job_dir)
+        return job_id, job_dir
+
+    def run(self, job_id, job_dir, file_path, options):
+        """Queue one wafer and wait for it; raises ServiceBusy when the queue is full."""
+        arrived = time.perf_counter()
+        with self._lock:
+            if self.queued + self.running >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ServiceBusy(f"{self.running} running, {self.queued} queued")
+            self.queued += 1
+
+        with self._slots:
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+            began = time.perf_counter()
+            result = {"ok": False, "error": "service: interrupted", "seconds": 0}
+            try:
+                result = self._submit(file_path, job_dir, options)
+            finally:
+                # Counters stay right whatever happened to the job
+                finished = time.perf_counter()
+                with self._lock:
+                    self.running -= 1
+                    if result["ok"]:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self.latency["queue"].add(began - arrived)
+                    self.latency["process"].add(finished - began)
+                    self.latency["total"].add(finished - arrived)
+                self._finish(job_id)
+
+        result["job"] = job_id
+        result["queue_seconds"] = round(began - arrived, 3)
+        if result.get("workbook"):
+            result["workbook"] = f"/results/{job_id}/{result['workbook']}"
+        result["images"] = {fmt: f"/results/{job_id}/{name}" for fmt, name in result.get("images", {}).items()}
+        return result
+
+    def _submit(self, file_path, job_dir, options):
+        pool = self._pool
+        try:
+            return pool.submit(process, file_path, job_dir, backend=self.backend, **options).result()
+        except BrokenProcessPool as e:   # a worker process died: fresh pool for the next jobs
+            self._restart_pool(pool)
+            return {"ok": False, "error": f"worker: {e}", "seconds": 0}
+        except (Exception, KeyboardInterrupt) as e:
+            # Pool shut down, options that do not pickle, interrupted wait:
+            # the job fails instead of taking the handler thread down
+            return {"ok": False, "error": f"service: {type(e).__name__}: {e}", "seconds": 0}
+
+    def _finish(self, job_id):
+        # Keep the outputs of the last `keep` jobs
+        with self._lock:
+            self._jobs.append(job_id)
+            expired = [self._jobs.popleft() for _ in range(max(0, len(self._jobs) - self.keep))]
+        for old in expired:
+            shutil.rmtree(os.path.join(self.work_dir, old), ignore_errors=True)
+
+    def result_path(self, job_id, name):
+        if not _JOB_ID.fullmatch(job_id) or not _plain_name(name):
+            return None
+        path = os.path.join(self.work_dir, job_id, name)
+        return path if os.path.isfile(path) else None
+
+    def status(self):
+        with self._lock:
+            return {"workers": self.workers, "max_queue": self.max_queue, "queued": self.queued,
+                    "running": self.running, "completed": self.completed, "failed": self.failed,
+                    "rejected": self.rejected, "uptime_seconds": round(time.time() - self.started, 1),
+                    "warmup_seconds": self.warmup_seconds,
+                    "latency": {kind: latency.summary() for kind, latency in self.latency.items()}}
+
+
+CONTENT_TYPES = {".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                 ".png": "image/png", ".svg": "image/svg+xml", ".json": "application/json"}
+
+
+def _options(query, body=None):
+    # Request options from the query string and / or the JSON body
+    body = body or {}
+    marks = body.get("marks") or query.get("mark") or [pipeline.ALL_MARKS]
+    images = body.get("images", query.get("image", ["png"]))
+    marks = [marks] if isinstance(marks, str) else marks
+    images = [images] if isinstance(images, str) else images
+    for fmt in images:
+        if fmt not in pipeline.IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format '{fmt}' (png, svg)")
+
+    def flag(name, default):
+        value = body.get(name, query.get(name, [None])[-1])
+        if value is None:
+            return default
+        return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+    return {"marks": tuple(marks), "images": tuple(images),
+            "wafermap": flag("wafermap", True), "one_sheet": flag("one_sheet", False)}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "DeliverablesService/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_json(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if code == 503:
+            self.send_header("Retry-After", "5")
+        if code >= 400 and code != 422:
+            # The request body may be partly unread: do not reuse the connection
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        if parts == ["status"]:
+            return self.send_json(200, self.service.status())
+        if len(parts) == 3 and parts[0] == "results":
+            path = self.service.result_path(parts[1], parts[2])
+            if path is not None:
+                return self.send_file(path)
+        self.send_json(404, {"ok": False, "error": f"not found: {url.path}"})
+
+    def send_file(self, path):
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"))
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/process":
+            return self.send_json(404, {"ok": False, "error": f"not found: {url.path}"})
+        query = parse_qs(url.query)
+
+        job_dir = None
+        try:
+            length = _content_length(self.headers.get("Content-Length"))
+            if length > self.service.max_bytes:
+                return self.send_json(413, {"ok": False,
+                                            "error": f"upload larger than {self.service.max_bytes} bytes"})
+            if self.headers.get("Content-Type", "").split(";")[0].strip() == "application/json":
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(body, dict) or not body.get("path"):
+                    raise ValueError("'path' missing in the JSON body")
+                options = _options(query, body)
+                file_path = self.service.check_path(body["path"])
+                job_id, job_dir = self.service.new_job()
+            else:
+                if not length:
+                    raise ValueError("empty request: send the CSV as the body or a JSON {\"path\": ...}")
+                options = _options(query)
+                name = query.get("name", ["upload.wmap.csv"])[-1]
+                if not _plain_name(name):
+                    raise ValueError(f"bad upload name {name!r}: a plain file name is expected")
+                job_id, job_dir = self.service.new_job()
+                file_path = os.path.join(job_dir, name)
+                try:
+                    with open(file_path, "wb") as f:
+                        remaining = length
+                        while remaining:
+                            chunk = self.rfile.read(min(CHUNK, remaining))
+                            if not chunk:
+                                raise ValueError("upload ended early")
+                            f.write(chunk)
+                            remaining -= len(chunk)
+                except OSError as e:   # disk full, work dir gone, ...
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    return self.send_json(500, {"ok": False, "error": f"upload not saved: {e}"})
+
+            result = self.service.run(job_id, job_dir, file_path, options)
+        except ServiceBusy as e:
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return self.send_json(503, {"ok": False, "error": f"busy: {e}"})
+        except PermissionError as e:
+            return self.send_json(403, {"ok": False, "error": str(e)})
+        except (ValueError, FileNotFoundError) as e:
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return self.send_json(400, {"ok": False, "error": str(e)})
+        self.send_json(200 if result["ok"] else 422, result)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host="127.0.0.1", port=DEFAULT_PORT, quiet=False):
+        super().__init__((host, port), Handler)
+        self.service = service
+        self.quiet = quiet
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve(service, host="127.0.0.1", port=DEFAULT_PORT, quiet=False):
+    """Start the workers and a Server on a background thread; returns the server.
+
+    port=0 picks a free port (server.url); server.shutdown() then
+    service.close() stop it.
+    """
+    service.start()
+    server = Server(service, host, port, quiet)
+    threading.Thread(target=server.serve_forever, name="deliverables-service", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m deliverables.service",
+        description="Serve deliverables (workbook, fallout JSON, wafermap image) over local HTTP."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="warm worker processes = wafers processed at once (default: number of cores)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE,
+                        help="requests allowed to wait for a worker before 503 (default: %(default)s)")
+    parser.add_argument("--work-dir", default=default_work_dir(), help="uploads and results (default: %(default)s)")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="finished jobs kept (default: %(default)s)")
+    parser.add_argument("--root", action="append", default=[],
+                        help="folder that {\"path\": ...} requests may read from (repeatable; "
+                             "without one, only uploads are accepted)")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_MB, help="largest upload (default: %(default)s)")
+    parser.add_argument("--output", choices=output.BACKENDS, default=output.default_name(),
+                        help="workbook writer (default: %(default)s; DELIVERABLES_OUTPUT sets the default)")
+    parser.add_argument("--quiet", action="store_true", help="no per-request log lines")
+    args = parser.parse_args(argv)
+
+    service = Service(args.jobs, args.queue, args.work_dir, args.keep, args.root, args.output,
+                      int(args.max_mb * 1024 * 1024))
+    print(f"ℹ️ Starting {service.workers} worker(s)...")
+    server = serve(service, args.host, args.port, args.quiet)
+    print(f"✅ Ready in {service.warmup_seconds:.1f}s on {server.url}  (results in {service.work_dir})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\nℹ️ Stopping...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
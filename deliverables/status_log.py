@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+
+# Status log pane
+# show_status() may be called thousands of times per action (one color
+# warning per die), from any thread. Messages are buffered here and written
+# to the Tk Text widget once per UI tick:
+#
+#   tags       one tag per color, configured the first time it is used
+#   batching   every pending line goes in with a single insert() call
+#   warnings   a run of "⚠️" lines collapses repeats into the line already
+#              shown: "⚠️ No color mapping for C1_MARK 'v' ×312". The run
+#              ends at the next normal message, so each action (and each
+#              wafer of a lot) gets its own counts.
+#   scrollback the widget keeps the last MAX_LINES lines; every message,
+#              repeats included, is appended to a session log file
+#
+# Nothing here imports tkinter: flush() takes any widget with Text's
+# insert / delete / tag_config.
+#
+# DELIVERABLES_LOG_DIR overrides where the session log files go.
+
+MAX_LINES = 5000
+KEEP_LOGS = 20           # session log files kept in the log folder
+WARNING_PREFIX = "⚠️"
+DEFAULT_COLOR = "#000000"
+
+
+def default_dir():
+    if os.environ.get("DELIVERABLES_LOG_DIR"):
+        return os.environ["DELIVERABLES_LOG_DIR"]
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "DeliverablesAutomation", "logs")
+
+
+def session_log_path(log_dir=None):
+    """New status_<timestamp>.log path; older session logs beyond KEEP_LOGS are removed."""
+    log_dir = log_dir or default_dir()
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        old_logs = sorted(name for name in os.listdir(log_dir)
+                          if name.startswith("status_") and name.endswith(".log"))
+        for name in old_logs[:max(0, len(old_logs) - KEEP_LOGS + 1)]:
+            os.remove(os.path.join(log_dir, name))
+    except OSError:
+        return None   # no spill file; the pane still works
+    return os.path.join(log_dir, time.strftime("status_%Y%m%d_%H%M%S.log"))
+
+
+def tag_name(color):
+    return "color_" + color.lstrip("#")
+
+
+class StatusLog:
+    def __init__(self, max_lines=MAX_LINES, spill_path=None):
+        self.max_lines = max_lines
+        self.spill_path = spill_path
+        self._pending = []
+        self._lock = threading.Lock()
+        self._tags = set()
+        self._first = 1        # number of the first line still in the widget
+        self._next = 1         # number of the next line written
+        self._repeats = {}     # (message, color) -> [line number, count] in the current warning run
+
+    # --- Any thread ---
+    def add(self, message, color=None, clear=False):
+        with self._lock:
+            self._pending.append((message, color or DEFAULT_COLOR, clear))
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    # --- Tk main loop ---
+    def flush(self, text):
+        """Write every pending message to the Text widget; returns how many were taken."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        self._spill(pending)
+        chunks = []        # [chars, tag] appended with one insert()
+        new_lines = {}     # line number -> index in chunks (lines written by this flush)
+        updates = {}       # line number -> (chars, tag) of shown lines whose count changed
+
+        for message, color, clear in pending:
+            if clear:
+                self._write(text, chunks, updates)
+                chunks, new_lines, updates = [], {}, {}
+                text.delete("1.0", "end")
+                self._first = self._next = 1
+                self._repeats.clear()
+            if not message:
+                continue
+
+            tag = tag_name(color)
+            if tag not in self._tags:
+                text.tag_config(tag, foreground=color)
+                self._tags.add(tag)
+
+            if not message.startswith(WARNING_PREFIX) or "\n" in message:
+                self._repeats.clear()   # a normal message ends the warning run
+            else:
+                repeat = self._repeats.get((message, color))
+                if repeat is not None and repeat[0] >= self._first:
+                    repeat[1] += 1
+                    chars = f"{message} ×{repeat[1]}"
+                    if repeat[0] in new_lines:
+                        chunks[new_lines[repeat[0]]] = [chars + "\n", tag]
+                    else:
+                        updates[repeat[0]] = (chars, tag)
+                    continue
+                self._repeats[(message, color)] = [self._next, 1]
+
+            new_lines[self._next] = len(chunks)
+            chunks.append([message + "\n", tag])
+            self._next += message.count("\n") + 1
+
+        self._write(text, chunks, updates)
+        return len(pending)
+
+    def _write(self, text, chunks, updates):
+        for line, (chars, tag) in updates.items():
+            row = line - self._first + 1
+            text.delete(f"{row}.0", f"{row}.end")
+            text.insert(f"{row}.0", chars, tag)
+        if chunks:
+            text.insert("end", *[part for chunk in chunks for part in chunk])
+
+        excess = (self._next - self._first) - self.max_lines
+        if excess > 0:
+            text.delete("1.0", f"{excess + 1}.0")
+            self._first += excess
+
+    def _spill(self, pending):
+        if not self.spill_path:
+            return
+        stamp = time.strftime("%H:%M:%S")
+        lines = [f"{stamp} {message}\n" for message, _, _ in pending if message]
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+        except OSError:
+            self.spill_path = None   # stop trying; the pane keeps working
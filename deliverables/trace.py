@@ -0,0 +1,243 @@
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Run traces
+# Every GUI action (and batch file) runs inside trace.run(); the steps inside
+# open timed spans with trace.span("name"). Excel objects handed out by the
+# session are wrapped by counted() so each object-model round-trip (property
+# read/write, method call, item lookup) is charged to the innermost span.
+#
+# At the end of a run a short summary goes to the status box and the run is
+# appended to <output>.trace.json next to the workbook (last MAX_RUNS kept).
+#
+# Nothing is recorded outside trace.run(): span() and count_com() are no-ops.
+
+MAX_RUNS = 50
+_local = threading.local()
+
+
+class Span:
+    def __init__(self, name, offset):
+        self.name = name
+        self.offset = offset      # seconds since the run started
+        self.seconds = 0.0
+        self.com_calls = 0
+        self.children = []
+
+    @property
+    def total_com_calls(self):
+        return self.com_calls + sum(child.total_com_calls for child in self.children)
+
+    def to_dict(self):
+        data = {"name": self.name, "offset": round(self.offset, 4), "seconds": round(self.seconds, 4),
+                "com_calls": self.total_com_calls}
+        if self.children:
+            data["spans"] = [child.to_dict() for child in self.children]
+        return data
+
+
+class Trace:
+    def __init__(self, action, file_path=None, out_file=None):
+        self.action = action
+        self.file_path = file_path
+        self.out_file = out_file     # may be set during the run (lot output)
+        self.started = time.time()
+        self.status = "running"
+        self.error = None
+        self._t0 = time.perf_counter()
+        self.root = Span(action, 0.0)
+        self._stack = [self.root]
+
+    @contextmanager
+    def span(self, name):
+        span = Span(name, time.perf_counter() - self._t0)
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - self._t0 - span.offset
+            self._stack.pop()
+
+    def count_com(self, calls=1):
+        self._stack[-1].com_calls += calls
+
+    def finish(self, status="ok", error=None):
+        self.root.seconds = time.perf_counter() - self._t0
+        self.status = status
+        self.error = str(error) if error is not None else None
+
+    # --- Output ---
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "file": self.file_path,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "status": self.status,
+            "error": self.error,
+            "seconds": round(self.root.seconds, 4),
+            "com_calls": self.root.total_com_calls,
+            "spans": [span.to_dict() for span in self.root.children],
+        }
+
+    def summary_lines(self):
+        com = self.root.total_com_calls
+        lines = [f"\n⏱️ {self.action}: {self.root.seconds:.2f} s" + (f"  ({com} Excel calls)" if com else "")]
+
+        def walk(spans, depth):
+            for span in spans:
+                calls = span.total_com_calls
+                label = ("  " * depth + span.name)[:24]
+                lines.append(f"   {label:<24}{span.seconds:>8.2f} s" + (f"{calls:>8} calls" if calls else ""))
+                walk(span.children, depth + 1)
+
+        walk(self.root.children, 0)
+        return lines
+
+    def save(self, out_file):
+        path = trace_path(out_file)
+        runs = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                runs = json.load(f).get("runs", [])
+        except (OSError, ValueError):
+            pass
+        runs = (runs + [self.to_dict()])[-MAX_RUNS:]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs}, f, indent=1)
+        return path
+
+
+def trace_path(out_file):
+    return os.path.splitext(out_file)[0] + ".trace.json"
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def run(action, file_path=None, out_file=None, log=None):
+    """Trace one action on this thread; writes the JSON trace and summary."""
+    trace = Trace(action, file_path, out_file)
+    previous = current()
+    _local.trace = trace
+    try:
+        yield trace
+        trace.finish()
+    except Exception as e:
+        trace.finish("failed", e)
+        raise
+    except BaseException as e:   # JobCancelled
+        trace.finish("cancelled", type(e).__name__)
+        raise
+    finally:
+        _local.trace = previous
+        if trace.out_file:
+            try:
+                trace.save(trace.out_file)
+            except OSError:
+                pass
+        if log is not None:
+            for line in trace.summary_lines():
+                log(line)
+
+
+@contextmanager
+def span(name):
+    trace = current()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name) as s:
+        yield s
+
+
+def count_com(calls=1):
+    trace = current()
+    if trace is not None:
+        trace.count_com(calls)
+
+
+# --- Excel call counting ---
+_PLAIN = (str, bytes, int, float, bool, type(None), list, tuple, dict)
+
+
+def counted(target):
+    """Wrap an Excel (xlwings / COM) object so every round-trip is counted."""
+    if isinstance(target, _PLAIN) or isinstance(target, _Counted):
+        return target
+    return _Counted(target)
+
+
+def _unwrap(value):
+    return object.__getattribute__(value, "_target") if isinstance(value, _Counted) else value
+
+
+class _Counted:
+    __slots__ = ("_target",)
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if inspect.isroutine(value):
+            return _CountedMethod(value)   # charged when called
+        count_com()
+        return counted(value)
+
+    def __setattr__(self, name, value):
+        count_com()
+        setattr(self._target, name, _unwrap(value))
+
+    def __call__(self, *args, **kwargs):
+        count_com()
+        args = [_unwrap(a) for a in args]
+        kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+        return counted(self._target(*args, **kwargs))
+
+    def __getitem__(self, key):
+        count_com()
+        return counted(self._target[_unwrap(key)])
+
+    def __setitem__(self, key, value):
+        count_com()
+        self._target[_unwrap(key)] = _unwrap(value)
+
+    def __iter__(self):
+        count_com()
+        return (counted(item) for item in self._target)
+
+    def __len__(self):
+        count_com()
+        return len(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return repr(self._target)
+
+
+class _CountedMethod:
+    __slots__ = ("_method",)
+
+    def __init__(self, method):
+        self._method = method
+
+    def __call__(self, *args, **kwargs):
+        count_com()
+        args = [_unwrap(a) for a in args]
+        kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+        return counted(self._method(*args, **kwargs))
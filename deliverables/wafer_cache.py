@@ -0,0 +1,506 @@
+import array
+import hashlib
+import itertools
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from deliverables import sections, wmap_csv
+
+# Parsed wafer cache
+# Keeps the parsed rows of a converted CSV (header block, limits table and
+# die table) on disk in a compact binary file, so reopening the same CSV -
+# later in the session or the next day - skips the CSV parse entirely.
+#
+#   key      path + size + mtime (fast path), else the content hash, so a
+#            copied / renamed file with the same bytes still hits
+#   format   one file per entry: JSON meta + zlib-compressed column blobs
+#            (int64 / float64 arrays, or category codes for text columns);
+#            the die table of every SLOT section is stored column-wise
+#   policy   LRU by last use, bounded by total bytes on disk
+#
+# DELIVERABLES_CACHE_DIR / DELIVERABLES_CACHE_MB override the location and
+# size bound (0 MB disables the cache).
+
+CACHE_VERSION = 2
+MAGIC = b"WAFC1\n"
+DEFAULT_MAX_MB = 256
+MEMORY_ENTRIES = 2         # parsed files kept in memory for repeated actions
+HASH_BLOCK = 1 << 20
+
+_ENTRY_NAME = re.compile(r"[0-9a-f]{32}\.wafc")
+
+
+def default_dir():
+    if os.environ.get("DELIVERABLES_CACHE_DIR"):
+        return os.environ["DELIVERABLES_CACHE_DIR"]
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "DeliverablesAutomation", "wafer_cache")
+
+
+def default_max_bytes():
+    return int(float(os.environ.get("DELIVERABLES_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def content_hash(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_key(file_path):
+    st = os.stat(file_path)
+    return os.path.normcase(os.path.abspath(file_path)), st.st_size, st.st_mtime_ns
+
+
+# --- Die table columns ---
+class _Column:
+    # Typed storage for one die column: int64 / float64 while every value
+    # has that type, otherwise category codes (G/N, C1_MARK, mixed values)
+    def __init__(self):
+        self.kind = None           # "q" int64, "d" float64, "c" categories
+        self.data = None
+        self.categories = []
+        self._codes = {}
+
+    def extend(self, values):
+        if self.kind is None:
+            types = set(map(type, values))
+            self.kind = "q" if types == {int} else "d" if types == {float} else "c"
+            self.data = array.array(self.kind if self.kind != "c" else "i")
+
+        if self.kind in ("q", "d"):
+            wanted = int if self.kind == "q" else float
+            if all(type(v) is wanted for v in values):
+                try:
+                    self.data.extend(values)
+                    return
+                except OverflowError:   # int beyond int64
+                    pass
+            self._to_categories()
+
+        codes = self._codes
+        for v in values:
+            key = (v.__class__, v)
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(self.categories)
+                self.categories.append(v)
+            self.data.append(code)
+
+    def _to_categories(self):
+        values = self.data.tolist()
+        self.kind = "c"
+        self.data = array.array("i")
+        self.extend(values)
+
+    def values(self):
+        if self.kind == "c":
+            return list(map(self.categories.__getitem__, self.data))
+        return self.data.tolist()
+
+
+def _extend_columns(columns, rows):
+    width = len(columns)
+    cells = [v for row in rows for v in row]
+    for i, column in enumerate(columns):
+        column.extend(cells[i::width])
+
+
+class _DieBlock:
+    # Die table of a later SLOT section, column by column like the first one
+    def __init__(self, width):
+        self.columns = [_Column() for _ in range(width)]
+        self.count = 0
+        self.pending = []
+
+    def takes(self, row):
+        # Same rule as the first table: ends at the first blank C1_MARK
+        return len(row) == len(self.columns) and row[sections.C1_MARK_COL - 1] != ""
+
+    def flush(self):
+        if self.pending:
+            _extend_columns(self.columns, self.pending)
+            self.count += len(self.pending)
+            self.pending = []
+
+    def rows(self, skip=0):
+        return map(list, zip(*[column.values()[skip:] for column in self.columns]))
+
+
+class WaferData:
+    """Parsed rows of one CSV: head rows, typed die columns, tail."""
+
+    def __init__(self, section_index):
+        self.section_index = section_index
+        self.head_rows = []     # rows 1 .. die header (header block, limits table)
+        self.columns = []       # die table, column by column
+        self.die_count = 0
+        self.tail = []          # after the die table: row lists and _DieBlocks, file order
+        self.cacheable = True
+        self._width = None
+        self._block = None      # tail die table taking rows
+
+    # --- Building (while the CSV streams through SectionIndex.scan) ---
+    def record(self, rows, chunk_rows=wmap_csv.CHUNK_ROWS):
+        # Pass-through generator; scan() has already updated the index
+        # when a row arrives, so die rows are the ones ending at die_last_row
+        index = self.section_index
+        pending = []
+        for row_num, row in enumerate(rows, start=1):
+            if index.die_header_row is not None and index.die_header_row < row_num == index.die_last_row:
+                pending.append(row)
+                if len(pending) >= chunk_rows:
+                    self._add_die_rows(pending)
+                    pending = []
+            elif index.die_header_row is None or row_num <= index.die_header_row:
+                self.head_rows.append(row)
+            else:
+                self._add_tail_row(row, chunk_rows)
+            yield row
+        self._add_die_rows(pending)
+        self._close_block()
+
+    def _add_die_rows(self, rows):
+        if not rows or not self.cacheable:
+            return
+        width = self._width = self._width or len(rows[0])
+        if any(len(row) != width for row in rows):
+            self.cacheable = False   # ragged die rows: not worth a special format
+            self.columns = []
+            return
+        if not self.columns:
+            self.columns = [_Column() for _ in range(width)]
+        _extend_columns(self.columns, rows)
+        self.die_count += len(rows)
+
+    def _add_tail_row(self, row, chunk_rows):
+        # Later SLOT sections: header rows stay rows, die rows go column-wise
+        block = self._block
+        if block is not None and block.takes(row):
+            block.pending.append(row)
+            if len(block.pending) >= chunk_rows:
+                block.flush()
+            return
+        self._close_block()
+
+        if not self.tail or not isinstance(self.tail[-1], list):
+            self.tail.append([])
+        self.tail[-1].append(row)
+        if len(row) >= sections.C1_MARK_COL and str(row[sections.C1_MARK_COL - 1]).strip() == "C1_MARK":
+            self._block = _DieBlock(len(row))
+            self.tail.append(self._block)
+
+    def _close_block(self):
+        block, self._block = self._block, None
+        if block is not None:
+            block.flush()
+            if not block.count:          # header without die rows
+                self.tail.remove(block)
+
+    # --- Reading ---
+    @property
+    def c1_marks(self):
+        return self.section_index.c1_marks
+
+    def iter_rows(self, start=1):
+        # Same rows wmap_csv.iter_rows(file_path, start) would yield
+        head = len(self.head_rows)
+        for row in self.head_rows[start - 1:]:
+            yield list(row)
+
+        if self.die_count:
+            skip = max(0, start - 1 - head)
+            if skip < self.die_count:
+                columns = [column.values()[skip:] for column in self.columns]
+                yield from map(list, zip(*columns))
+
+        skip = max(0, start - 1 - head - self.die_count)
+        for part in self.tail:
+            size = part.count if isinstance(part, _DieBlock) else len(part)
+            if skip >= size:
+                skip -= size
+                continue
+            if isinstance(part, _DieBlock):
+                yield from part.rows(skip)
+            else:
+                for row in part[skip:]:
+                    yield list(row)
+            skip = 0
+
+    def die_column(self, idx):
+        # One die column (0-based) as a list, without building the rows
+        if idx < len(self.columns):
+            return self.columns[idx].values()
+        return [""] * self.die_count
+
+    # --- Binary format ---
+    def to_bytes(self):
+        blobs = []
+
+        def encode(columns):
+            infos = []
+            for column in columns:
+                blob = zlib.compress(column.data.tobytes(), 1)
+                infos.append({"kind": column.kind, "typecode": column.data.typecode,
+                              "bytes": len(blob), "categories": column.categories})
+                blobs.append(blob)
+            return infos
+
+        columns = encode(self.columns)
+        tail = [{"dies": part.count, "columns": encode(part.columns)} if isinstance(part, _DieBlock)
+                else {"rows": part} for part in self.tail]
+        meta = {
+            "version": CACHE_VERSION,
+            "section_index": self.section_index.to_dict(),
+            "head_rows": self.head_rows,
+            "tail": tail,
+            "die_count": self.die_count,
+            "columns": columns,
+        }
+        meta_bytes = zlib.compress(json.dumps(meta, separators=(",", ":")).encode("utf-8"), 1)
+        return b"".join([MAGIC, struct.pack("<I", len(meta_bytes)), meta_bytes] + blobs)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        if not raw.startswith(MAGIC):
+            raise ValueError("not a wafer cache file")
+        offset = len(MAGIC)
+        (meta_len,) = struct.unpack_from("<I", raw, offset)
+        offset += 4
+        meta = json.loads(zlib.decompress(raw[offset:offset + meta_len]))
+        offset += meta_len
+        if meta.get("version") != CACHE_VERSION:
+            raise ValueError("wafer cache entry from another version")
+
+        def decode(infos):
+            nonlocal offset
+            columns = []
+            for info in infos:
+                column = _Column()
+                column.kind = info["kind"]
+                column.categories = info["categories"]
+                column.data = array.array(info["typecode"])
+                column.data.frombytes(zlib.decompress(raw[offset:offset + info["bytes"]]))
+                offset += info["bytes"]
+                columns.append(column)
+            return columns
+
+        data = cls(sections.SectionIndex.from_dict(meta["section_index"]))
+        data.head_rows = meta["head_rows"]
+        data.die_count = meta["die_count"]
+        data.columns = decode(meta["columns"])
+        for part in meta["tail"]:
+            if "dies" in part:
+                block = _DieBlock(0)
+                block.columns = decode(part["columns"])
+                block.count = part["dies"]
+                data.tail.append(block)
+            else:
+                data.tail.append(part["rows"])
+        return data
+
+
+class WaferCache:
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or default_dir()
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()   # file_key -> WaferData
+        self._missed = {}              # file_key known not to be cached -> its content hash
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _entry_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.wafc")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == CACHE_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"version": CACHE_VERSION, "paths": {}, "entries": {}}
+
+    def _write_index(self, index):
+        # Atomic replace: parallel batch workers may update the index too
+        tmp = f"{self._index_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_path())
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    # --- Lookup / store ---
+    def get(self, file_path):
+        """WaferData for file_path, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            key = file_key(file_path)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if key in self._missed:
+                self.misses += 1
+                return None
+
+            index = self._read_index()
+            path, size, mtime_ns = key
+            known = index["paths"].get(path)
+            if known and known["size"] == size and known["mtime_ns"] == mtime_ns:
+                digest = known["hash"]
+            else:
+                digest = content_hash(file_path)
+
+            entry = index["entries"].get(digest)
+            data = None
+            if entry is not None:
+                try:
+                    with open(self._entry_path(digest), "rb") as f:
+                        data = WaferData.from_bytes(f.read())
+                except (OSError, ValueError, zlib.error):
+                    data = None
+
+            if data is None:
+                self._missed[key] = digest   # put() reuses it instead of hashing again
+                self.misses += 1
+                return None
+
+            entry["last_used"] = time.time()
+            index["paths"][path] = {"size": size, "mtime_ns": mtime_ns, "hash": digest}
+            self._write_index(index)
+            self._remember(key, data)
+            self.hits += 1
+            return data
+
+    def put(self, file_path, data):
+        if not self.enabled or not data.cacheable:
+            return False
+        with self._lock:
+            key = file_key(file_path)
+            digest = self._missed.get(key) or content_hash(file_path)
+            raw = data.to_bytes()
+            if len(raw) > self.max_bytes:
+                return False
+
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._entry_path(digest)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, self._entry_path(digest))
+
+            index = self._read_index()
+            index["entries"][digest] = {"bytes": len(raw), "last_used": time.time()}
+            path, size, mtime_ns = key
+            index["paths"][path] = {"size": size, "mtime_ns": mtime_ns, "hash": digest}
+            self._evict(index)
+            self._write_index(index)
+            self._missed.pop(key, None)
+            self._remember(key, data)
+            return True
+
+    def _evict(self, index):
+        # Least recently used first; files nobody indexed (e.g. a parallel
+        # writer lost the index race) count as oldest
+        entries = index["entries"]
+        on_disk = {}
+        for item in os.scandir(self.directory):
+            if _ENTRY_NAME.fullmatch(item.name):
+                on_disk[item.name[:-5]] = item.stat().st_size
+
+        total = sum(on_disk.values())
+        order = sorted(on_disk, key=lambda d: entries.get(d, {}).get("last_used", 0))
+        for digest in order:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._entry_path(digest))
+            except OSError:
+                continue
+            total -= on_disk[digest]
+            entries.pop(digest, None)
+
+        for digest in [d for d in entries if d not in on_disk]:
+            del entries[digest]
+        index["paths"] = {p: v for p, v in index["paths"].items() if v["hash"] in entries}
+
+    def clear(self):
+        # Only the entries this cache wrote: DELIVERABLES_CACHE_DIR may point
+        # at a folder that holds other files
+        with self._lock:
+            self._memory.clear()
+            self._missed.clear()
+            index = self._read_index()
+            for path in [self._entry_path(digest) for digest in index["entries"]] + [self._index_path()]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_default = None
+
+
+def default_cache():
+    global _default
+    if _default is None:
+        _default = WaferCache()
+    return _default
+
+
+def iter_rows(file_path, start=1, cache=None):
+    # Drop-in for wmap_csv.iter_rows that reads cached rows when available
+    cache = cache or default_cache()
+    try:
+        data = cache.get(file_path)
+    except OSError:
+        data = None
+    if data is None:
+        return wmap_csv.iter_rows(file_path, start)
+    return data.iter_rows(start)
+
+
+def die_columns(file_path, section_index, columns, cache=None):
+    """Die table values of the given 1-based columns, one list per column.
+
+    Straight from the cached column arrays when available, else from the
+    parsed CSV rows (die rows only, up to the first blank C1_MARK).
+    """
+    section_index.require("die")
+    cache = cache or default_cache()
+    try:
+        data = cache.get(file_path)
+    except OSError:
+        data = None
+    if data is not None and data.die_count:
+        return [data.die_column(col - 1) for col in columns]
+
+    die_rows = section_index.die_last_row - section_index.die_header_row
+    rows = itertools.islice(wmap_csv.iter_rows(file_path, start=section_index.die_header_row + 1), die_rows)
+    values = [[] for _ in columns]
+    for row in rows:
+        for col, column_values in zip(columns, values):
+            column_values.append(row[col - 1] if len(row) >= col else "")
+    return values
@@ -0,0 +1,233 @@
+import struct
+import zlib
+
+from deliverables import palette, wafermap
+
+# Wafermap image export (PNG / SVG, no Excel)
+# Renders the same grid as the W#NN_wafermap_by_End_Test_No sheet - X header
+# row, Y header column, their mirrored copies below / right of the map and
+# die cells in the production color_map colors - straight from the in-memory
+# block. Every cell is CELL_PX square with 1 px black grid lines.
+#
+# Output is pixel-exact and deterministic: a palette PNG written with the
+# stdlib (no timestamps / metadata), and an SVG with the same geometry
+# (crispEdges, one path per color), so audits can compare files byte for
+# byte. Axis labels use a built-in 3x5 pixel font in the PNG (digits,
+# letters - lower case drawn as upper case - and a few symbols; any other
+# character is left blank). Palettes of more than 256 colors are written as
+# an RGB PNG instead of an indexed one.
+
+CELL_PX = 12
+WHITE = (255, 255, 255)
+GRID_RGB = (0, 0, 0)
+HEADER_RGB = (228, 241, 253)
+HEADER_FONT_RGB = (46, 110, 158)
+PNG_LEVEL = 6
+
+# 3x5 pixel glyphs for the axis labels ("#" = ink)
+GLYPHS = {
+    "0": ["###", "#.#", "#.#", "#.#", "###"],
+    "1": [".#.", "##.", ".#.", ".#.", "###"],
+    "2": ["###", "..#", "###", "#..", "###"],
+    "3": ["###", "..#", "###", "..#", "###"],
+    "4": ["#.#", "#.#", "###", "..#", "..#"],
+    "5": ["###", "#..", "###", "..#", "###"],
+    "6": ["###", "#..", "###", "#.#", "###"],
+    "7": ["###", "..#", "..#", "..#", "..#"],
+    "8": ["###", "#.#", "###", "#.#", "###"],
+    "9": ["###", "#.#", "###", "..#", "###"],
+    "-": ["...", "...", "###", "...", "..."],
+    "N": ["#.#", "###", "###", "###", "#.#"],
+    "o": ["...", "###", "#.#", "#.#", "###"],
+    ".": [".", ".", ".", ".", "#"],
+    "A": [".#.", "#.#", "###", "#.#", "#.#"],
+    "B": ["##.", "#.#", "##.", "#.#", "##."],
+    "C": ["###", "#..", "#..", "#..", "###"],
+    "D": ["##.", "#.#", "#.#", "#.#", "##."],
+    "E": ["###", "#..", "###", "#..", "###"],
+    "F": ["###", "#..", "###", "#..", "#.."],
+    "G": ["###", "#..", "#.#", "#.#", "###"],
+    "H": ["#.#", "#.#", "###", "#.#", "#.#"],
+    "I": ["###", ".#.", ".#.", ".#.", "###"],
+    "J": ["..#", "..#", "..#", "#.#", "###"],
+    "K": ["#.#", "#.#", "##.", "#.#", "#.#"],
+    "L": ["#..", "#..", "#..", "#..", "###"],
+    "M": ["#.#", "###", "###", "#.#", "#.#"],
+    "O": ["###", "#.#", "#.#", "#.#", "###"],
+    "P": ["###", "#.#", "###", "#..", "#.."],
+    "Q": ["###", "#.#", "#.#", "###", "..#"],
+    "R": ["###", "#.#", "##.", "#.#", "#.#"],
+    "S": ["###", "#..", "###", "..#", "###"],
+    "T": ["###", ".#.", ".#.", ".#.", ".#."],
+    "U": ["#.#", "#.#", "#.#", "#.#", "###"],
+    "V": ["#.#", "#.#", "#.#", "#.#", ".#."],
+    "W": ["#.#", "#.#", "###", "###", "#.#"],
+    "X": ["#.#", "#.#", ".#.", "#.#", "#.#"],
+    "Y": ["#.#", "#.#", ".#.", ".#.", ".#."],
+    "Z": ["###", "..#", ".#.", "#..", "###"],
+    "(": [".#", "#.", "#.", "#.", ".#"],
+    ")": ["#.", ".#", ".#", ".#", "#."],
+    "_": ["...", "...", "...", "...", "###"],
+    "/": ["..#", "..#", ".#.", "#..", "#.."],
+    "+": ["...", ".#.", "###", ".#.", "..."],
+    "*": ["...", "#.#", ".#.", "#.#", "..."],
+    "#": ["#.#", "###", "#.#", "###", "#.#"],
+    ":": [".", "#", ".", "#", "."],
+    " ": ["...", "...", "...", "...", "..."],
+}
+GLYPH_HEIGHT = 5
+
+
+class WaferImage:
+    """Cell colors and axis labels of one wafermap, ready to encode."""
+
+    def __init__(self, block, et_to_c1, color_map=None):
+        rows = len(block)
+        cols = len(block[0])
+        self.rows = rows + 1          # + mirrored X header row
+        self.cols = cols + 1          # + mirrored Y header column
+        self.cells = [[WHITE] * self.cols for _ in range(self.rows)]
+        self.labels = {}              # (row, col) 0-based -> text
+
+        sheet = [row + [row[0]] for row in block] + [block[0] + ["No."]]
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if r in (0, self.rows - 1) or c in (0, self.cols - 1):
+                    self.cells[r][c] = HEADER_RGB
+                    if sheet[r][c] is not None:
+                        self.labels[(r, c)] = wafermap.normalize_et(sheet[r][c])
+
+        groups, self.warnings = wafermap.color_grid(block, et_to_c1, color_map or palette.default())
+        for rgb, cells in groups.items():
+            for r, c in cells:
+                self.cells[r - 1][c - 1] = rgb
+
+    def cell_size(self, cell_px=CELL_PX):
+        # Wide enough for the longest axis label
+        widest = max((_text_width(text) for text in self.labels.values()), default=0)
+        return max(cell_px, widest + 2, GLYPH_HEIGHT + 2)
+
+    def size(self, cell_px=CELL_PX):
+        pitch = self.cell_size(cell_px) + 1
+        return self.cols * pitch + 1, self.rows * pitch + 1
+
+
+def _glyph(ch):
+    return GLYPHS.get(ch) or GLYPHS.get(ch.upper()) or GLYPHS[" "]
+
+
+def _text_width(text):
+    return sum(len(_glyph(ch)[0]) + 1 for ch in text) - 1
+
+
+def _hex(rgb):
+    return "#%02X%02X%02X" % rgb
+
+
+# --- PNG ---
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def to_png(image, cell_px=CELL_PX):
+    """8-bit palette PNG bytes of the wafermap (RGB beyond 256 colors)."""
+    cell = image.cell_size(cell_px)
+    pitch = cell + 1
+    width, height = image.size(cell_px)
+
+    # Palette order is fixed (grid, white, header, font, then die colors sorted)
+    used = {rgb for row in image.cells for rgb in row}
+    palette = [GRID_RGB, WHITE, HEADER_RGB, HEADER_FONT_RGB]
+    palette += sorted(used - set(palette))
+    indexed = len(palette) <= 256
+    if indexed:
+        index = {rgb: bytes([i]) for i, rgb in enumerate(palette)}
+    else:
+        index = {rgb: bytes(rgb) for rgb in palette}
+    bpp = 1 if indexed else 3   # bytes per pixel
+    grid_px = index[GRID_RGB]
+    font_px = index[HEADER_FONT_RGB]
+
+    grid_line = b"\x00" + grid_px * width
+    text_top = (cell - GLYPH_HEIGHT) // 2
+    lines = []
+    for r, row in enumerate(image.cells):
+        base = b"\x00" + grid_px + b"".join(index[rgb] * cell + grid_px for rgb in row)
+        lines.append(grid_line)
+        labels = [(c, text) for c, text in ((c, image.labels.get((r, c))) for c in range(image.cols)) if text]
+        if not labels:
+            lines.extend([base] * cell)
+            continue
+
+        text_rows = [bytearray(base) for _ in range(GLYPH_HEIGHT)]
+        for c, text in labels:
+            x = 1 + c * pitch + (cell - _text_width(text)) // 2   # pixel column
+            for ch in text:
+                glyph = _glyph(ch)
+                for gy, bits in enumerate(glyph):
+                    for gx, bit in enumerate(bits):
+                        if bit == "#":
+                            offset = 1 + (x + gx) * bpp   # after the filter byte
+                            text_rows[gy][offset:offset + bpp] = font_px
+                x += len(glyph[0]) + 1
+        lines.extend([base] * text_top)
+        lines.extend(bytes(line) for line in text_rows)
+        lines.extend([base] * (cell - text_top - GLYPH_HEIGHT))
+    lines.append(grid_line)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 3 if indexed else 2, 0, 0, 0)
+    chunks = [b"\x89PNG\r\n\x1a\n", _chunk(b"IHDR", header)]
+    if indexed:
+        chunks.append(_chunk(b"PLTE", b"".join(bytes(rgb) for rgb in palette)))
+    chunks += [_chunk(b"IDAT", zlib.compress(b"".join(lines), PNG_LEVEL)), _chunk(b"IEND", b"")]
+    return b"".join(chunks)
+
+
+# --- SVG ---
+def to_svg(image, cell_px=CELL_PX):
+    """SVG text of the wafermap, same pixel geometry as to_png."""
+    cell = image.cell_size(cell_px)
+    pitch = cell + 1
+    width, height = image.size(cell_px)
+
+    paths = {}
+    for r, row in enumerate(image.cells):
+        for c, rgb in enumerate(row):
+            paths.setdefault(rgb, []).append(f"M{1 + c * pitch} {1 + r * pitch}h{cell}v{cell}h-{cell}z")
+
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" shape-rendering="crispEdges">',
+        f'<rect width="{width}" height="{height}" fill="{_hex(GRID_RGB)}"/>',
+    ]
+    for rgb in sorted(paths):
+        out.append(f'<path fill="{_hex(rgb)}" d="{"".join(paths[rgb])}"/>')
+
+    out.append(f'<g fill="{_hex(HEADER_FONT_RGB)}" font-family="Arial, sans-serif" font-size="{max(6, cell * 0.6):g}" '
+               f'font-weight="bold" text-anchor="middle" dominant-baseline="central">')
+    for (r, c), text in sorted(image.labels.items()):
+        x = 1 + c * pitch + cell / 2
+        y = 1 + r * pitch + cell / 2
+        text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        out.append(f'<text x="{x:g}" y="{y:g}">{text}</text>')
+    out.append("</g>")
+    out.append("</svg>")
+    return "\n".join(out) + "\n"
+
+
+def write_images(path_base, block, et_to_c1, formats=("png", "svg"), color_map=None, cell_px=CELL_PX):
+    """Write <path_base>.png / .svg; returns (paths, color warnings)."""
+    image = WaferImage(block, et_to_c1, color_map)
+    paths = []
+    for fmt in formats:
+        path = f"{path_base}.{fmt}"
+        if fmt == "png":
+            with open(path, "wb") as f:
+                f.write(to_png(image, cell_px))
+        elif fmt == "svg":
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(to_svg(image, cell_px))
+        else:
+            raise ValueError(f"Unknown image format '{fmt}' (png, svg)")
+        paths.append(path)
+    return paths, image.warnings
@@ -0,0 +1,177 @@
+# Wafermap coloring stage
+# Works out the fill of every die cell in memory and groups cells that share
+# a color, so the sheet is painted with one call per color (per address
+# chunk) instead of one read + one write per die. Colors come from the
+# compiled palette of the wafer's test program (palette.py).
+# pivot_block / fill_wafermap_sheet build the same sheet fully in memory
+# as an output.Sheet (lot mode and the Excel-free wafermap writer).
+
+from deliverables import palette
+from deliverables.output import Style
+
+MAX_ADDRESS_LEN = 255           # Excel's limit for a Range() address string
+
+
+def rgb_to_int(rgb):
+    # Same packing as xlwings.utils.rgb_to_int (Excel BGR integer)
+    return rgb[0] + (rgb[1] * 256) + (rgb[2] * 256 * 256)
+
+
+def normalize_et(et_val):
+    if isinstance(et_val, float) and et_val.is_integer():
+        return str(int(et_val))
+    return str(et_val).strip()
+
+
+def normalize_mark(c1_mark_str):
+    # Numeric marks read back as floats: 1.0 -> "1"
+    try:
+        f = float(c1_mark_str)
+        if f.is_integer():
+            return str(int(f))
+    except ValueError:
+        pass   # Not numeric (special chars, mixed letters), leave as-is
+    return c1_mark_str
+
+
+def color_grid(block, et_to_c1, color_map):
+    """Color every die of the pasted wafermap block.
+
+    block is the value grid with the X header row and Y header column
+    (block[0][0] is sheet cell A1); color_map is a compiled palette.Palette
+    (a {C1_MARK: "#RRGGBB"} dict is compiled first). Returns (groups,
+    warnings): groups maps an RGB tuple to the 1-based (row, col) cells that
+    get it, warnings lists the status messages for dies that fall back to
+    the palette's default color, in sheet order.
+    """
+    if isinstance(color_map, dict):
+        color_map = palette.Palette.from_colors(color_map)
+    rgb_by_et = {}
+    groups = {}
+    warnings = []
+
+    for r, row in enumerate(block[1:], start=2):
+        for c, et_val in enumerate(row[1:], start=2):
+            if et_val is None or str(et_val).strip() == "":
+                continue
+
+            et_str = normalize_et(et_val)
+            if et_str not in rgb_by_et:
+                # Resolve each distinct ET once
+                c1_mark_str = et_to_c1.get(et_str)
+                if c1_mark_str is None:
+                    rgb_by_et[et_str] = (color_map.rgb[0], f"⚠️ No C1_MARK found for ET '{et_str}'")
+                else:
+                    c1_mark_str = normalize_mark(c1_mark_str)
+                    code = color_map.code(c1_mark_str)
+                    warning = None if code else f"⚠️ No color mapping for C1_MARK '{c1_mark_str}'"
+                    rgb_by_et[et_str] = (color_map.rgb[code], warning)
+
+            rgb, warning = rgb_by_et[et_str]
+            groups.setdefault(rgb, []).append((r, c))
+            if warning:
+                warnings.append(warning)
+
+    return groups, warnings
+
+
+def column_letter(col):
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def range_addresses(cells, max_len=MAX_ADDRESS_LEN):
+    """Merge cells into row runs ("B2:F2") and pack them into union addresses."""
+    runs = []
+    by_row = {}
+    for r, c in cells:
+        by_row.setdefault(r, []).append(c)
+    for r in sorted(by_row):
+        cols = sorted(by_row[r])
+        start = prev = cols[0]
+        for c in cols[1:] + [None]:
+            if c is not None and c == prev + 1:
+                prev = c
+                continue
+            first = f"{column_letter(start)}{r}"
+            runs.append(first if start == prev else f"{first}:{column_letter(prev)}{r}")
+            if c is not None:
+                start = prev = c
+
+    addresses = []
+    current = ""
+    for run in runs:
+        if current and len(current) + 1 + len(run) > max_len:
+            addresses.append(current)
+            current = run
+        else:
+            current = f"{current},{run}" if current else run
+    if current:
+        addresses.append(current)
+    return addresses
+
+
+# --- In-memory wafermap (no Excel PivotCache) ---
+HEADER_RGB = "FFE4F1FD"        # (228, 241, 253)
+HEADER_FONT_RGB = "FF2E6E9E"   # (46, 110, 158)
+
+
+def _axis_key(value):
+    # Pivot item order: numbers ascending, then text
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value).lower())
+
+
+def pivot_block(dies):
+    """Same grid as the "Min of ET" pivot (Y rows, X columns).
+
+    dies maps (x, y) -> lowest ET of that die. block[0] is the "No." / X
+    header row, block[r][0] the Y value; missing dies are None.
+    """
+    xs = sorted({x for x, _ in dies}, key=_axis_key)
+    ys = sorted({y for _, y in dies}, key=_axis_key)
+    block = [["No."] + xs]
+    for y in ys:
+        block.append([y] + [dies.get((x, y)) for x in xs])
+    return block
+
+
+HEADER_STYLE = Style(fill=HEADER_RGB, bold=True, font_color=HEADER_FONT_RGB, border=True, center=True)
+DIE_STYLE = Style(border=True, center=True)
+
+
+def fill_wafermap_sheet(sheet, block, et_to_c1, color_map=None):
+    """Write a wafermap block with the same layout as the Excel version.
+
+    Mirrors the header row below the map and the Y column right of it,
+    colors dies by C1_MARK and returns the color warnings. Cells share one
+    style per color (header, plain, one per die color) so styles.xml stays
+    as small as the palette.
+    """
+    rows = len(block)
+    cols = len(block[0])
+
+    for r, row in enumerate(block + [block[0]], start=1):
+        values = row + ["No." if r > rows else row[0]]
+        for c, value in enumerate(values, start=1):
+            sheet.cell(r, c, value)
+
+    # --- Header row / column (and their mirrored copies), then die colors ---
+    styles = sheet.styles
+    for r in range(1, rows + 2):
+        header_row = r in (1, rows + 1)
+        for c in range(1, cols + 2):
+            styles[r, c] = HEADER_STYLE if header_row or c in (1, cols + 1) else DIE_STYLE
+
+    color_groups, color_warnings = color_grid(block, et_to_c1, color_map or palette.default())
+    for rgb in sorted(color_groups):
+        style = DIE_STYLE._replace(fill="FF%02X%02X%02X" % rgb)
+        for cell in color_groups[rgb]:
+            styles[cell] = style
+
+    sheet.show_gridlines = False
+    return color_warnings
@@ -0,0 +1,66 @@
+import importlib
+import threading
+import time
+
+# Backend warm-up
+# The GUI imports only the light modules (jobs, excel_session) so the
+# Tk window paints before openpyxl and NumPy are loaded. The processing
+# modules are reached through lazy() proxies that import on first attribute
+# access, and start() imports them on a background thread once the window
+# is up, so the first button press normally finds them loaded.
+#
+# xlwings is not warmed up: excel_session imports it when an action really
+# needs Excel, which most actions no longer do.
+
+BACKENDS = ("deliverables.trace", "deliverables.pipeline", "deliverables.lot")
+
+timings = {}       # module -> seconds spent importing it on the warm-up thread
+_thread = None
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first use."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            # Let a running warm-up finish first: two threads importing the
+            # same package tree can trip the import deadlock detection
+            thread = _thread
+            if thread is not None and thread is not threading.current_thread():
+                thread.join()
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy(name):
+    return LazyModule(name)
+
+
+def start(modules=BACKENDS, on_done=None):
+    """Import modules on a daemon thread; returns the thread."""
+    global _thread
+
+    def work():
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue   # reported by the action that needs it
+            timings[name] = time.perf_counter() - started
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=work, name="deliverables-warmup", daemon=True)
+    thread.start()
+    _thread = thread   # published once started: join() needs a started thread
+    return thread
@@ -0,0 +1,142 @@
+import csv
+import itertools
+
+try:
+    import numpy as np
+except ImportError:   # column parsing falls back to parse_value per cell
+    np = None
+
+# qccsvout (.wmap.csv) reading helpers.
+# Values are converted exactly like the original Convert step:
+# digit-only text -> int, anything float() accepts -> float, else kept as text.
+#
+# The reader knows the file layout: header and limits rows are parsed row by
+# row (text mostly, rejected without raising), while the die table is read in
+# chunks and converted column by column, in bulk with NumPy for the numeric
+# columns. Every value is identical to parse_value() on the same cell.
+
+C1_MARK_IDX = 6                                  # Column G
+DIE_TEXT_COLUMNS = {"G/N", "C1_MARK", "C2_MARK"}  # everything else in the die table is numeric
+CHUNK_ROWS = 4096
+
+_NUMBER_START = set("0123456789.iInN")   # first char float() can accept (after a sign): digits, ".", inf, nan
+_NUMBER_CHARS = b"0123456789.+-eE"
+_MAX_INT_DIGITS = 18                     # fits int64 without overflow
+
+
+def parse_value(value):
+    # Text that float() can never accept is returned without raising
+    s = value.lstrip()
+    c = s[:1]
+    if c in ("+", "-"):
+        c = s[1:2]
+    if c.isascii() and c not in _NUMBER_START:
+        return value
+
+    try:
+        if value.isdigit():
+            return int(value)
+        return float(value)
+    except ValueError:
+        return value
+
+
+def parse_column(values):
+    """[parse_value(v) for v in values], converted in bulk where possible."""
+    if not values:
+        return []
+    joined = "".join(values)
+    if not joined.isascii() or "\x00" in joined:
+        # Non-ASCII (and NUL, which byte strings drop) goes cell by cell
+        return [parse_value(v) for v in values]
+    if joined.isdigit() and all(values):
+        return list(map(int, values))   # the usual die column: digits only
+    if np is None:
+        return [parse_value(v) for v in values]
+
+    arr = np.array(values, dtype="S")
+    lengths = np.char.str_len(arr)
+    digits = np.char.isdigit(arr)
+    result = np.empty(len(values), dtype=object)
+
+    # --- Digit-only cells -> int ---
+    ints = digits & (lengths <= _MAX_INT_DIGITS)
+    if ints.any():
+        result[ints] = arr[ints].astype(np.int64).tolist()
+
+    # --- Plain decimal / exponent cells -> float ---
+    floats = ~digits & (lengths > 0) & (np.char.strip(arr, _NUMBER_CHARS) == b"")
+    if floats.any():
+        try:
+            result[floats] = arr[floats].astype(np.float64).tolist()
+        except ValueError:   # e.g. "1e" or "--": let parse_value decide per cell
+            floats[:] = False
+
+    # --- Everything else (text, blanks, long digit runs) ---
+    for i in np.flatnonzero(~(ints | floats)):
+        result[i] = parse_value(values[i])
+    return result.tolist()
+
+
+def _is_die_header(row):
+    return len(row) > C1_MARK_IDX and row[C1_MARK_IDX].strip() == "C1_MARK"
+
+
+def _parse_die_table(reader, header):
+    # Yields the die rows in chunks; returns the rows read past the end of
+    # the table (first blank C1_MARK) so the caller can continue with them
+    text_cols = {i for i, name in enumerate(header) if name.strip().upper() in DIE_TEXT_COLUMNS}
+    while True:
+        chunk = list(itertools.islice(reader, CHUNK_ROWS))
+        end = next((i for i, row in enumerate(chunk)
+                    if len(row) <= C1_MARK_IDX or row[C1_MARK_IDX] == ""), len(chunk))
+        yield from _parse_block(chunk[:end], text_cols)
+        if end < len(chunk) or len(chunk) < CHUNK_ROWS:
+            return chunk[end:]
+
+
+def _parse_block(rows, text_cols):
+    if not rows:
+        return []
+    width = len(rows[0])
+    if any(len(row) != width for row in rows):
+        return [[parse_value(value) for value in row] for row in rows]   # ragged: row by row
+
+    # Columns are strided slices of the flattened chunk (no transpose)
+    cells = list(itertools.chain.from_iterable(rows))
+    for i in range(width):
+        column = cells[i::width]
+        if i in text_cols:
+            # Few distinct marks per column: parse each one once
+            parsed = {value: parse_value(value) for value in set(column)}
+            cells[i::width] = list(map(parsed.__getitem__, column))
+        else:
+            cells[i::width] = parse_column(column)
+    return [cells[k:k + width] for k in range(0, len(cells), width)]
+
+
+def _parse_rows(reader):
+    while True:
+        die_header = None
+        for row in reader:
+            yield [parse_value(value) for value in row]
+            if _is_die_header(row):
+                die_header = row
+                break
+        if die_header is None:
+            return
+        leftover = yield from _parse_die_table(reader, die_header)
+        reader = itertools.chain(leftover, reader)
+
+
+def iter_rows(file_path, start=1):
+    # Yield parsed rows one at a time (at most one die chunk in memory).
+    # start: first row to return; earlier lines are skipped without parsing.
+    # Big lot files go through the memory-mapped reader (same rows).
+    from deliverables import wmap_mmap
+    if wmap_mmap.wanted(file_path):
+        yield from wmap_mmap.iter_rows(file_path, start)
+        return
+    with open(file_path, newline='', encoding='utf-8') as f:
+        lines = itertools.islice(f, start - 1, None) if start > 1 else f
+        yield from _parse_rows(csv.reader(lines))
@@ -0,0 +1,360 @@
+import csv
+import io
+import mmap
+import os
+
+try:
+    import numpy as np
+except ImportError:   # wmap_csv keeps using the text reader
+    np = None
+
+from deliverables import wmap_csv
+
+# Memory-mapped qccsvout reader (multi-hundred-MB lot files)
+# The file is mapped read-only and section boundaries - #COMMON_HEAD, the
+# TSNO / LOLIMIT table and the X,Y,INDEX,...,C1_MARK die header - are found
+# by byte search. Header and limits rows are few and go through csv.reader;
+# die blocks are split on "\n" / "," with NumPy directly over the mapped
+# buffer and digit-only cells are converted in bulk, so no Python string is
+# built per line (only for the odd float / text cell, and once per distinct
+# G/N / C1_MARK / C2_MARK value). Header-only queries map the file but only
+# read the pages before the first die header.
+#
+# Rows are identical to wmap_csv.iter_rows; wmap_csv switches to this reader
+# for files of MMAP_MIN_MB and more. Blocks the fast path cannot prove
+# equivalent (quotes, lone "\r", NUL, ragged rows) fall back to csv.reader
+# from that byte offset on.
+
+MMAP_MIN_MB = float(os.environ.get("DELIVERABLES_MMAP_MB", "64"))
+BLOCK_BYTES = 1 << 20        # die bytes split per step
+MAX_INT_DIGITS = 18
+
+NL, CR, COMMA, QUOTE = 10, 13, 44, 34
+_POW10 = None
+
+
+def available():
+    return np is not None
+
+
+def wanted(file_path):
+    # wmap_csv.iter_rows hands big files over to this reader
+    try:
+        return np is not None and os.path.getsize(file_path) >= MMAP_MIN_MB * 1024 * 1024
+    except OSError:
+        return False
+
+
+class Section:
+    """Byte offsets (line starts) of one wafer section, None when absent."""
+
+    def __init__(self, common_head=None, limits_header=None, die_header=None, die_end=None):
+        self.common_head = common_head
+        self.limits_header = limits_header
+        self.die_header = die_header
+        self.die_end = die_end
+
+    def __repr__(self):
+        return (f"Section(common_head={self.common_head}, limits_header={self.limits_header}, "
+                f"die_header={self.die_header}, die_end={self.die_end})")
+
+
+class MappedCsv:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.view = np.frombuffer(self.mm, dtype=np.uint8) if self.size and np is not None else None
+
+    def close(self):
+        self.view = None
+        if self.size:
+            self.mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Byte search ---
+    def line_start(self, pos):
+        return self.mm.rfind(b"\n", 0, pos) + 1
+
+    def line_end(self, pos):
+        # Offset just past the line's "\n" (or the end of the file)
+        end = self.mm.find(b"\n", pos)
+        return self.size if end < 0 else end + 1
+
+    def next_line(self, pos):
+        # Like line_end, but a bare "\r" also ends a line (text-mode file
+        # iteration, which wmap_csv.iter_rows uses to skip to `start`)
+        end = self.line_end(pos)
+        cr = self.mm.find(b"\r", pos, end)
+        return cr + 1 if 0 <= cr < end - 2 else end
+
+    def find_line(self, prefix, start=0, end=None):
+        # Start of the first line beginning with prefix (BOM allowed on line 1)
+        end = self.size if end is None else end
+        for candidate in (b"\xef\xbb\xbf" + prefix, prefix):
+            if start == 0 and self.mm[:len(candidate)] == candidate:
+                return 0
+        pos = self.mm.find(b"\n" + prefix, max(0, start - 1), end)
+        return pos + 1 if pos >= 0 else None
+
+    def find_die_header(self, start=0, end=None):
+        # (line start, line end, raw header cells) of the next die header
+        end = self.size if end is None else end
+        pos = start
+        while True:
+            pos = self.mm.find(b"C1_MARK", pos, end)
+            if pos < 0:
+                return None
+            first, last = self.line_start(pos), self.line_end(pos)
+            if first >= start:
+                row = next(csv.reader([self.mm[first:last].decode("utf-8")]), [])
+                if wmap_csv._is_die_header(row):
+                    return first, last, row
+            pos += 7
+
+    def sections(self):
+        """Every wafer section, located by byte search only."""
+        found = []
+        pos = 0
+        while True:
+            header = self.find_die_header(pos)
+            if header is None:
+                return found
+            common = self.find_line(b"#COMMON_HEAD", pos, header[0])
+            limits = self.find_line(b"TSNO,", pos, header[0])
+            die_end = self.die_end(header[1])
+            found.append(Section(common, limits, header[0], die_end))
+            pos = die_end
+
+    def die_end(self, pos):
+        # Start of the first line past pos whose C1_MARK cell is empty
+        for block_pos, block in self._blocks(pos):
+            if block.stop < len(block.starts):
+                return block_pos + int(block.starts[block.stop])
+        return self.size
+
+    # --- Rows ---
+    def text_rows(self, start, end):
+        # Parsed rows of a (small) region without a die header in it
+        text = self.mm[start:end].decode("utf-8")
+        return [[wmap_csv.parse_value(value) for value in row] for row in csv.reader(io.StringIO(text, newline=""))]
+
+    def die_rows(self, pos, header):
+        """Parsed die rows from pos; returns the offset where the table ended.
+
+        Returns None instead when a block needs csv.reader (the caller
+        continues with the text reader from the offset recorded in
+        self.fallback_at).
+        """
+        text_cols = {i for i, name in enumerate(header) if name.strip().upper() in wmap_csv.DIE_TEXT_COLUMNS}
+        for block_pos, block in self._blocks(pos):
+            rows = block.parse(text_cols) if block.exact else None
+            if rows is None:
+                self.fallback_at = block_pos
+                return None
+            yield from rows
+            if block.stop < len(block.starts):
+                return block_pos + int(block.starts[block.stop])
+        return self.size
+
+    def _blocks(self, pos):
+        # (offset, _Block) of whole lines from pos, BLOCK_BYTES at a time
+        size = BLOCK_BYTES
+        while pos < self.size:
+            window = self.view[pos:pos + size]
+            newlines = np.flatnonzero(window == NL)
+            if pos + len(window) < self.size:
+                if not len(newlines):
+                    size *= 2   # a line longer than the block
+                    continue
+                window = window[:newlines[-1] + 1]
+            elif not len(newlines) or newlines[-1] != len(window) - 1:
+                newlines = np.append(newlines, len(window))   # last line without "\n"
+            yield pos, _Block(window, newlines)
+            pos += len(window)
+
+
+class _Block:
+    """Line and comma offsets of a run of lines, up to the end of the die table."""
+
+    def __init__(self, window, newlines):
+        self.window = window
+        # Quotes, NUL and bare "\r" change how csv.reader splits cells / lines
+        self.exact = not ((window == QUOTE).any() or (window == 0).any() or _lone_cr(window))
+
+        self.starts = np.empty(len(newlines), dtype=np.int64)
+        self.starts[0] = 0
+        self.starts[1:] = newlines[:-1] + 1
+        ends = newlines.astype(np.int64)
+        ends -= (ends > self.starts) & (window[np.maximum(ends - 1, 0)] == CR)
+        self.ends = ends
+
+        self.commas = np.flatnonzero(window == COMMA)
+        self.first_comma = np.searchsorted(self.commas, self.starts)
+        self.counts = np.searchsorted(self.commas, ends) - self.first_comma
+
+        # --- Table ends at the first row without a C1_MARK value ---
+        mark_idx = wmap_csv.C1_MARK_IDX
+        has_mark = self.counts >= mark_idx
+        if len(self.commas):
+            last = len(self.commas) - 1
+            mark_start = np.where(has_mark, self.commas[np.minimum(self.first_comma + mark_idx - 1, last)] + 1, 0)
+            mark_end = np.where(self.counts > mark_idx, self.commas[np.minimum(self.first_comma + mark_idx, last)], ends)
+            blank = ~has_mark | (mark_end <= mark_start)
+        else:
+            blank = np.ones(len(self.starts), dtype=bool)
+        self.stop = int(np.argmax(blank)) if blank.any() else len(self.starts)
+
+    def parse(self, text_cols):
+        # Rows before stop, or None when they are ragged (csv.reader decides)
+        if not self.stop:
+            return []
+        return _parse_lines(self.window, self.starts[:self.stop], self.ends[:self.stop], self.commas,
+                            self.first_comma[:self.stop], self.counts[:self.stop], text_cols)
+
+
+def _lone_cr(window):
+    # csv.reader ends a line at a bare "\r"; only "\r\n" is handled here
+    cr = np.flatnonzero(window == CR)
+    if not len(cr):
+        return False
+    following = cr + 1
+    inside = following < len(window)
+    return bool((window[following[inside]] != NL).any())
+
+
+def _parse_lines(window, starts, ends, commas, first_comma, counts, text_cols):
+    width = int(counts[0]) + 1
+    if (counts != width - 1).any():
+        return None   # ragged rows: csv.reader / parse_value row by row
+
+    columns = []
+    for i in range(width):
+        cell_start = starts if i == 0 else commas[first_comma + i - 1] + 1
+        cell_end = ends if i == width - 1 else commas[first_comma + i]
+        columns.append(_parse_cells(window, cell_start, cell_end, i in text_cols))
+
+    cells = np.empty((len(starts), width), dtype=object)
+    for i, values in enumerate(columns):
+        cells[:, i] = values
+    return cells.tolist()
+
+
+def _cell_bytes(window, cell_start, lengths):
+    # Fixed-width byte matrix of the cells (zero padded), no Python strings
+    width = int(lengths.max()) if len(lengths) else 0
+    if width == 0:
+        return np.zeros((len(lengths), 0), dtype=np.uint8), width
+    offsets = np.arange(width)
+    inside = offsets < lengths[:, None]
+    idx = np.where(inside, cell_start[:, None] + offsets, 0)
+    return np.where(inside, window[idx], 0).astype(np.uint8), width
+
+
+def _parse_cells(window, cell_start, cell_end, text):
+    lengths = cell_end - cell_start
+    matrix, width = _cell_bytes(window, cell_start, lengths)
+    if width == 0:
+        return [""] * len(lengths)
+
+    if text or width > MAX_INT_DIGITS:
+        # Few distinct values (marks) or long cells: parse each distinct value once
+        raw = np.ascontiguousarray(matrix).view(f"S{width}").ravel()
+        uniques, inverse = np.unique(raw, return_inverse=True)
+        parsed = [wmap_csv.parse_value(value.decode("utf-8")) for value in uniques.tolist()]
+        return list(map(parsed.__getitem__, inverse.tolist()))
+
+    # --- Digit-only cells -> int in bulk ---
+    global _POW10
+    if _POW10 is None:
+        _POW10 = 10 ** np.arange(MAX_INT_DIGITS, dtype=np.int64)
+    offsets = np.arange(width)
+    inside = offsets < lengths[:, None]
+    digits = matrix.astype(np.int64) - 48
+    is_int = (lengths > 0) & ((~inside) | ((digits >= 0) & (digits <= 9))).all(axis=1)
+    power = _POW10[np.clip(lengths[:, None] - 1 - offsets, 0, MAX_INT_DIGITS - 1)]
+    ints = np.where(inside, digits * power, 0).sum(axis=1)
+
+    values = np.empty(len(lengths), dtype=object)
+    values[is_int] = ints[is_int].tolist()
+    other = np.flatnonzero(~is_int)
+    if len(other):
+        raw = np.ascontiguousarray(matrix[other]).view(f"S{width}").ravel()
+        values[other] = wmap_csv.parse_column([value.decode("utf-8") for value in raw.tolist()])
+    return values
+
+
+# --- Readers ---
+def iter_rows(file_path, start=1):
+    """Same rows as wmap_csv.iter_rows(file_path, start), read through mmap."""
+    with MappedCsv(file_path) as mapped:
+        if not mapped.size:
+            return
+        pos, in_table = _skip_lines(mapped, start)
+        header = None
+        if in_table is not None:
+            header = in_table
+        while pos < mapped.size:
+            if header is None:
+                found = mapped.find_die_header(pos)
+                if found is None:
+                    yield from mapped.text_rows(pos, mapped.size)
+                    return
+                yield from mapped.text_rows(pos, found[1])
+                pos, header = found[1], found[2]
+
+            end = yield from mapped.die_rows(pos, header)
+            if end is None:
+                # Rest of the file through csv.reader, from the block that needed it
+                yield from _csv_rows_from(file_path, mapped.fallback_at, header)
+                return
+            pos, header = end, None
+
+
+def _skip_lines(mapped, start):
+    # Offset of line `start` (1-based) and the die header when it falls
+    # right inside a die table (start = die header row + 1)
+    pos = 0
+    for _ in range(start - 1):
+        pos = mapped.next_line(pos)
+        if pos >= mapped.size:
+            return mapped.size, None
+    if pos == 0:
+        return 0, None
+    previous = mapped.line_start(pos - 1)
+    row = next(csv.reader([mapped.mm[previous:pos].decode("utf-8")]), [])
+    return pos, row if wmap_csv._is_die_header(row) else None
+
+
+def _csv_rows_from(file_path, offset, header=None):
+    with open(file_path, "rb") as raw:
+        raw.seek(offset)
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+        if header is not None:
+            leftover = yield from wmap_csv._parse_die_table(reader, header)
+            reader = _chain(leftover, reader)
+        yield from wmap_csv._parse_rows(reader)
+
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
+
+
+def header_rows(file_path):
+    """Parsed rows before the first die header (header block, limits table).
+
+    Only the pages up to the die header are read, however big the file.
+    """
+    with MappedCsv(file_path) as mapped:
+        if not mapped.size:
+            return []
+        found = mapped.find_die_header()
+        return mapped.text_rows(0, found[0] if found else mapped.size)
@@ -0,0 +1,437 @@
+import numbers
+import os
+import posixpath
+import re
+import struct
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape, quoteattr, unescape
+
+# In-place sheet updates of an existing .xlsx
+# Adds, replaces or merges output.Sheet objects by editing only the package
+# parts they touch; every other part (the data sheet, column widths, merged
+# ranges, charts, sheets the user added) is copied over byte for byte,
+# still compressed, so nothing is loaded or re-created.
+#
+#   new sheet       xl/worksheets/sheetN.xml + workbook / rels / content type
+#   replaced sheet  same part rewritten; its column widths and tab color kept
+#   merged sheet    cells set in the existing part (End Test block on Pivot)
+#   styles          fonts / fills / borders / number formats / xfs appended
+#                   to xl/styles.xml
+#
+# Cell text is written as inline strings, so sharedStrings.xml is untouched.
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WORKSHEET_REL = REL_NS + "/worksheet"
+WORKSHEET_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+COPY_BLOCK = 1 << 20
+
+_ATTR = re.compile(r'([\w:]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+_SHEET = re.compile(r"<sheet\b[^>]*?(?:/>|>\s*</sheet>)")
+_RELATIONSHIP = re.compile(r"<Relationship\b[^>]*?(?:/>|>\s*</Relationship>)")
+_ROW = re.compile(r"<row\b[^>]*?(?:/>|>.*?</row>)", re.S)
+_CELL = re.compile(r"<c\b[^>]*?(?:/>|>.*?</c>)", re.S)
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_PART = re.compile(r"xl/worksheets/sheet(\d+)\.xml")
+_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# styles.xml collections and their item tags
+STYLE_ITEMS = {"numFmts": "numFmt", "fonts": "font", "fills": "fill", "borders": "border", "cellXfs": "xf"}
+
+
+def _attrs(tag):
+    return {name: unescape(value[1:-1], {"&quot;": '"', "&apos;": "'"}) for name, value in _ATTR.findall(tag)}
+
+
+def _column_letter(column):
+    letters = ""
+    while column:
+        column, rest = divmod(column - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _set_attr(tag, name, value):
+    # Start tag with one attribute set (added before the closing ">" / "/>")
+    pattern = re.compile(r'\s%s\s*=\s*("[^"]*"|\'[^\']*\')' % re.escape(name))
+    if value is None:
+        return pattern.sub("", tag)
+    if pattern.search(tag):
+        return pattern.sub(f' {name}="{value}"', tag, count=1)
+    end = len(tag) - 2 if tag.endswith("/>") else len(tag) - 1
+    return f'{tag[:end]} {name}="{value}"{tag[end:]}'
+
+
+def _check_default_namespace(xml, root, part):
+    # Parts written with a prefixed main namespace (<x:worksheet>) are rare
+    # and not edited here
+    if not re.search(r"<%s\b" % root, xml):
+        raise ValueError(f"{part}: unsupported workbook part (no <{root}> element)")
+
+
+# --- Styles ---
+class _Styles:
+    """xl/styles.xml with new cell formats appended; xf() gives the index."""
+
+    def __init__(self, xml):
+        _check_default_namespace(xml, "styleSheet", "xl/styles.xml")
+        if "<cellXfs" not in xml:
+            raise ValueError("xl/styles.xml: unsupported workbook part (no cell formats)")
+        self.xml = xml
+        self.added = {name: [] for name in STYLE_ITEMS}
+        self.counts = {name: len(re.findall(r"<%s\b" % item, self._block(name))) for name, item in STYLE_ITEMS.items()}
+        ids = [int(n) for n in re.findall(r'numFmtId="(\d+)"', self._block("numFmts"))]
+        self.next_format = max(ids + [163]) + 1
+        self.formats = {}
+        fonts = self._block("fonts")
+        first = re.search(r"<font\b[^>]*?(?:/>|>.*?</font>)", fonts, re.S)
+        # New fonts start from the default font (size / name / family)
+        base = re.sub(r"^<font\b([^>]*?)/>$", r"<font\1></font>", first.group(0) if first else "<font/>")
+        self.base_font = re.sub(r"<(?:b|color)\b[^>]*?(?:/>|>\s*</(?:b|color)>)", "", base)
+        self.xfs = {}
+
+    def _block(self, name):
+        match = re.search(r"<%s\b[^>]*?(?:/>|>.*?</%s>)" % (name, name), self.xml, re.S)
+        return match.group(0) if match else ""
+
+    def _add(self, name, item):
+        self.added[name].append(item)
+        return self.counts[name] + len(self.added[name]) - 1
+
+    def _number_format(self, code):
+        if code not in self.formats:
+            self.formats[code] = self.next_format
+            self.added["numFmts"].append(f'<numFmt numFmtId="{self.next_format}" formatCode={quoteattr(code)}/>')
+            self.next_format += 1
+        return self.formats[code]
+
+    def xf(self, style):
+        if style not in self.xfs:
+            attrs = {"numFmtId": 0, "fontId": 0, "fillId": 0, "borderId": 0, "xfId": 0}
+            if style.number_format:
+                attrs.update(numFmtId=self._number_format(style.number_format), applyNumberFormat=1)
+            if style.bold or style.font_color:
+                extra = ("<b/>" if style.bold else "") + (
+                    f'<color rgb="{_argb(style.font_color)}"/>' if style.font_color else "")
+                font = re.sub(r"^(<font\b[^>]*>)", lambda m: m.group(1) + extra, self.base_font)
+                attrs.update(fontId=self._add("fonts", font), applyFont=1)
+            if style.fill:
+                attrs.update(fillId=self._add("fills", (
+                    f'<fill><patternFill patternType="solid"><fgColor rgb="{_argb(style.fill)}"/>'
+                    '<bgColor indexed="64"/></patternFill></fill>')), applyFill=1)
+            if style.border:
+                sides = "".join(f'<{side} style="thin"><color indexed="64"/></{side}>'
+                                for side in ("left", "right", "top", "bottom"))
+                attrs.update(borderId=self._add("borders", f"<border>{sides}<diagonal/></border>"), applyBorder=1)
+            alignment = ""
+            if style.center:
+                attrs["applyAlignment"] = 1
+                alignment = '<alignment horizontal="center" vertical="center"/>'
+            head = "<xf " + " ".join(f'{name}="{value}"' for name, value in attrs.items())
+            self.xfs[style] = self._add("cellXfs", f"{head}>{alignment}</xf>" if alignment else f"{head}/>")
+        return self.xfs[style]
+
+    def to_xml(self):
+        xml = self.xml
+        for name, items in self.added.items():
+            if not items:
+                continue
+            if name == "numFmts" and "<numFmts" not in xml:
+                # numFmts is the first child of styleSheet
+                xml = re.sub(r"(<styleSheet\b[^>]*>)", lambda m: f'{m.group(1)}<numFmts count="0"></numFmts>', xml, count=1)
+            xml = re.sub(r"<%s\b([^>]*?)/>" % name, r"<%s\1></%s>" % (name, name), xml, count=1)
+            start = re.search(r"<%s\b[^>]*>" % name, xml)
+            end = xml.index(f"</{name}>", start.end())
+            total = len(re.findall(r"<%s\b" % STYLE_ITEMS[name], xml[start.end():end])) + len(items)
+            xml = xml[:start.start()] + _set_attr(start.group(0), "count", total) + xml[start.end():end] + "".join(items) + xml[end:]
+        return xml
+
+
+def _argb(hex_rgb):
+    return hex_rgb.upper() if len(hex_rgb) == 8 else "FF" + hex_rgb.upper()
+
+
+# --- Worksheets ---
+def _cell_xml(ref, value, xf):
+    style = f' s="{xf}"' if xf is not None else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{style}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Integral):
+        return f'<c r="{ref}"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real) and value == value and abs(value) != float("inf"):
+        return f'<c r="{ref}"{style}><v>{float(value)!r}</v></c>'
+    # Control characters are not allowed in XML; Excel's escape for them
+    text = _ILLEGAL.sub(lambda m: "_x%04X_" % ord(m.group(0)), escape(str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _sheet_rows(sheet, styles, existing=None):
+    # {row: {column: cell xml}}, sheet cells over the existing ones
+    rows = existing if existing is not None else {}
+    for row, column, value, style in sheet.cells():
+        ref = _column_letter(column) + str(row)
+        old = rows.get(row, {}).get(column)
+        xf = styles.xf(style) if style is not None else None
+        if value is None and old is not None:
+            # Style only: the cell keeps its value
+            tag = re.match(r"<c\b[^>]*?/?>", old).group(0)
+            cell = _set_attr(tag, "s", xf) + old[len(tag):] if xf is not None else old
+        else:
+            if xf is None and old is not None:
+                xf = _attrs(re.match(r"<c\b[^>]*?/?>", old).group(0)).get("s")
+            cell = _cell_xml(ref, value, xf)
+        rows.setdefault(row, {})[column] = cell
+    return rows
+
+
+def _sheet_data(rows, row_tags=None):
+    row_tags = row_tags or {}
+    parts = []
+    for row in sorted(rows):
+        # spans is only a load hint; it would be stale once cells are added
+        tag = _set_attr(row_tags.get(row, f'<row r="{row}">'), "spans", None)
+        cells = rows[row]
+        parts.append(tag + "".join(cells[column] for column in sorted(cells)) + "</row>")
+    return "<sheetData>" + "".join(parts) + "</sheetData>" if parts else "<sheetData/>"
+
+
+def _dimension(rows):
+    cells = [(row, column) for row, columns in rows.items() for column in columns]
+    if not cells:
+        return "A1"
+    first = _column_letter(min(c for _, c in cells)) + str(min(r for r, _ in cells))
+    last = _column_letter(max(c for _, c in cells)) + str(max(r for r, _ in cells))
+    return first if first == last else f"{first}:{last}"
+
+
+def _new_worksheet(sheet, styles, old_xml=None):
+    # Fresh part; a replaced sheet keeps its sheetPr (tab color) and widths
+    kept = {}
+    if old_xml is not None:
+        for name in ("sheetPr", "cols"):
+            match = re.search(r"<%s\b[^>]*?(?:/>|>.*?</%s>)" % (name, name), old_xml, re.S)
+            kept[name] = match.group(0) if match else ""
+    rows = _sheet_rows(sheet, styles)
+    view = "" if sheet.show_gridlines else ' showGridLines="0"'
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+        f'{kept.get("sheetPr", "")}<dimension ref="{_dimension(rows)}"/>'
+        f'<sheetViews><sheetView workbookViewId="0"{view}/></sheetViews>'
+        f'<sheetFormatPr defaultRowHeight="15"/>{kept.get("cols", "")}'
+        f'{_sheet_data(rows)}'
+        '<pageMargins left="0.7" right="0.7" top="0.75" bottom="0.75" header="0.3" footer="0.3"/>'
+        "</worksheet>"
+    )
+
+
+def _merge_worksheet(xml, sheet, styles, part):
+    # Cells of sheet set in the existing part; everything else stays as is
+    _check_default_namespace(xml, "worksheet", part)
+    match = re.search(r"<sheetData\b[^>]*?(?:/>|>.*?</sheetData>)", xml, re.S)
+    if match is None:
+        raise ValueError(f"{part}: unsupported workbook part (no <sheetData>)")
+    rows, row_tags = {}, {}
+    for row_xml in _ROW.findall(match.group(0)):
+        tag = re.match(r"<row\b[^>]*?/?>", row_xml).group(0)
+        if "r" not in _attrs(tag):
+            raise ValueError(f"{part}: unsupported workbook part (rows without numbers)")
+        row = int(_attrs(tag)["r"])
+        row_tags[row] = tag[:-2] + ">" if tag.endswith("/>") else tag
+        cells = rows.setdefault(row, {})
+        for cell in _CELL.findall(row_xml):
+            ref = _attrs(re.match(r"<c\b[^>]*?/?>", cell).group(0))["r"]
+            cells[_column_number(_CELL_REF.match(ref).group(1))] = cell
+    rows = _sheet_rows(sheet, styles, rows)
+    xml = xml[:match.start()] + _sheet_data(rows, row_tags) + xml[match.end():]
+    xml = re.sub(r"<dimension\b[^>]*?/>", f'<dimension ref="{_dimension(rows)}"/>', xml, count=1)
+
+    if not sheet.show_gridlines:
+        view = re.search(r"<sheetView\b[^>]*?/?>", xml)
+        if view is not None:
+            xml = xml[:view.start()] + _set_attr(view.group(0), "showGridLines", 0) + xml[view.end():]
+        else:
+            # sheetViews follows sheetPr / dimension
+            anchor = re.search(r"<(?:sheetFormatPr|cols|sheetData)\b", xml)
+            xml = xml[:anchor.start()] + '<sheetViews><sheetView showGridLines="0" workbookViewId="0"/></sheetViews>' + xml[anchor.start():]
+    return xml
+
+
+# --- Package ---
+def _part_name(target):
+    # Relationship target of xl/workbook.xml -> zip member name
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def _workbook_sheets(workbook_xml, rels_xml):
+    # [(name, part), ...] in workbook order
+    targets = {}
+    for rel in _RELATIONSHIP.findall(rels_xml):
+        attrs = _attrs(rel)
+        if attrs.get("Type") == WORKSHEET_REL and attrs.get("TargetMode") != "External":
+            targets[attrs["Id"]] = _part_name(attrs["Target"])
+    sheets = []
+    for tag in _SHEET.findall(workbook_xml):
+        attrs = _attrs(tag)
+        rel_id = next((value for name, value in attrs.items() if name.endswith(":id")), None)
+        sheets.append((attrs["name"], targets.get(rel_id)))
+    return sheets
+
+
+def _insert_sheet(workbook_xml, index, name, sheet_id, rel_id):
+    tags = list(_SHEET.finditer(workbook_xml))
+    tag = f'<sheet name={quoteattr(name)} sheetId="{sheet_id}" xmlns:r="{REL_NS}" r:id="{rel_id}"/>'
+    at = tags[index].start() if index < len(tags) else tags[-1].end()
+    workbook_xml = workbook_xml[:at] + tag + workbook_xml[at:]
+
+    # Sheet indexes after the new one move up by one
+    def shift(match):
+        value = int(match.group(2))
+        return f'{match.group(1)}="{value + 1 if value >= index else value}"'
+    head, rest = workbook_xml[:at], workbook_xml[at + len(tag):]
+    return (re.sub(r'\b(activeTab|firstSheet)="(\d+)"', shift, head) + tag
+            + re.sub(r'\b(localSheetId)="(\d+)"', shift, rest))
+
+
+def put_sheets(out_file, sheets, data_name=None, check=None):
+    """Add, replace or merge output.Sheet objects in an existing out_file.
+
+    Only workbook.xml, its rels, [Content_Types].xml, styles.xml and the
+    touched worksheet parts are rewritten; the file is swapped in at the end.
+    """
+    from deliverables import output
+
+    check = check or (lambda: None)
+    with zipfile.ZipFile(out_file) as z:
+        members = {info.filename: info for info in z.infolist()}
+
+        def read(name):
+            if name not in members:
+                raise ValueError(f"{os.path.basename(out_file)}: not an Excel workbook ({name} missing)")
+            return z.read(name).decode("utf-8")
+
+        workbook_xml = read("xl/workbook.xml")
+        rels_xml = read("xl/_rels/workbook.xml.rels")
+        types_xml = read("[Content_Types].xml")
+        _check_default_namespace(workbook_xml, "workbook", "xl/workbook.xml")
+        styles = _Styles(read("xl/styles.xml"))
+        parts = dict(_workbook_sheets(workbook_xml, rels_xml))
+        names = list(parts)
+        position = output._data_position(names, data_name)
+        changed, dropped = {}, set()
+
+        sheet_ids = [int(n) for n in re.findall(r'<sheet\b[^>]*?\bsheetId="(\d+)"', workbook_xml)]
+        rel_ids = [int(n) for n in re.findall(r'\bId="rId(\d+)"', rels_xml)]
+        part_ids = [int(match.group(1)) for match in map(_PART.fullmatch, members) if match]
+        for sheet in sheets:
+            check()
+            part = parts.get(sheet.title)
+            if sheet.title in parts and part is None:
+                raise ValueError(f"{sheet.title}: not a worksheet, cannot be replaced")
+            if part is not None:
+                old_xml = changed.get(part) or read(part)
+                if sheet.merge:
+                    changed[part] = _merge_worksheet(old_xml, sheet, styles, part)
+                else:
+                    changed[part] = _new_worksheet(sheet, styles, old_xml)
+                    # The old content's drawings / comments / pivots go with it
+                    dropped.add(posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels"))
+                continue
+            index, position = output._place(names, sheet, position)
+            sheet_ids.append(max(sheet_ids + [0]) + 1)
+            rel_ids.append(max(rel_ids + [0]) + 1)
+            part_ids.append(max(part_ids + [0]) + 1)
+            part = parts[sheet.title] = f"xl/worksheets/sheet{part_ids[-1]}.xml"
+            workbook_xml = _insert_sheet(workbook_xml, index, sheet.title, sheet_ids[-1], f"rId{rel_ids[-1]}")
+            rels_xml = rels_xml.replace("</Relationships>", (
+                f'<Relationship Id="rId{rel_ids[-1]}" Type="{WORKSHEET_REL}" Target="/{part}"/>'
+                "</Relationships>"))
+            types_xml = types_xml.replace("</Types>", f'<Override PartName="/{part}" ContentType="{WORKSHEET_TYPE}"/></Types>')
+            changed[part] = _new_worksheet(sheet, styles)
+
+        changed.update({"xl/workbook.xml": workbook_xml, "xl/_rels/workbook.xml.rels": rels_xml,
+                        "[Content_Types].xml": types_xml, "xl/styles.xml": styles.to_xml()})
+        check()
+        tmp_file = out_file + ".tmp"
+        try:
+            with open(out_file, "rb") as source, open(tmp_file, "wb") as target:
+                _write_package(source, target, members, changed, dropped, check)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+    os.replace(tmp_file, out_file)
+
+
+def _write_package(source, target, members, changed, dropped, check):
+    # Zip writer that copies untouched members as their stored (compressed)
+    # bytes; zipfile can only decompress and compress them again
+    central = []
+    for name, info in list(members.items()) + [(name, None) for name in changed if name not in members]:
+        if name in dropped:
+            continue
+        offset = target.tell()
+        encoded = name.encode("utf-8")
+        if name in changed:
+            data = changed[name].encode("utf-8")
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            body = compressor.compress(data) + compressor.flush()
+            crc, size, method = zlib.crc32(data), len(data), zipfile.ZIP_DEFLATED
+            date_time = info.date_time if info else time.localtime()[:6]
+            external = info.external_attr if info else 0
+            target.write(_local_header(encoded, method, date_time, crc, len(body), size))
+            target.write(body)
+            compressed = len(body)
+        else:
+            if max(info.compress_size, info.file_size, offset) >= 0xFFFFFFFF:
+                raise ValueError(f"{name}: workbooks over 4 GB are not supported")
+            crc, size, method, compressed = info.CRC, info.file_size, info.compress_type, info.compress_size
+            date_time, external = info.date_time, info.external_attr
+            source.seek(info.header_offset)
+            header = source.read(30)
+            if header[:4] != b"PK\x03\x04":
+                raise ValueError(f"{name}: damaged workbook (bad local header)")
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            source.seek(info.header_offset + 30 + name_length + extra_length)
+            target.write(_local_header(encoded, method, date_time, crc, compressed, size))
+            remaining = compressed
+            while remaining:
+                block = source.read(min(remaining, COPY_BLOCK))
+                if not block:
+                    raise ValueError(f"{name}: damaged workbook (truncated)")
+                target.write(block)
+                remaining -= len(block)
+                check()
+        central.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, 0x800, method, *_dos_time(date_time),
+            crc, compressed, size, len(encoded), 0, 0, 0, 0, external, offset) + encoded)
+    start = target.tell()
+    for record in central:
+        target.write(record)
+    if len(central) > 0xFFFF:
+        raise ValueError("workbooks with over 65535 parts are not supported")
+    target.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(central), len(central),
+                             target.tell() - start, start, 0))
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _local_header(encoded, method, date_time, crc, compressed, size):
+    # Sizes in the header (no data descriptor), UTF-8 name flag
+    return struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, 0x800, method, *_dos_time(date_time),
+                       crc, compressed, size, len(encoded), 0) + encoded
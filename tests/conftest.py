@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks import synth
+from deliverables import wafer_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # Every test gets its own wafer cache, never the user's
+    path = tmp_path / "cache"
+    monkeypatch.setenv("DELIVERABLES_CACHE_DIR", str(path))
+    monkeypatch.setattr(wafer_cache, "_default", None)
+    return path
+
+
+@pytest.fixture
+def wafer_csv(tmp_path):
+    return synth.generate(str(tmp_path / "W01.wmap.csv"), dies=300, ets=6, marks="ab", fail_rate=0.3)
+
+
+@pytest.fixture
+def lot_csv(tmp_path):
+    return synth.generate(str(tmp_path / "LOT.wmap.csv"), dies=120, ets=4, marks="ab", slots=2,
+                          fail_rate=0.3, seed=1)
+
+
+@pytest.fixture
+def no_limits_csv(tmp_path):
+    return synth.generate(str(tmp_path / "NOLIM.wmap.csv"), dies=120, ets=4, marks="ab",
+                          fail_rate=0.3, seed=2, limits=False)
@@ -0,0 +1,157 @@
+import json
+import os
+
+# Stand-in for the xlwings module (no Excel)
+# App / Books / Book / Sheet / Range record what the output backend and the
+# ExcelSession do. Cell values are kept per sheet as {(row, col): value} and
+# Book.save writes them as JSON, so a later books.open(path) sees the same
+# workbook. .api (COM) calls are accepted and ignored.
+
+
+class _Api:
+    def __getattr__(self, name):
+        return _Api()
+
+    def __call__(self, *args, **kwargs):
+        return _Api()
+
+
+class Range:
+    def __init__(self, sheet, first, last=None):
+        self.sheet = sheet
+        self.first = first
+        self.color = None
+        self.number_format = None
+        self.api = _Api()
+
+    @property
+    def value(self):
+        return self.sheet.cells.get(self.first)
+
+    @value.setter
+    def value(self, value):
+        row, col = self.first          # style ranges use "A1:B2" addresses, values use (row, col)
+        rows = value if isinstance(value, list) else [[value]]
+        for r, line in enumerate(rows, start=row):
+            for c, v in enumerate(line, start=col):
+                if v is None:
+                    self.sheet.cells.pop((r, c), None)
+                else:
+                    self.sheet.cells[(r, c)] = v
+
+
+class Sheet:
+    def __init__(self, book, name, cells=None):
+        self.book = book
+        self.name = name
+        self.cells = cells or {}
+        self.api = _Api()
+
+    def range(self, first, last=None):
+        return Range(self, first, last)
+
+    def clear(self):
+        self.cells.clear()
+
+    def activate(self):
+        pass
+
+    def delete(self):
+        self.book.sheets.items.remove(self)
+
+
+class Sheets:
+    def __init__(self, book):
+        self.book = book
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.items[key]
+        return next(ws for ws in self.items if ws.name == key)
+
+    def add(self, name=None, before=None, after=None):
+        sheet = Sheet(self.book, name or f"Sheet{len(self.items) + 1}")
+        if before is not None:
+            self.items.insert(self.items.index(before), sheet)
+        elif after is not None:
+            self.items.insert(self.items.index(after) + 1, sheet)
+        else:
+            self.items.insert(0, sheet)
+        return sheet
+
+
+class Book:
+    def __init__(self, app, path=None):
+        self.app = app
+        self.path = path
+        self.closed = False
+        self.saves = 0
+        self.sheets = Sheets(self)
+        if path is None:
+            self.sheets.items.append(Sheet(self, "Sheet1"))
+        else:
+            with open(path, encoding="utf-8") as f:
+                for name, cells in json.load(f):
+                    self.sheets.items.append(Sheet(self, name, {tuple(k): v for k, v in cells}))
+
+    @property
+    def name(self):
+        if self.closed:
+            raise RuntimeError("workbook closed")
+        return os.path.basename(self.path or "Book1")
+
+    def save(self, path=None):
+        self.path = path or self.path
+        self.saves += 1
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump([[ws.name, sorted([list(k), v] for k, v in ws.cells.items())] for ws in self.sheets], f)
+
+    def close(self):
+        self.closed = True
+        self.app.books.items.remove(self)
+
+
+class Books:
+    def __init__(self, app):
+        self.app = app
+        self.items = []
+        self.opened = []     # paths passed to open(), in order
+
+    @property
+    def count(self):
+        if not self.app.running:
+            raise RuntimeError("Excel is not running")
+        return len(self.items)
+
+    def add(self):
+        book = Book(self.app)
+        self.items.append(book)
+        return book
+
+    def open(self, path):
+        self.opened.append(path)
+        book = Book(self.app, path)
+        self.items.append(book)
+        return book
+
+
+class App:
+    launched = []            # every App() created, oldest first
+
+    def __init__(self, visible=True):
+        self.visible = visible
+        self.running = True
+        self.quits = 0
+        self.books = Books(self)
+        App.launched.append(self)
+
+    def quit(self):
+        self.quits += 1
+        self.running = False
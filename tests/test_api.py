@@ -0,0 +1,175 @@
+import csv
+from collections import Counter
+
+import openpyxl
+import pytest
+
+from benchmarks import synth
+from deliverables import api
+
+
+def die_rows(path, slot=1):
+    # (C1_MARK, ET) of every die of one SLOT section, read with the csv module
+    rows, section, in_dies = [], 0, False
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.reader(f):
+            if row[:1] == ["SLOT"]:
+                section += 1
+                in_dies = False
+            elif row[:1] == ["X"]:
+                in_dies = True
+            elif not row:
+                in_dies = False      # blank line between wafer sections
+            elif in_dies and section == slot:
+                rows.append((row[6], int(row[10])))
+    return rows
+
+
+def test_load_summary(wafer_csv):
+    wafer = api.load(wafer_csv)
+    assert wafer.lot_no == "BENCH01"
+    assert wafer.slot == 1 and wafer.slot_str == "01"
+    assert wafer.die_count == wafer.theoretical_num == 300
+    assert set(wafer.c1_marks) == {mark for mark, _ in die_rows(wafer_csv)}
+    assert wafer.sheet_name == "W01.wmap"
+
+
+def test_load_from_cache(wafer_csv):
+    first = api.load(wafer_csv).fallout("a")
+    again = api.load(wafer_csv)
+    assert again.fallout("a") == first
+
+
+def test_fallout_counts_and_order(wafer_csv):
+    wafer = api.load(wafer_csv)
+    expected = Counter(et for mark, et in die_rows(wafer_csv) if mark == "a")
+    report = wafer.fallout("a")
+    assert report.counts == dict(expected)
+
+    header, *body, total = report.table
+    assert header == ["End Test No.", "Count", "Fallout%"]
+    assert [n for _, n, _ in body] == sorted(expected.values(), reverse=True)
+    assert {et: n for et, n, _ in body} == {str(et): n for et, n in expected.items()}
+    assert all(pct == f"{n / 300 * 100:.2f}%" for _, n, pct in body)
+    assert total == ["Grand Total", "300", ""]
+    assert report.top_et == body[0][0]
+
+
+def test_fallout_unknown_mark(wafer_csv):
+    wafer = api.load(wafer_csv)
+    with pytest.raises(ValueError):
+        wafer.fallout("zz")
+    logged = []
+    reports = wafer.fallout_all(["a", "zz"], log=lambda message, color=None: logged.append(message))
+    assert list(reports) == ["a"]
+    assert len(logged) == 1 and "'zz'" in logged[0]
+
+
+def test_fallout_all_marks(wafer_csv):
+    wafer = api.load(wafer_csv)
+    reports = wafer.fallout_all()
+    assert list(reports) == wafer.c1_marks
+    assert sum(sum(r.counts.values()) for r in reports.values()) == 300
+
+
+def test_end_test_lookup(wafer_csv):
+    wafer = api.load(wafer_csv)
+    report = wafer.fallout("a")
+    assert report.end_test == wafer.end_test(report.top_et)
+    row = wafer.end_test(1001)
+    assert row == api.EndTest("T1", "1001", "Dummy_Test_1001", "V", "1.23 V", "1.17 V")
+    assert wafer.end_test("9999") is None
+
+
+def test_no_end_test_table(no_limits_csv):
+    wafer = api.load(no_limits_csv)
+    report = wafer.fallout("a")
+    assert report.top_et is not None
+    assert report.end_test is None
+    with pytest.raises(ValueError):
+        wafer.end_test(report.top_et)
+
+
+def test_wafermap_grid(wafer_csv):
+    wafer = api.load(wafer_csv)
+    grid = wafer.wafermap()
+    positions = synth.die_positions(300)
+    xs = sorted({x for x, _ in positions})
+    ys = sorted({y for _, y in positions})
+    assert grid.slot == 1
+    assert grid.sheet_name == "W#01_wafermap_by_End_Test_No"
+    assert len(grid.block) == len(ys) + 1
+    assert all(len(row) == len(xs) + 1 for row in grid.block)
+    assert grid.block[0][1:] == xs
+    assert [row[0] for row in grid.block[1:]] == ys
+
+    # Every die cell is colored, and dies of one ET share a color
+    dies = {(r, c) for r, row in enumerate(grid.block) for c, value in enumerate(row)
+            if r and c and value is not None}
+    assert len(dies) == 300
+    assert set(grid.colors) == dies
+    by_et = {}
+    for (r, c), rgb in grid.colors.items():
+        by_et.setdefault(grid.block[r][c], set()).add(rgb)
+    assert all(len(colors) == 1 for colors in by_et.values())
+    assert grid.warnings == []
+
+
+def test_wafermap_image(wafer_csv):
+    wafer = api.load(wafer_csv)
+    assert wafer.wafermap_image("png").startswith(b"\x89PNG\r\n\x1a\n")
+    assert wafer.wafermap_image("svg").startswith("<svg")
+    with pytest.raises(ValueError):
+        wafer.wafermap_image("gif")
+
+
+def test_multi_slot(lot_csv):
+    wafer = api.load(lot_csv)
+    assert wafer.slot == 1
+    assert wafer.die_count == 120
+    expected = Counter(et for mark, et in die_rows(lot_csv, slot=1) if mark == "a")
+    assert wafer.fallout("a").counts == dict(expected)
+
+    wafers = wafer.wafers()
+    assert sorted(wafers) == [("BENCH01", 1), ("BENCH01", 2)]
+    assert all(w.die_count == 120 for w in wafers.values())
+
+
+def test_write_workbook(wafer_csv, tmp_path):
+    wafer = api.load(wafer_csv)
+    report = wafer.fallout("a")
+    out_file = wafer.write_workbook(str(tmp_path / "out.xlsx"), marks=["a"], backend="openpyxl")
+
+    wb = openpyxl.load_workbook(out_file)
+    try:
+        assert wb.sheetnames == ["W01.wmap", "W#01_wafermap_by_End_Test_No", "Pivot"]
+
+        data = list(wb["W01.wmap"].iter_rows(values_only=True))
+        assert data[0][0].lstrip("\ufeff") == "#VERSION"   # A1 keeps the file's BOM, like Convert
+        assert sum(1 for row in data if row[:1] == ("X",)) == 1
+
+        pivot = wb["Pivot"]
+        assert pivot["A1"].value == "C1_MARK" and pivot["B1"].value == "a"
+        assert [pivot.cell(3, c).value for c in range(4, 7)] == ["End Test No.", "Count", "Fallout%"]
+        header, *body, _ = report.table
+        for r, (et, count, _) in enumerate(body, start=4):
+            assert str(pivot.cell(r, 4).value) == et
+            assert pivot.cell(r, 5).value == count
+        assert [pivot.cell(4, c).value for c in range(8, 14)] == list(report.end_test)
+
+        grid = wafer.wafermap()
+        sheet = wb["W#01_wafermap_by_End_Test_No"]
+        assert sheet.max_row >= len(grid.block)
+    finally:
+        wb.close()
+
+
+def test_write_workbook_all_marks_one_sheet(wafer_csv, tmp_path):
+    wafer = api.load(wafer_csv)
+    out_file = wafer.write_workbook(str(tmp_path / "all.xlsx"), wafermap_sheet=False, one_sheet=True,
+                                    backend="openpyxl")
+    wb = openpyxl.load_workbook(out_file, read_only=True)
+    try:
+        assert wb.sheetnames == ["W01.wmap", "Fallout All Marks"]
+    finally:
+        wb.close()
@@ -0,0 +1,32 @@
+import os
+
+from deliverables import batch, wmap_csv
+
+
+def test_process_file(lot_csv, monkeypatch):
+    reads = []
+    iter_rows = wmap_csv.iter_rows
+    monkeypatch.setattr(wmap_csv, "iter_rows", lambda *args, **kwargs: reads.append(args) or iter_rows(*args, **kwargs))
+
+    result = batch.process_file(lot_csv, marks=("a", "zz"), images=("png", "svg"))
+    assert result["ok"], result["error"]
+    assert len(reads) == 1             # parsed once: workbook and every image from memory
+    assert list(result["fallout"]) == ["a"]
+    assert any("'zz'" in line for line in result["log"])
+    assert result["end_test"]["a"]["testno"] == result["fallout"]["a"][1][0]
+    assert result["wafermap"] == "W#01_wafermap_by_End_Test_No"
+    assert os.path.isfile(result["out_file"])
+    assert [os.path.basename(p) for p in result["images"]] == [
+        "BENCH01_W01_wafermap.png", "BENCH01_W01_wafermap.svg",
+        "BENCH01_W02_wafermap.png", "BENCH01_W02_wafermap.svg",
+    ]
+    assert os.path.isfile(result["out_file"][:-len(".xlsx")] + ".trace.json")
+
+
+def test_process_file_error(tmp_path):
+    bad = tmp_path / "bad.wmap.csv"
+    bad.write_text("#VERSION\nnothing here\n", encoding="utf-8")
+    result = batch.process_file(str(bad))
+    assert not result["ok"]
+    assert result["error"] == "load: 'C1_MARK' not found in Column G."
+    assert result["seconds"] >= 0
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+from deliverables import excel_session, pipeline
+from tests import fake_xlwings
+
+
+@pytest.fixture
+def xlwings(monkeypatch):
+    monkeypatch.setitem(sys.modules, "xlwings", fake_xlwings)
+    monkeypatch.setattr(fake_xlwings.App, "launched", [])
+    return fake_xlwings
+
+
+def test_one_excel_for_every_action(wafer_csv, xlwings):
+    session = excel_session.ExcelSession()
+    out_file = os.path.abspath(pipeline.output_paths(wafer_csv)[0])
+
+    section_index = pipeline.convert(wafer_csv, session, backend="xlwings")
+    table = pipeline.pivot(wafer_csv, "a", section_index, session, backend="xlwings")
+    top_et = pipeline.top_end_test(wafer_csv, section_index, "a")
+    row = pipeline.check_end_test(wafer_csv, section_index, top_et, session=session, backend="xlwings")
+    sheet_name = pipeline.write_wafermap(wafer_csv, section_index, session, backend="xlwings")
+
+    # One Excel, the output workbook opened once and kept for every action
+    app, = xlwings.App.launched
+    assert not app.visible
+    assert app.books.opened == [out_file]
+    assert (session.app_launches, session.book_opens) == (1, 1)
+    book = session.book
+    assert book.saves == 3
+
+    names = [ws.name for ws in book.sheets]
+    assert names == ["W01.wmap", sheet_name, "Pivot"]
+    pivot = book.sheets["Pivot"].cells
+    assert pivot[(1, 1)] == "C1_MARK" and pivot[(1, 2)] == "a"
+    assert str(pivot[(4, 4)]) == top_et == table[1][0]
+    assert [pivot[(4, c)] for c in range(8, 14)] == row
+    assert book.sheets[sheet_name].cells[(1, 1)] == "No."
+
+    session.close()
+    assert app.quits == 1
+    assert session.app is None and session.book is None
+    session.close()
+    assert app.quits == 1
+
+
+def test_dead_excel_is_restarted(wafer_csv, xlwings):
+    session = excel_session.ExcelSession()
+    section_index = pipeline.convert(wafer_csv, session, backend="xlwings")
+    pipeline.pivot(wafer_csv, "a", section_index, session, backend="xlwings")
+    first = session.app
+    first.running = False             # Excel closed behind our back
+
+    pipeline.write_wafermap(wafer_csv, section_index, session, backend="xlwings")
+    assert len(xlwings.App.launched) == 2
+    assert (session.app_launches, session.book_opens) == (2, 2)
+    session.close()
+    assert [app.quits for app in xlwings.App.launched] == [1, 1]
@@ -0,0 +1,122 @@
+import zipfile
+
+import openpyxl
+import pytest
+
+from deliverables import output
+
+
+def data_rows():
+    return [["#VERSION"], ["X", "Y", "C1_MARK"]] + [[x, 1, "a"] for x in range(50)]
+
+
+def part(out_file, name):
+    with zipfile.ZipFile(out_file) as z:
+        return z.read(name)
+
+
+def edit_by_hand(out_file, data_name):
+    # What a user may do to the workbook between two actions
+    wb = openpyxl.load_workbook(out_file)
+    data = wb[data_name]
+    data.column_dimensions["A"].width = 30
+    data.merge_cells("M1:N2")
+    data["Z1"] = "checked"
+    notes = wb.create_sheet("Notes")
+    notes["A1"] = "lot notes"
+    notes.column_dimensions["A"].width = 50
+    wb.save(out_file)
+    wb.close()
+
+
+@pytest.mark.parametrize("backend", ["openpyxl", "xlsxwriter"])
+def test_put_sheets_keeps_workbook(tmp_path, backend):
+    if not output.available(backend):
+        pytest.skip(f"{backend} not installed")
+    out_file = str(tmp_path / "out.xlsx")
+    writer = output.get(backend)
+    writer.write_workbook(out_file, data=("W01.wmap", data_rows()))
+    edit_by_hand(out_file, "W01.wmap")
+    data_part = part(out_file, "xl/worksheets/sheet1.xml")
+
+    pivot = output.Sheet("Pivot")
+    pivot.cell(1, 1, "C1_MARK", output.Style(bold=True))
+    pivot.cell(2, 1, 0.25, output.Style(number_format="0.00%"))
+    grid = output.Sheet("W#01_wafermap_by_End_Test_No", after_data=True)
+    grid.cell(1, 1, "No.", output.Style(fill="E4F1FD", border=True, center=True))
+    grid.show_gridlines = False
+    writer.put_sheets(out_file, [pivot, grid], data_name="W01.wmap")
+
+    wb = openpyxl.load_workbook(out_file)
+    wb["Pivot"].column_dimensions["B"].width = 20
+    wb.save(out_file)
+    wb.close()
+    block = output.Sheet("Pivot", merge=True)
+    block.cell(1, 1, style=output.Style(bold=True, font_color="FF0000"))
+    block.cell(3, 8, "TSNO", output.Style(fill="C0E6F5"))
+    writer.put_sheets(out_file, [block], data_name="W01.wmap")
+
+    # The data sheet is copied, not written again
+    assert part(out_file, "xl/worksheets/sheet1.xml") == data_part
+    wb = openpyxl.load_workbook(out_file)
+    try:
+        assert wb.sheetnames == ["W01.wmap", "W#01_wafermap_by_End_Test_No", "Notes", "Pivot"]
+        data = wb["W01.wmap"]
+        assert [list(row)[:3] for row in data.iter_rows(values_only=True)][2:4] == [[0, 1, "a"], [1, 1, "a"]]
+        assert data.column_dimensions["A"].width == 30
+        assert "M1:N2" in [str(r) for r in data.merged_cells.ranges]
+        assert data["Z1"].value == "checked"
+        assert wb["Notes"]["A1"].value == "lot notes"
+        assert wb["Notes"].column_dimensions["A"].width == 50
+
+        sheet = wb["Pivot"]
+        assert sheet.column_dimensions["B"].width == 20
+        assert sheet["A1"].value == "C1_MARK"      # merged style, value kept
+        assert sheet["A1"].font.b and sheet["A1"].font.color.rgb == "FFFF0000"
+        assert sheet["A2"].value == 0.25 and sheet["A2"].number_format == "0.00%"
+        assert sheet["H3"].value == "TSNO" and sheet["H3"].fill.fgColor.rgb.endswith("C0E6F5")
+        grid_sheet = wb["W#01_wafermap_by_End_Test_No"]
+        assert grid_sheet["A1"].fill.fgColor.rgb.endswith("E4F1FD")
+        assert grid_sheet["A1"].border.left.style == "thin"
+        assert grid_sheet["A1"].alignment.horizontal == "center"
+        assert grid_sheet.sheet_view.showGridLines is False
+    finally:
+        wb.close()
+
+
+@pytest.mark.parametrize("backend", ["openpyxl", "xlsxwriter"])
+def test_put_sheets_replaces_in_place(tmp_path, backend):
+    if not output.available(backend):
+        pytest.skip(f"{backend} not installed")
+    out_file = str(tmp_path / "out.xlsx")
+    writer = output.get(backend)
+    first = output.Sheet("Map", after_data=True)
+    first.cell(5, 5, "old")
+    writer.write_workbook(out_file, [first], data=("W01.wmap", data_rows()))
+    wb = openpyxl.load_workbook(out_file)
+    wb["Map"].column_dimensions["C"].width = 7
+    wb.save(out_file)
+    wb.close()
+
+    second = output.Sheet("Map", after_data=True)
+    second.cell(1, 1, "new")
+    writer.put_sheets(out_file, [second], data_name="W01.wmap")
+    wb = openpyxl.load_workbook(out_file)
+    try:
+        assert wb.sheetnames == ["W01.wmap", "Map"]
+        assert wb["Map"]["A1"].value == "new" and wb["Map"]["E5"].value is None
+        assert wb["Map"].column_dimensions["C"].width == 7
+    finally:
+        wb.close()
+    with zipfile.ZipFile(out_file) as z:
+        assert z.testzip() is None
+
+
+def test_write_only_hides_gridlines(tmp_path):
+    sheet = output.Sheet("Map")
+    sheet.cell(1, 1, "x")
+    sheet.show_gridlines = False
+    out_file = str(tmp_path / "map.xlsx")
+    output.get("openpyxl").write_workbook(out_file, [sheet])
+    with zipfile.ZipFile(out_file) as z:
+        assert b'showGridLines="0"' in z.read("xl/worksheets/sheet1.xml")
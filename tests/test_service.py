@@ -0,0 +1,216 @@
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from deliverables import service
+
+
+@pytest.fixture
+def csv_root(tmp_path, wafer_csv):
+    # wafer_csv lives in tmp_path; the service may read only from there
+    return str(tmp_path)
+
+
+@pytest.fixture
+def server(tmp_path, csv_root):
+    svc = service.Service(workers=1, max_queue=0, work_dir=str(tmp_path / "work"), keep=10, roots=[csv_root])
+    srv = service.serve(svc, port=0, quiet=True)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    svc.close()
+
+
+def request(server, method, path, body=None, content_type="text/csv"):
+    req = urllib.request.Request(server.url + path, data=body, method=method)
+    if body is not None:
+        req.add_header("Content-Type", content_type)
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def post_upload(server, csv_path, query="mark=a&image=png"):
+    with open(csv_path, "rb") as f:
+        code, _, body = request(server, "POST", f"/process?name=W01.wmap.csv&{query}", f.read())
+    return code, json.loads(body)
+
+
+def post_path(server, csv_path):
+    body = json.dumps({"path": csv_path, "marks": ["a"], "images": ["svg"]}).encode("utf-8")
+    code, _, body = request(server, "POST", "/process", body, "application/json")
+    return code, json.loads(body)
+
+
+def status(server):
+    return json.loads(request(server, "GET", "/status")[2])
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+
+def test_upload_job(server, wafer_csv):
+    code, result = post_upload(server, wafer_csv)
+    assert code == 200, result
+    assert result["ok"] and result["error"] is None
+    assert list(result["fallout"]) == ["a"]
+    assert result["fallout"]["a"][0] == ["End Test No.", "Count", "Fallout%"]
+    assert result["end_test"]["a"]["testno"] == result["fallout"]["a"][1][0]
+    assert result["wafermap"] == "W#01_wafermap_by_End_Test_No"
+    assert result["summary"]["dies"] == 300
+
+    code, headers, workbook = request(server, "GET", result["workbook"])
+    assert code == 200
+    assert workbook.startswith(b"PK")
+    assert headers["Content-Type"].startswith("application/vnd.openxmlformats")
+    code, headers, png = request(server, "GET", result["images"]["png"])
+    assert code == 200 and headers["Content-Type"] == "image/png"
+    assert png.startswith(b"\x89PNG")
+
+
+def test_path_job(server, wafer_csv):
+    code, result = post_path(server, wafer_csv)
+    assert code == 200, result
+    assert result["workbook"].endswith("/W01.wmap.xlsx")
+    code, _, svg = request(server, "GET", result["images"]["svg"])
+    assert code == 200 and svg.startswith(b"<svg")
+
+
+def test_path_outside_root(server, tmp_path_factory, wafer_csv, csv_root):
+    outside = tmp_path_factory.mktemp("outside")
+    target = outside / "W02.wmap.csv"
+    target.write_bytes(open(wafer_csv, "rb").read())
+    assert post_path(server, str(target))[0] == 403
+
+    # A link under the root that points outside it is refused as well
+    link = os.path.join(csv_root, "link.wmap.csv")
+    os.symlink(target, link)
+    assert post_path(server, link)[0] == 403
+    assert post_path(server, os.path.join(csv_root, "missing.wmap.csv"))[0] == 400
+
+
+def test_path_needs_root(tmp_path, wafer_csv):
+    svc = service.Service(workers=1, work_dir=str(tmp_path / "work"))
+    with pytest.raises(PermissionError):
+        svc.check_path(wafer_csv)
+
+
+def test_bad_requests(server):
+    assert request(server, "POST", "/process", b"", "text/csv")[0] == 400
+    assert request(server, "POST", "/process?image=gif", b"x")[0] == 400
+    assert request(server, "GET", "/results/000000000000/nope.xlsx")[0] == 404
+    assert request(server, "GET", "/results/../../etc/passwd")[0] == 404
+    code, result = post_upload(server, __file__)      # not a wafermap CSV
+    assert code == 422 and not result["ok"]
+
+
+def raw_post(server, headers, body=b""):
+    # Hand-written request, for headers urllib would not send
+    host, port = server.server_address[:2]
+    with socket.create_connection((host, port), timeout=10) as conn:
+        conn.sendall(b"POST /process HTTP/1.1\r\nHost: x\r\n" + headers + b"\r\n" + body)
+        reply = b""
+        while chunk := conn.recv(65536):
+            reply += chunk
+    return int(reply.split(b" ", 2)[1])
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1.5"])
+def test_bad_content_length(server, length):
+    # Answered (no exception, no read until EOF) and the connection closed
+    assert raw_post(server, b"Content-Length: " + length + b"\r\n", b"X,Y\r\n") == 400
+
+
+@pytest.mark.parametrize("name", [".", "..", ".hidden.csv", "sub/W01.wmap.csv"])
+def test_bad_upload_name(server, wafer_csv, name):
+    with open(wafer_csv, "rb") as f:
+        code, _, body = request(server, "POST", f"/process?name={name}", f.read())
+    assert code == 400
+    assert "upload name" in json.loads(body)["error"]
+    assert os.listdir(server.service.work_dir) == []
+
+
+def test_busy_and_status(server, wafer_csv):
+    svc = server.service
+    svc._slots.acquire()          # the only worker slot is taken
+    results = []
+    try:
+        first = threading.Thread(target=lambda: results.append(post_upload(server, wafer_csv)))
+        first.start()
+        wait_for(lambda: status(server)["queued"] == 1)
+
+        # workers (1) + queue (0) jobs are already in flight
+        with open(wafer_csv, "rb") as f:
+            code, headers, body = request(server, "POST", "/process?mark=a", f.read())
+        assert code == 503
+        assert headers["Retry-After"] == "5"
+        assert not json.loads(body)["ok"]
+    finally:
+        svc._slots.release()
+    first.join(60)
+    assert results[0][0] == 200
+
+    counters = status(server)
+    assert counters["workers"] == 1 and counters["max_queue"] == 0
+    assert (counters["queued"], counters["running"]) == (0, 0)
+    assert (counters["completed"], counters["failed"], counters["rejected"]) == (1, 0, 1)
+    assert counters["latency"]["total"]["count"] == 1
+    assert counters["warmup_seconds"] is not None
+
+
+def test_worker_crash(server, wafer_csv):
+    svc = server.service
+    pid = next(iter(svc._pool._processes))
+    os.kill(pid, signal.SIGKILL)
+
+    code, result = post_upload(server, wafer_csv)
+    assert code == 422
+    assert result["error"].startswith("worker:")
+
+    code, result = post_upload(server, wafer_csv)     # fresh pool
+    assert code == 200, result
+    counters = status(server)
+    assert (counters["running"], counters["completed"], counters["failed"]) == (0, 1, 1)
+
+
+def test_run_after_close(tmp_path, wafer_csv):
+    # Failures outside process() still end as a result and release the slot
+    svc = service.Service(workers=1, work_dir=str(tmp_path / "work")).start()
+    svc.close()
+    job_id, job_dir = svc.new_job()
+    result = svc.run(job_id, job_dir, wafer_csv, {"marks": ("a",)})
+    assert not result["ok"]
+    assert result["error"].startswith("service:")
+    counters = svc.status()
+    assert (counters["running"], counters["queued"], counters["failed"]) == (0, 0, 1)
+
+
+def test_upload_write_error(server, wafer_csv, monkeypatch):
+    made = []
+    new_job = server.service.new_job
+
+    def broken_job():
+        job_id, job_dir = new_job()
+        made.append(job_dir)
+        os.rmdir(job_dir)         # the upload cannot be written
+        return job_id, job_dir
+
+    monkeypatch.setattr(server.service, "new_job", broken_job)
+    code, result = post_upload(server, wafer_csv)
+    assert code == 500
+    assert result["error"].startswith("upload not saved")
+    assert not os.path.exists(made[0])
@@ -0,0 +1,81 @@
+import json
+import os
+import struct
+import zlib
+
+import pytest
+
+from benchmarks import synth
+from deliverables import sections, wafer_cache, wmap_csv
+
+
+def parse(file_path):
+    section_index = sections.SectionIndex()
+    data = wafer_cache.WaferData(section_index)
+    for _ in data.record(section_index.scan(wmap_csv.iter_rows(file_path)), chunk_rows=50):
+        pass
+    return data
+
+
+@pytest.fixture
+def three_slots(tmp_path):
+    return synth.generate(str(tmp_path / "LOT3.wmap.csv"), dies=120, ets=4, marks="ab", slots=3, seed=3)
+
+
+def test_every_slot_column_wise(three_slots):
+    data = parse(three_slots)
+    assert data.cacheable and data.die_count == 120
+    blocks = [part for part in data.tail if isinstance(part, wafer_cache._DieBlock)]
+    assert [block.count for block in blocks] == [120, 120]
+    plain = sum(len(part) for part in data.tail if isinstance(part, list))
+    assert plain < 100          # only the section headers and limits tables stay rows
+
+
+@pytest.mark.parametrize("start", [1, 5, 80, 200, 260, 330, 400, 10_000])
+def test_round_trip_rows(three_slots, start):
+    expected = list(wmap_csv.iter_rows(three_slots, start))
+    data = parse(three_slots)
+    assert list(data.iter_rows(start)) == expected
+    again = wafer_cache.WaferData.from_bytes(data.to_bytes())
+    assert list(again.iter_rows(start)) == expected
+
+
+def test_version_check(three_slots, cache_dir):
+    cache = wafer_cache.WaferCache(str(cache_dir))
+    cache.put(three_slots, parse(three_slots))
+    with open(os.path.join(cache_dir, "index.json"), encoding="utf-8") as f:
+        assert '"version": 2' in f.read()
+    meta = zlib.compress(json.dumps({"version": 1}).encode("utf-8"))
+    with pytest.raises(ValueError):
+        wafer_cache.WaferData.from_bytes(wafer_cache.MAGIC + struct.pack("<I", len(meta)) + meta)
+
+
+def test_miss_hashes_once(three_slots, cache_dir, monkeypatch):
+    hashed = []
+    content_hash = wafer_cache.content_hash
+    monkeypatch.setattr(wafer_cache, "content_hash", lambda path: hashed.append(path) or content_hash(path))
+
+    cache = wafer_cache.WaferCache(str(cache_dir))
+    assert cache.get(three_slots) is None
+    assert cache.put(three_slots, parse(three_slots))
+    assert hashed == [three_slots]
+
+    fresh = wafer_cache.WaferCache(str(cache_dir))
+    data = fresh.get(three_slots)
+    assert hashed == [three_slots]      # path, size and mtime match the index
+    assert list(data.iter_rows()) == list(wmap_csv.iter_rows(three_slots))
+
+
+def test_clear_keeps_other_files(three_slots, tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    for name in ("notes.json", "report.wpal", "settings.json"):
+        (directory / name).write_text("keep")
+
+    cache = wafer_cache.WaferCache(str(directory))
+    cache.put(three_slots, parse(three_slots))
+    assert any(name.endswith(".wafc") for name in os.listdir(directory))
+
+    cache.clear()
+    assert sorted(os.listdir(directory)) == ["notes.json", "report.wpal", "settings.json"]
+    assert cache.get(three_slots) is None